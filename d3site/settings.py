@@ -126,3 +126,107 @@ LOGIN_URL = 'login'
 
 # Redirect to dashboard homepage
 LOGIN_REDIRECT_URL = '/dashboard'
+
+
+# Google Analytics query layer
+# Resolved profile (view) ids are cached in memory and in the sqlite file below for GA_PROFILE_CACHE_TTL seconds
+
+GA_PROFILE_CACHE_TTL = 6 * 60 * 60
+
+GA_PROFILE_CACHE_DB = os.path.join(BASE_DIR, 'dashboard', 'API', 'cache', 'profiles.sqlite3')
+
+# Report responses are cached under their normalized query: in memory (at most max_entries responses and max_bytes
+# bytes of JSON) and in the sqlite file. Reports ending before the last settle_days days never expire, the others
+# expire after fresh_ttl (range includes today) or recent_ttl seconds.
+
+GA_RESULT_CACHE = {
+    'max_entries': 256,
+    'max_bytes': 256 * 1024 * 1024,
+    'db_path': os.path.join(BASE_DIR, 'dashboard', 'API', 'cache', 'results.sqlite3'),
+    'fresh_ttl': 15 * 60,
+    'recent_ttl': 6 * 60 * 60,
+    'settle_days': 2,
+}
+
+# Reports of additive metrics are stored per day in the sqlite file below and summed locally over the dashboard
+# periods, only the days not stored yet are downloaded. Days synced less than settle_days days after they ended are
+# downloaded again after recent_ttl seconds, days older than retention_days are purged. None disables the store.
+
+GA_FACT_STORE = {
+    'db_path': os.path.join(BASE_DIR, 'dashboard', 'API', 'cache', 'facts.sqlite3'),
+    'settle_days': 2,
+    'recent_ttl': 6 * 60 * 60,
+    'retention_days': 400,
+}
+
+# Page paths are normalized before they are compared: the query parameters of strip_params are removed (* matches any
+# characters), the hostname is lowercased and trailing slashes are trimmed. collapse_numeric_ids replaces the path
+# segments made of digits with numeric_id_placeholder. The result of max_entries raw paths is kept in memory.
+
+DASHBOARD_URL_NORMALIZATION = {
+    'strip_params': ('utm_*', 'fbclid', 'inf_contact_key'),
+    'lowercase_host': True,
+    'trim_trailing_slash': True,
+    'collapse_numeric_ids': False,
+    'numeric_id_placeholder': ':id',
+    'max_entries': 500000,
+}
+
+# Traffic sources are grouped into channels by a rule table, the first rule matching a source gives its category and
+# unmatched sources fall into default_category. None uses the default rules of dashboard/analysis/channels.py, e.g.
+# ({'category': 'Social', 'match': {'ga:hasSocialSourceReferral': ('Yes',)}, 'source': 'ga:socialNetwork'},
+#  {'category': 'Paid Search', 'match': {'ga:medium': ('cpc', 'ppc', 'paidsearch')}}, ...)
+
+DASHBOARD_CHANNEL_GROUPING = {
+    'rules': None,
+    'default_category': 'Other',
+}
+
+# Concurrent dashboard loads of the same profile and periods share one computation. Worker processes of this host take
+# turns through the lock files below and wait at most DASHBOARD_FLIGHT_LOCK_TIMEOUT seconds for each other.
+
+DASHBOARD_FLIGHT_LOCK_DIR = os.path.join(BASE_DIR, 'dashboard', 'API', 'cache', 'locks')
+
+DASHBOARD_FLIGHT_LOCK_TIMEOUT = 300
+
+# The last DASHBOARD_RECENT_ANALYSES analyses built by a worker process are kept, so a time frame change of the
+# dashboard only recomputes the parts reading dates that changed. 0 rebuilds everything on every change.
+
+DASHBOARD_RECENT_ANALYSES = 8
+
+# The client overview builds the analyses of several profiles (views) on a pool of max_workers workers shared by the
+# process. At most per_profile analyses of a profile are built at the same time, each running stage_workers stages
+# concurrently, and the last max_entries analyses of every profile are kept. DASHBOARD_CLIENT_PROFILES lists the
+# profile ids of the overview, None uses every profile readable with the service account.
+
+DASHBOARD_FAN_OUT = {
+    'max_workers': 4,
+    'per_profile': 1,
+    'stage_workers': 3,
+    'max_entries': 4,
+}
+
+DASHBOARD_CLIENT_PROFILES = None
+
+# The dashboard page is served from snapshots of its elements stored in db_path, None builds it on every request.
+# A snapshot is rebuilt when it is older than refresh_interval seconds or was built for other dates, by
+# "python manage.py snapshot" (e.g. from cron) or by a thread of the web process when background is True. Snapshots
+# older than max_age seconds (None serves any age) or built for the dates of another day are rebuilt by the request
+# instead. The last max_versions snapshots of every profile and periods are kept. profiles lists the profile ids
+# refreshed (None: the default view), periods the (current, previous) periods (None: the default periods of the
+# dashboard).
+
+DASHBOARD_SNAPSHOTS = {
+    'db_path': os.path.join(BASE_DIR, 'dashboard', 'API', 'cache', 'snapshots.sqlite3'),
+    'max_versions': 5,
+    'refresh_interval': 60 * 60,
+    'max_age': 24 * 60 * 60,
+    'profiles': None,
+    'periods': None,
+    'background': False,
+}
+
+# Set to a dictionary of FakeService options (e.g. {'paths': 10000, 'latency': 0.2}) to serve deterministic synthetic
+# Google Analytics data instead of calling the API. The GA_FAKE_SERVICE_PATHS environment variable enables it too.
+
+GA_FAKE_SERVICE = {'paths': int(os.environ['GA_FAKE_SERVICE_PATHS'])} if os.environ.get('GA_FAKE_SERVICE_PATHS') else None
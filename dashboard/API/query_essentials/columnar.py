@@ -0,0 +1,154 @@
+"""
+file: columnar.py
+created: 10/18/2026
+
+Decodes the pages of a Core Reporting API response into per column numpy buffers, typed from the columnHeaders of
+the response, so a report is turned into a DataFrame without building one list of lists for all of its rows.
+Dimensions become categoricals, INTEGER metrics the smallest integer type holding their values.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# numpy dtype for each columnHeaders dataType, everything else (STRING, ...) is kept as object
+DATA_TYPES = {
+    'INTEGER': np.int64,
+    'FLOAT': np.float64,
+    'PERCENT': np.float64,
+    'TIME': np.float64,
+    'CURRENCY': np.float64
+}
+
+# Integer types tried, smallest first, for the INTEGER columns of a finished report
+COMPACT_INT_TYPES = (np.int32, np.int64)
+
+
+def parse_numbers(values, dtype):
+    """
+    Parses the string values of a numeric column in one pass
+
+    :param values: A sequence of numbers formatted as strings, as in the rows of a response
+    :param dtype: The numpy dtype of the column
+    :return: A numpy array of the values
+    :raises ValueError: If a value is not a number of the dtype (empty string, decimal of an INTEGER column, ...)
+    """
+    # numpy converts the strings in C, a malformed value raises instead of being skipped
+    parsed = np.array(values, dtype=dtype)
+    if parsed.shape != (len(values),):
+        raise ValueError('Expected %d numbers, parsed %d' % (len(values), parsed.size))
+    return parsed
+
+
+def compact_ints(values):
+    """
+
+    :param values: A numpy integer array
+    :return: The values in the smallest integer type of COMPACT_INT_TYPES that holds all of them
+    """
+    if not len(values):
+        return values.astype(COMPACT_INT_TYPES[0])
+
+    low, high = values.min(), values.max()
+    for dtype in COMPACT_INT_TYPES:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return values.astype(dtype, copy=False)
+    return values
+
+
+def to_categorical(values):
+    """
+
+    :param values: A numpy object array of strings
+    :return: A pandas Categorical of the values, with sorted categories so it sorts like the strings
+    """
+    codes, categories = pd.factorize(values, sort=True)
+    return pd.Categorical.from_codes(codes, categories)
+
+
+class ColumnAccumulator(object):
+    """
+    Preallocated, typed column buffers filled one page of rows at a time.
+    """
+
+    def __init__(self, column_headers, total_rows=0, categorical=True, compact=True):
+        """
+
+        :param column_headers: The columnHeaders element of the first response page
+        :param total_rows: The totalResults element of the first response page, used to size the buffers
+        :param categorical: Decode the DIMENSION columns as categoricals, False keeps them as strings
+        :param compact: Store the INTEGER columns in the smallest integer type holding their values
+        """
+        self.names = [header.get('name') for header in column_headers]
+        self.dtypes = [DATA_TYPES.get(header.get('dataType'), object) for header in column_headers]
+        self.dimensions = [header.get('columnType') == 'DIMENSION' for header in column_headers]
+        self.categorical = categorical
+        self.compact = compact
+        self.size = 0
+        self.buffers = [np.empty(total_rows, dtype=dtype) for dtype in self.dtypes]
+
+    def _grow(self, capacity):
+        # totalResults can change between two pages of a live report, grow instead of failing
+        for index, buffer in enumerate(self.buffers):
+            grown = np.empty(capacity, dtype=buffer.dtype)
+            grown[:self.size] = buffer[:self.size]
+            self.buffers[index] = grown
+
+    def append(self, rows):
+        """
+
+        :param rows: The rows element of one response page
+        """
+        if not rows:
+            return
+
+        start = self.size
+        stop = start + len(rows)
+        if stop > len(self.buffers[0]):
+            self._grow(max(stop, 2 * len(self.buffers[0])))
+
+        # transpose only the current page and convert each column straight into its buffer
+        for buffer, dtype, values in zip(self.buffers, self.dtypes, zip(*rows)):
+            if dtype is object:
+                buffer[start:stop] = values
+            else:
+                buffer[start:stop] = parse_numbers(values, dtype)
+
+        self.size = stop
+
+    def to_column(self, index):
+        """
+
+        :param index: Position of the column in the column headers
+        :return: The decoded values of the column
+        """
+        values = self.buffers[index][:self.size]
+        if self.dimensions[index] and self.categorical:
+            return to_categorical(values)
+        if self.dtypes[index] is np.int64 and self.compact:
+            return compact_ints(values)
+        return values
+
+    def to_frame(self):
+        """
+
+        :return: A DataFrame with one typed column per header
+        """
+        return pd.DataFrame({name: self.to_column(index) for index, name in enumerate(self.names)},
+                            columns=self.names)
+
+
+def decode_response(response, categorical=True, compact=True):
+    """
+    Decodes a single response page
+
+    :param response: The JSON formatted response of a Core Reporting API query
+    :param categorical: Decode the DIMENSION columns as categoricals, False keeps them as strings
+    :param compact: Store the INTEGER columns in the smallest integer type holding their values
+    :return: A DataFrame with one typed column per header
+    """
+    rows = response.get('rows', [])
+    accumulator = ColumnAccumulator(response.get('columnHeaders', []), len(rows), categorical, compact)
+    accumulator.append(rows)
+    return accumulator.to_frame()
@@ -0,0 +1,72 @@
+"""
+file: dates.py
+created: 10/18/2026
+
+Helpers for the date formats accepted by the Core Reporting API: YYYY-MM-DD, or a relative date (today, yesterday,
+or NdaysAgo where N is a positive integer).
+"""
+
+import datetime
+import re
+
+
+DATE_FORMAT = '%Y-%m-%d'
+
+RELATIVE_DAYS = re.compile(r'^(\d+)daysAgo$')
+
+# The Core Reporting API rejects dates before this one
+EARLIEST_DATE = datetime.date(2005, 1, 1)
+
+
+def resolve_date(value, today=None):
+    """
+
+    :param value: A date in one of the formats accepted by the Core Reporting API
+    :param today: Optional datetime.date used as reference for relative dates, defaults to the current local date
+    :return: The absolute datetime.date
+    """
+    if today is None:
+        today = datetime.date.today()
+
+    value = value.strip()
+    if value == 'today':
+        return today
+    if value == 'yesterday':
+        return today - datetime.timedelta(days=1)
+
+    match = RELATIVE_DAYS.match(value)
+    if match:
+        return today - datetime.timedelta(days=int(match.group(1)))
+
+    return datetime.datetime.strptime(value, DATE_FORMAT).date()
+
+
+def format_date(value):
+    """
+
+    :param value: A datetime.date
+    :return: The date formatted as YYYY-MM-DD
+    """
+    return value.strftime(DATE_FORMAT)
+
+
+def resolve_period(start, end, today=None):
+    """
+
+    :param start: The start date of a period, in one of the formats accepted by the Core Reporting API
+    :param end: The end date of the period
+    :param today: Optional datetime.date used as reference for relative dates, defaults to the current local date
+    :return: A tuple with the absolute start and end datetime.date
+    :raises ValueError: If a date is malformed, the start is after the end, or the period is not between EARLIEST_DATE
+    and today
+    """
+    if today is None:
+        today = datetime.date.today()
+
+    start_date = resolve_date(start, today)
+    end_date = resolve_date(end, today)
+    if start_date > end_date:
+        raise ValueError('The period starts after it ends: %s - %s' % (start, end))
+    if start_date < EARLIEST_DATE or end_date > today:
+        raise ValueError('The period must be between %s and today: %s - %s' % (format_date(EARLIEST_DATE), start, end))
+    return start_date, end_date
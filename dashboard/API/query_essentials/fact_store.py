@@ -0,0 +1,327 @@
+"""
+file: fact_store.py
+created: 10/18/2026
+
+Local sqlite store of report rows partitioned by day. A report is stored at its own grain (profile, dimensions,
+metrics and filters) with ga:date added, every day is downloaded once and the reports over any range of stored days
+are summed locally, so refreshing the rolling dashboard windows only downloads the days that are new or were not
+settled yet. Only additive metrics can be summed over days, queries with metrics such as ga:users stay live queries.
+"""
+
+from contextlib import closing
+import datetime
+import hashlib
+import json
+import os.path
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from dashboard.API.query_essentials.columnar import compact_ints, to_categorical
+from dashboard.API.query_essentials.dates import resolve_date, format_date
+from dashboard.API.query_essentials.result_cache import split_fields
+
+
+# Metrics whose value over a range is not the sum of their daily values (distinct counts)
+NON_ADDITIVE_METRICS = ('ga:users', 'ga:1dayUsers', 'ga:7dayUsers', 'ga:14dayUsers', 'ga:28dayUsers',
+                        'ga:30dayUsers', 'ga:sessionsPerUser')
+
+# Parts of the names of ratio and average metrics (ga:bounceRate, ga:avgSessionDuration, ga:pageviewsPerSession, ...)
+NON_ADDITIVE_PARTS = ('Rate', 'avg', 'Per', 'Percent')
+
+
+def is_additive(metric):
+    """
+
+    :param metric: A metric name
+    :return: True if the value of the metric over a range is the sum of its daily values
+    """
+    name = metric.strip()
+    return name not in NON_ADDITIVE_METRICS and not any(part in name for part in NON_ADDITIVE_PARTS)
+
+
+def get_ranges(days):
+    """
+
+    :param days: A sorted list of datetime.date
+    :return: The list of (first day, last day) of the runs of consecutive days
+    """
+    ranges = []
+    for day in days:
+        if ranges and (day - ranges[-1][1]).days == 1:
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
+
+
+class FactStore(object):
+    """
+    Day partitioned sqlite store of report rows, kept in sync one day at a time
+    """
+
+    def __init__(self, db_path, settle_days=2, recent_ttl=6 * 60 * 60, retention_days=400, clock=time.time):
+        """
+
+        :param db_path: Path of the sqlite file
+        :param settle_days: Number of days after which the data of a day no longer changes, the days synced before
+        they settled are downloaded again once they are older than recent_ttl
+        :param recent_ttl: Seconds the rows of a day that was not settled when it was synced stay valid
+        :param retention_days: Days older than this many days are removed after every sync, None keeps every day
+        :param clock: Callable returning the current time in seconds
+        """
+        self.db_path = db_path
+        self.settle_days = settle_days
+        self.recent_ttl = recent_ttl
+        self.retention_days = retention_days
+        self.clock = clock
+
+        self.days_synced = 0
+        self.rows_stored = 0
+        self.windows_served = 0
+
+        # one sync at a time per grain in this process
+        self._lock = threading.Lock()
+        self._grain_locks = {}
+
+        self._init_db()
+
+    def _connect(self):
+        # closed on exit, the inner "with conn" commits
+        return closing(sqlite3.connect(self.db_path, timeout=30))
+
+    def _init_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        with self._connect() as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS fact_grains (grain TEXT PRIMARY KEY, definition TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS fact_days "
+                         "(grain TEXT NOT NULL, day TEXT NOT NULL, synced REAL NOT NULL, settled INTEGER NOT NULL, "
+                         "PRIMARY KEY (grain, day))")
+
+    def can_answer(self, context):
+        """
+
+        :param context: A dictionary that contains all information required for the dashboard element.
+        :return: True if the report of the context can be summed from daily rows
+        """
+        metrics = split_fields(context.get('api_metric'))
+        dimensions = split_fields(context.get('api_dimension'))
+        return bool(metrics) and all(is_additive(metric) for metric in metrics) and 'ga:date' not in dimensions
+
+    def get_grain(self, context):
+        """
+
+        :param context: A dictionary that contains all information required for the dashboard element.
+        :return: A tuple with the key of the grain of the context and its definition
+        """
+        definition = {
+            # the default profile of an account is resolved by the query layer, the account identifies it
+            'profile_id': context.get('profile_id') or None,
+            'account': None if context.get('profile_id') else context.get('svc_account_email'),
+            'dimensions': split_fields(context.get('api_dimension')),
+            'metrics': split_fields(context.get('api_metric')),
+            'filters': (context.get('api_filter') or '').strip()
+        }
+        grain = hashlib.sha1(json.dumps(definition, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        return grain, definition
+
+    def _get_table(self, grain):
+        return 'facts_' + grain
+
+    def _ensure_grain(self, conn, grain, definition):
+        columns = ', '.join(['day TEXT NOT NULL'] +
+                            ['d%d TEXT' % index for index in range(len(definition['dimensions']))] +
+                            ['m%d NUMERIC' % index for index in range(len(definition['metrics']))])
+        conn.execute("INSERT OR IGNORE INTO fact_grains (grain, definition) VALUES (?, ?)",
+                     (grain, json.dumps(definition, sort_keys=True)))
+        conn.execute("CREATE TABLE IF NOT EXISTS %s (%s)" % (self._get_table(grain), columns))
+        conn.execute("CREATE INDEX IF NOT EXISTS %s_day ON %s (day)" % (self._get_table(grain), self._get_table(grain)))
+
+    def _grain_lock(self, grain):
+        with self._lock:
+            return self._grain_locks.setdefault(grain, threading.Lock())
+
+    def get_missing_days(self, grain, first, last, today=None):
+        """
+
+        :param grain: The key of a grain (see get_grain)
+        :param first: First datetime.date of the range
+        :param last: Last datetime.date of the range
+        :param today: Optional datetime.date of today
+        :return: The sorted list of the days of the range that are not stored, or are stored but expired
+        """
+        if today is None:
+            today = datetime.date.today()
+        last = min(last, today)
+
+        with self._connect() as conn, conn:
+            rows = conn.execute("SELECT day, synced, settled FROM fact_days WHERE grain = ? AND day BETWEEN ? AND ?",
+                                (grain, format_date(first), format_date(last))).fetchall()
+        now = self.clock()
+        valid = set(day for day, synced, settled in rows if settled or now < synced + self.recent_ttl)
+
+        days = [first + datetime.timedelta(days=offset) for offset in range((last - first).days + 1)]
+        return [day for day in days if format_date(day) not in valid]
+
+    def store(self, grain, definition, days, frame, today=None):
+        """
+        Replaces the rows of the given days
+
+        :param grain: The key of the grain (see get_grain)
+        :param definition: The definition of the grain
+        :param days: The list of datetime.date downloaded
+        :param frame: The data frame of the report over the days, with a ga:date column (YYYYMMDD)
+        :param today: Optional datetime.date of today
+        """
+        if today is None:
+            today = datetime.date.today()
+        dimensions = definition['dimensions']
+        metrics = definition['metrics']
+
+        # YYYYMMDD to YYYY-MM-DD, once per distinct date
+        dates = frame['ga:date'].astype('category')
+        labels = np.array(['%s-%s-%s' % (value[:4], value[4:6], value[6:]) for value in dates.cat.categories],
+                          dtype=object)
+        columns = [labels[dates.cat.codes.values].tolist()]
+        columns += [frame[dimension].astype(object).tolist() for dimension in dimensions]
+        columns += [frame[metric].tolist() for metric in metrics]
+
+        table = self._get_table(grain)
+        placeholders = ', '.join('?' * (1 + len(dimensions) + len(metrics)))
+        settled_before = today - datetime.timedelta(days=self.settle_days)
+        synced = self.clock()
+
+        with self._connect() as conn, conn:
+            self._ensure_grain(conn, grain, definition)
+            conn.executemany("DELETE FROM %s WHERE day = ?" % table, [(format_date(day),) for day in days])
+            conn.executemany("INSERT INTO %s VALUES (%s)" % (table, placeholders), zip(*columns))
+            conn.executemany("INSERT OR REPLACE INTO fact_days (grain, day, synced, settled) VALUES (?, ?, ?, ?)",
+                             [(grain, format_date(day), synced, int(day < settled_before)) for day in days])
+
+        with self._lock:
+            self.days_synced += len(days)
+            self.rows_stored += len(frame)
+
+    def read(self, grain, definition, first, last):
+        """
+
+        :param grain: The key of a stored grain (see get_grain)
+        :param definition: The definition of the grain
+        :param first: First datetime.date of the window
+        :param last: Last datetime.date of the window
+        :return: A data frame with the dimensions and the metrics summed over the days of the window, typed like a
+        decoded report (see columnar)
+        """
+        dimensions = definition['dimensions']
+        metrics = definition['metrics']
+        dimension_columns = ['d%d' % index for index in range(len(dimensions))]
+        selected = dimension_columns + ['SUM(m%d)' % index for index in range(len(metrics))]
+
+        query = "SELECT %s FROM %s WHERE day BETWEEN ? AND ?" % (', '.join(selected), self._get_table(grain))
+        if dimension_columns:
+            query += " GROUP BY " + ', '.join(dimension_columns)
+
+        with self._connect() as conn, conn:
+            self._ensure_grain(conn, grain, definition)
+            rows = conn.execute(query, (format_date(first), format_date(last))).fetchall()
+
+        if not dimensions and rows and rows[0][0] is None:
+            # SUM over no row
+            rows = []
+
+        frame = pd.DataFrame({}, index=range(len(rows)))
+        columns = list(zip(*rows)) if rows else [()] * len(selected)
+        for name, values in zip(dimensions, columns):
+            frame[name] = to_categorical(np.array(values, dtype=object))
+        for name, values in zip(metrics, columns[len(dimensions):]):
+            values = np.array(values)
+            if values.dtype.kind == 'f' and np.all(np.mod(values, 1) == 0):
+                values = values.astype(np.int64)
+            frame[name] = compact_ints(values) if values.dtype.kind == 'i' else values.astype(np.float64)
+
+        # the API leaves out the rows whose metrics are all zero
+        if metrics and len(frame):
+            frame = frame[(frame[metrics] != 0).any(axis=1)].reset_index(drop=True)
+
+        with self._lock:
+            self.windows_served += 1
+        return frame
+
+    def get_frames(self, contexts, fetch, today=None):
+        """
+        Answers report queries of the same grain from the store, downloading the missing days first
+
+        :param contexts: A list of contexts that only differ in their period and sort (see can_answer)
+        :param fetch: Callable downloading a list of contexts into a list of data frames (see query_basic.get_frames)
+        :param today: Optional datetime.date of today
+        :return: The list of data frames of the contexts, columns in the order of the contexts
+        """
+        if today is None:
+            today = datetime.date.today()
+        grain, definition = self.get_grain(contexts[0])
+        windows = [(resolve_date(context.get('st_date'), today), resolve_date(context.get('end_date'), today))
+                   for context in contexts]
+
+        with self._grain_lock(grain):
+            missing = set()
+            for first, last in windows:
+                missing.update(self.get_missing_days(grain, first, last, today))
+            missing = sorted(missing)
+
+            if missing:
+                # every run of consecutive missing days is one report over ga:date
+                dimensions = ', '.join(definition['dimensions'] + ['ga:date'])
+                sync_contexts = [dict(contexts[0], api_dimension=dimensions, st_date=format_date(first),
+                                      end_date=format_date(last), sort_key=None)
+                                 for first, last in get_ranges(missing)]
+                frames = fetch(sync_contexts)
+                frame = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+                self.store(grain, definition, missing, frame, today)
+                self.purge(today)
+
+        frames = []
+        for context, (first, last) in zip(contexts, windows):
+            frame = self.read(grain, definition, first, last)
+            dimensions = [field.strip() for field in (context.get('api_dimension') or '').split(',') if field.strip()]
+            metrics = [field.strip() for field in context.get('api_metric').split(',') if field.strip()]
+            frames.append(frame[dimensions + metrics])
+        return frames
+
+    def purge(self, today=None):
+        """
+        Removes the days older than retention_days
+
+        :param today: Optional datetime.date of today
+        """
+        if self.retention_days is None:
+            return
+        if today is None:
+            today = datetime.date.today()
+        oldest = format_date(today - datetime.timedelta(days=self.retention_days))
+
+        with self._connect() as conn, conn:
+            grains = [row[0] for row in conn.execute("SELECT grain FROM fact_grains").fetchall()]
+            for grain in grains:
+                conn.execute("DELETE FROM %s WHERE day < ?" % self._get_table(grain), (oldest,))
+            conn.execute("DELETE FROM fact_days WHERE day < ?", (oldest,))
+
+    def stats(self):
+        """
+
+        :return: A dictionary with the sync counters and the number of stored days of the store
+        """
+        with self._connect() as conn, conn:
+            days = conn.execute("SELECT COUNT(*) FROM fact_days").fetchone()[0]
+        with self._lock:
+            return {
+                "days_synced": self.days_synced,
+                "rows_stored": self.rows_stored,
+                "windows_served": self.windows_served,
+                "stored_days": days
+            }
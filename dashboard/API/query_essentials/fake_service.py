@@ -0,0 +1,507 @@
+"""
+file: fake_service.py
+created: 10/18/2026
+
+Offline stand-in for the Google Analytics v3 service object returned by build(). It answers data().ga().get, the
+management account/property/profile listings and batch requests with deterministic synthetic reports shaped like
+the real responses (columnHeaders, rows, totalResults, paging), so the dashboard runs without credentials.
+
+The synthetic site has `paths` pages spread over `hostnames` hosts, every page receives traffic from
+`sources_per_path` of the `sources` traffic sources. Page and source popularity follow a Zipf law of exponent `skew`,
+every block of `trend_days` days gets its own random variation (`volatility`), so period over period comparisons show
+spikes and drops. The traffic of a period is the sum of the traffic of its days, reports over ga:date add up to the
+report over the whole period. A report over pagePath, hostname and source has paths * sources_per_path rows.
+"""
+
+from collections import OrderedDict
+import datetime
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from dashboard.API.query_essentials.dates import resolve_date
+
+
+# Well known sources: (ga:source, ga:medium, ga:hasSocialSourceReferral, ga:socialNetwork)
+KNOWN_SOURCES = [
+    ('google', 'organic', 'No', '(not set)'),
+    ('(direct)', '(none)', 'No', '(not set)'),
+    ('facebook.com', 'referral', 'Yes', 'Facebook'),
+    ('bing', 'organic', 'No', '(not set)'),
+    ('google', 'cpc', 'No', '(not set)'),
+    ('t.co', 'referral', 'Yes', 'Twitter'),
+    ('newsletter', 'email', 'No', '(not set)'),
+    ('linkedin.com', 'referral', 'Yes', 'LinkedIn'),
+    ('yahoo', 'organic', 'No', '(not set)'),
+    ('m.facebook.com', 'referral', 'Yes', 'Facebook')
+]
+
+SOURCE_DIMENSIONS = ['ga:source', 'ga:medium', 'ga:hasSocialSourceReferral', 'ga:socialNetwork']
+
+# Metrics derived from the page views of a row, as fraction of the page views or of the sessions
+# Format: {metric: (base metric, name of the per page ratio)}
+DERIVED_METRICS = OrderedDict([
+    ('ga:sessions', ('ga:pageviews', 'session_ratio')),
+    ('ga:users', ('ga:sessions', 'user_ratio')),
+    ('ga:bounces', ('ga:sessions', 'bounce_ratio')),
+    ('ga:goalCompletionsAll', ('ga:sessions', 'goal_ratio')),
+    ('ga:totalEvents', ('ga:pageviews', 'event_ratio'))
+])
+
+# Core Reporting API responses return at most 10000 rows per page, 1000 by default
+MAX_PAGE_SIZE = 10000
+DEFAULT_PAGE_SIZE = 1000
+
+
+def get_seed(*parts):
+    """
+
+    :param parts: Values identifying a random stream
+    :return: A seed that is the same in every process for the same parts
+    """
+    return zlib.crc32('|'.join(str(part) for part in parts).encode('utf-8'))
+
+
+class FakeSite(object):
+    """
+    The synthetic traffic of the site, generated per row of the finest grain (page, source) and aggregated per report
+    """
+
+    def __init__(self,
+                 paths=1000,
+                 hostnames=3,
+                 sources=40,
+                 sources_per_path=5,
+                 skew=1.1,
+                 volatility=0.35,
+                 trend_days=30,
+                 daily_pageviews=50000,
+                 query_string_share=0.05,
+                 seed=0):
+        """
+
+        :param paths: Number of distinct page paths
+        :param hostnames: Number of hostnames the paths are spread over
+        :param sources: Number of traffic sources, at least the number of sources_per_path
+        :param sources_per_path: Number of sources sending traffic to each path
+        :param skew: Zipf exponent of the path and source popularity, 0 spreads traffic evenly
+        :param volatility: Standard deviation of the log-normal variation between two blocks of trend_days days
+        :param trend_days: Number of consecutive days sharing the same random variation
+        :param daily_pageviews: Page views of the site on an average day
+        :param query_string_share: Share of the paths carrying tracking query strings (utm_*, inf_contact_key, ...)
+        :param seed: Seed of the synthetic site
+        """
+        if sources_per_path > sources:
+            raise ValueError('sources_per_path can not exceed the number of sources')
+
+        self.seed = seed
+        self.volatility = volatility
+        self.trend_days = trend_days
+        self.sources_per_path = sources_per_path
+
+        rng = np.random.RandomState(get_seed(seed, 'site'))
+
+        # PAGES
+        path_ids = np.arange(paths)
+        path_names = np.array(['/section-%d/page-%d' % (path_id % 25, path_id) for path_id in path_ids], dtype=object)
+        tracked = rng.random_sample(paths) < query_string_share
+        path_names[tracked] = [name + ('?utm_source=newsletter&utm_medium=email' if path_id % 2 else
+                                       '?inf_contact_key=%08x' % path_id)
+                               for name, path_id in zip(path_names[tracked], path_ids[tracked])]
+        host_names = np.array(['www.site-%d.com' % host for host in range(hostnames)], dtype=object)
+
+        # popularity of a page is set by a random rank
+        path_weight = 1.0 / np.power(rng.permutation(paths) + 1.0, skew)
+
+        # SOURCES
+        catalog = list(KNOWN_SOURCES[:sources])
+        catalog += [('referrer-%d.com' % index, 'referral', 'No', '(not set)') for index in range(sources - len(catalog))]
+        self.source_table = pd.DataFrame(catalog, columns=SOURCE_DIMENSIONS)
+
+        # each page gets consecutive sources, starting at a popularity weighted source
+        source_weight = 1.0 / np.power(np.arange(sources) + 1.0, skew)
+        first_source = rng.choice(sources, size=paths, p=source_weight / source_weight.sum())
+        slots = np.arange(sources_per_path)
+
+        # FINEST GRAIN: one row per page and source
+        self.path_code = np.repeat(path_ids, sources_per_path)
+        self.source_code = (np.repeat(first_source, sources_per_path) + np.tile(slots, paths)) % sources
+        self.path_names = path_names
+        self.host_code = path_ids % hostnames
+        self.host_names = host_names
+
+        share = np.tile(1.0 / (slots + 1.0), paths)
+        weight = np.repeat(path_weight, sources_per_path) * share
+        self.daily_pageviews = weight / weight.sum() * daily_pageviews
+
+        # per page ratios of the derived metrics
+        self.ratios = {
+            'session_ratio': np.repeat(rng.uniform(0.3, 0.9, paths), sources_per_path),
+            'user_ratio': np.repeat(rng.uniform(0.7, 0.95, paths), sources_per_path),
+            'bounce_ratio': np.repeat(rng.uniform(0.1, 0.9, paths), sources_per_path),
+            'goal_ratio': np.repeat(rng.uniform(0.0, 0.2, paths), sources_per_path),
+            'event_ratio': np.repeat(rng.uniform(0.0, 1.5, paths), sources_per_path)
+        }
+
+    def __len__(self):
+        return len(self.path_code)
+
+    def get_blocks(self, start_date, end_date):
+        """
+
+        :param start_date: Start datetime.date of the period
+        :param end_date: End datetime.date of the period
+        :return: A list of (block, number of days of the period in the block), blocks of trend_days days counted
+        from the first day of the calendar
+        """
+        blocks = OrderedDict()
+        for ordinal in range(start_date.toordinal(), end_date.toordinal() + 1):
+            block = ordinal // self.trend_days
+            blocks[block] = blocks.get(block, 0) + 1
+        return list(blocks.items())
+
+    def get_daily_metric(self, metric, block, cache):
+        """
+
+        :param metric: A metric name
+        :param block: A block of trend_days days (see get_blocks)
+        :param cache: Dictionary of the metrics already computed
+        :return: The integer values of the metric on every day of the block, at the finest grain
+        """
+        if (metric, block) in cache:
+            return cache[(metric, block)]
+
+        rng = np.random.RandomState(get_seed(self.seed, metric, block))
+        if metric in DERIVED_METRICS:
+            base, ratio = DERIVED_METRICS[metric]
+            values = self.get_daily_metric(base, block, cache) * self.ratios[ratio]
+        else:
+            # ga:pageviews, and every metric this stand-in does not know about, follow the page views curve
+            values = self.daily_pageviews * rng.lognormal(0.0, self.volatility, len(self))
+
+        # random rounding keeps the traffic of the pages getting less than one view a day
+        cache[(metric, block)] = np.floor(values + rng.random_sample(len(self))).astype(np.int64)
+        return cache[(metric, block)]
+
+    def get_metric(self, metric, start_date, end_date, cache):
+        """
+
+        :param metric: A metric name
+        :param start_date: Start datetime.date of the period
+        :param end_date: End datetime.date of the period
+        :param cache: Dictionary of the metrics already computed
+        :return: The integer values of the metric over the period, at the finest grain
+        """
+        values = np.zeros(len(self), dtype=np.int64)
+        for block, days in self.get_blocks(start_date, end_date):
+            values += days * self.get_daily_metric(metric, block, cache)
+        return values
+
+    def get_dimension(self, dimension):
+        """
+
+        :param dimension: A dimension name
+        :return: The integer codes of the dimension at the finest grain and the values of the codes
+        """
+        if dimension == 'ga:pagePath':
+            return self.path_code, self.path_names
+        if dimension == 'ga:hostname':
+            return self.host_code[self.path_code], self.host_names
+        if dimension == 'ga:date':
+            raise ValueError('ga:date is only supported by get_report')
+        if dimension in SOURCE_DIMENSIONS:
+            values, codes = np.unique(self.source_table[dimension].values.astype(str), return_inverse=True)
+            return codes[self.source_code], values.astype(object)
+        raise ValueError('Unsupported dimension: ' + dimension)
+
+    def get_report(self, dimensions, metrics, start_date, end_date, sort_key=None, cache=None):
+        """
+
+        :param dimensions: List of dimension names
+        :param metrics: List of metric names
+        :param start_date: Start datetime.date of the period
+        :param end_date: End datetime.date of the period
+        :param sort_key: Optional string of comma separated sort fields, '-' in front of a name sorts descending
+        :param cache: Optional dictionary of the metrics already computed, shared by the reports of several days
+        :return: A data frame with one column per dimension and metric, aggregated over the dimensions
+        """
+        if cache is None:
+            cache = {}
+        if 'ga:date' in dimensions:
+            # one report per day, the values of a day follow from its block
+            other = [dimension for dimension in dimensions if dimension != 'ga:date']
+            days = [start_date + datetime.timedelta(days=offset)
+                    for offset in range((end_date - start_date).days + 1)]
+            frames = []
+            for day in days:
+                frame = self.get_report(other, metrics, day, day, cache=cache)
+                frame['ga:date'] = day.strftime('%Y%m%d')
+                frames.append(frame)
+            frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=dimensions + metrics)
+            return self.sort_report(frame[dimensions + metrics], sort_key)
+
+        frame = pd.DataFrame({metric: self.get_metric(metric, start_date, end_date, cache) for metric in metrics},
+                             columns=metrics)
+
+        if dimensions:
+            codes = [self.get_dimension(dimension) for dimension in dimensions]
+            for dimension, (code, _) in zip(dimensions, codes):
+                frame[dimension] = code
+            frame = frame.groupby(dimensions, sort=False, as_index=False)[metrics].sum()
+            for dimension, (_, values) in zip(dimensions, codes):
+                frame[dimension] = values[frame[dimension].values]
+        else:
+            frame = frame.sum().to_frame().T
+
+        # the API leaves out the rows whose metrics are all zero
+        frame = frame.loc[(frame[metrics] != 0).any(axis=1), dimensions + metrics]
+        return self.sort_report(frame, sort_key)
+
+    def sort_report(self, frame, sort_key):
+        """
+
+        :param frame: A report data frame
+        :param sort_key: Optional string of comma separated sort fields, '-' in front of a name sorts descending
+        :return: The sorted report
+        """
+        fields = [field.strip() for field in (sort_key or '').split(',') if field.strip()]
+        if fields:
+            frame = frame.sort_values(by=[field.lstrip('-') for field in fields],
+                                      ascending=[not field.startswith('-') for field in fields],
+                                      kind='mergesort')
+        return frame.reset_index(drop=True)
+
+
+class FakeService(object):
+    """
+    Stand-in for the analytics v3 service object
+    """
+
+    def __init__(self, latency=0.0, row_latency=0.0, account_id='10000001', property_id='UA-10000001-1',
+                 profile_id='100000001', profiles=1, max_reports=16, **site_options):
+        """
+
+        :param latency: Seconds added to every HTTP round-trip (request or batch request)
+        :param row_latency: Seconds added per 1000 returned rows
+        :param account_id: Id of the only account of the management listings
+        :param property_id: Id of the only web property of the account
+        :param profile_id: Id of the first profile (view) of the web property
+        :param profiles: Number of profiles of the web property, with consecutive ids from profile_id, each profile
+        is a site of its own (seeds seed, seed + 1, ...)
+        :param max_reports: Number of generated reports kept for paging
+        :param site_options: Keyword arguments of FakeSite (paths, hostnames, sources, skew, ...)
+        """
+        self.latency = latency
+        self.row_latency = row_latency
+        self.account_id = account_id
+        self.property_id = property_id
+        self.profile_id = profile_id
+        self.max_reports = max_reports
+
+        # Format: {profile id: FakeSite}, in listing order
+        seed = site_options.pop('seed', 0)
+        self.sites = OrderedDict((str(int(profile_id) + index), FakeSite(seed=seed + index, **site_options))
+                                 for index in range(profiles))
+        self.site = self.sites[profile_id]
+
+        # Format: {(dimensions, metrics, start, end, sort): data frame}, the reports served page by page
+        self._reports = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.round_trips = 0
+
+    def data(self):
+        return self
+
+    def ga(self):
+        return self
+
+    def management(self):
+        return FakeManagement(self)
+
+    def get(self, ids, start_date, end_date, metrics, dimensions=None, sort=None, filters=None, start_index=None,
+            max_results=None, **kwargs):
+        """
+        Same arguments as data().ga().get of the Core Reporting API, filters are accepted but not applied
+
+        :return: A request whose execute() returns the report page
+        """
+        return FakeRequest(self, lambda: self.get_page(ids, start_date, end_date, metrics, dimensions, sort,
+                                                       start_index, max_results))
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
+
+    def wait(self, rows=0):
+        # simulated network and server time
+        delay = self.latency + self.row_latency * rows / 1000.0
+        if delay > 0:
+            time.sleep(delay)
+
+    def get_report(self, profile_id, dimensions, metrics, start_date, end_date, sort):
+        key = (profile_id, tuple(dimensions), tuple(metrics), start_date, end_date, sort)
+        with self._lock:
+            report = self._reports.get(key)
+            if report is not None:
+                self._reports.move_to_end(key)
+                return report
+
+        site = self.sites.get(profile_id)
+        if site is None:
+            raise ValueError('Unknown profile: ' + profile_id)
+        report = site.get_report(dimensions, metrics, start_date, end_date, sort)
+
+        with self._lock:
+            self._reports[key] = report
+            while len(self._reports) > self.max_reports:
+                self._reports.popitem(last=False)
+        return report
+
+    def get_page(self, ids, start_date, end_date, metrics, dimensions, sort, start_index, max_results):
+        """
+
+        :return: One page of the report, formatted like a Core Reporting API response
+        """
+        dimension_names = [name.strip() for name in (dimensions or '').split(',') if name.strip()]
+        metric_names = [name.strip() for name in metrics.split(',') if name.strip()]
+        start = resolve_date(start_date)
+        end = resolve_date(end_date)
+
+        profile_id = ids[3:] if ids.startswith('ga:') else ids
+        report = self.get_report(profile_id, dimension_names, metric_names, start, end, sort)
+
+        start_index = start_index or 1
+        page_size = min(max_results or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        page = report.iloc[start_index - 1:start_index - 1 + page_size]
+
+        # every value is a string, like in the JSON of the API
+        columns = [page[name].astype(str).tolist() for name in dimension_names + metric_names]
+        rows = [list(row) for row in zip(*columns)]
+
+        response = {
+            'kind': 'analytics#gaData',
+            'query': {
+                'ids': ids,
+                'start-date': start_date,
+                'end-date': end_date,
+                'dimensions': dimensions,
+                'metrics': metric_names,
+                'sort': [name.strip() for name in (sort or '').split(',') if name.strip()],
+                'start-index': start_index,
+                'max-results': page_size
+            },
+            'itemsPerPage': page_size,
+            'totalResults': len(report),
+            'containsSampledData': False,
+            'profileInfo': {'profileId': profile_id, 'accountId': self.account_id,
+                            'webPropertyId': self.property_id, 'tableId': ids},
+            'columnHeaders': [{'name': name, 'columnType': 'DIMENSION', 'dataType': 'STRING'}
+                              for name in dimension_names] +
+                             [{'name': name, 'columnType': 'METRIC', 'dataType': 'INTEGER'}
+                              for name in metric_names],
+            'totalsForAllResults': {name: str(report[name].sum()) for name in metric_names}
+        }
+        # like the API, a page without rows has no rows element
+        if rows:
+            response['rows'] = rows
+        return response
+
+
+class FakeRequest(object):
+    """
+    Stand-in for googleapiclient.http.HttpRequest
+    """
+
+    def __init__(self, service, handler):
+        self.service = service
+        self.handler = handler
+
+    def run(self):
+        with self.service._lock:
+            self.service.requests += 1
+        return self.handler()
+
+    def execute(self, http=None, num_retries=0):
+        response = self.run()
+        with self.service._lock:
+            self.service.round_trips += 1
+        self.service.wait(len(response.get('rows', ())))
+        return response
+
+
+class FakeBatch(object):
+    """
+    Stand-in for googleapiclient.http.BatchHttpRequest, all of its requests share one round-trip
+    """
+
+    def __init__(self, service, callback=None):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self.requests.append((str(request_id if request_id is not None else len(self.requests)), request, callback))
+
+    def execute(self, http=None):
+        rows = 0
+        results = []
+        for request_id, request, callback in self.requests:
+            try:
+                response = request.run()
+                rows += len(response.get('rows', ()))
+                results.append((request_id, response, None, callback))
+            except Exception as error:
+                results.append((request_id, None, error, callback))
+
+        with self.service._lock:
+            self.service.round_trips += 1
+        self.service.wait(rows)
+
+        for request_id, response, error, callback in results:
+            for handler in (callback, self.callback):
+                if handler is not None:
+                    handler(request_id, response, error)
+
+
+class FakeManagement(object):
+    """
+    Stand-in for service.management(): one account, one web property and its profiles
+    """
+
+    def __init__(self, service):
+        self.service = service
+
+    def accounts(self):
+        return FakeListing(self.service, 'accounts')
+
+    def webproperties(self):
+        return FakeListing(self.service, 'webproperties')
+
+    def profiles(self):
+        return FakeListing(self.service, 'profiles')
+
+
+class FakeListing(object):
+
+    def __init__(self, service, resource):
+        self.service = service
+        self.resource = resource
+
+    def list(self, **kwargs):
+        service = self.service
+        items = {
+            'accounts': [{'id': service.account_id, 'kind': 'analytics#account', 'name': 'Synthetic account'}],
+            'webproperties': [{'id': service.property_id, 'kind': 'analytics#webproperty',
+                               'accountId': service.account_id, 'name': 'Synthetic property'}],
+            'profiles': [{'id': profile_id, 'kind': 'analytics#profile', 'accountId': service.account_id,
+                          'webPropertyId': service.property_id,
+                          'name': 'All Web Site Data' if profile_id == service.profile_id else 'Client ' + profile_id}
+                         for profile_id in service.sites]
+        }[self.resource]
+        response = {'kind': 'analytics#' + self.resource, 'totalResults': len(items), 'startIndex': 1,
+                    'itemsPerPage': 1000, 'items': items}
+        return FakeRequest(service, lambda: response)
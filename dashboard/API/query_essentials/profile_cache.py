@@ -0,0 +1,124 @@
+"""
+file: profile_cache.py
+created: 10/18/2026
+
+Caches the Google Analytics view (profile) id resolved through the Management API. Entries live in memory and,
+optionally, in a sqlite database so a restarted worker does not have to resolve them again.
+"""
+
+from contextlib import closing
+import json
+import os.path
+import sqlite3
+import threading
+import time
+
+
+class ProfileCache(object):
+    """
+    Two tier (memory, optional sqlite) cache with a time to live for profile resolution results.
+    """
+
+    def __init__(self, ttl=6 * 60 * 60, db_path=None, clock=time.time):
+        """
+
+        :param ttl: Number of seconds an entry stays valid
+        :param db_path: Optional path of the sqlite file used as persistent tier, None keeps entries in memory only
+        :param clock: Callable returning the current time in seconds
+        """
+        self.ttl = ttl
+        self.db_path = db_path
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries = {}
+
+        if self.db_path:
+            self._init_db()
+
+    def _connect(self):
+        # closed on exit, the inner "with conn" commits
+        return closing(sqlite3.connect(self.db_path, timeout=30))
+
+    def _init_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        with self._connect() as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS profile_cache "
+                         "(key TEXT PRIMARY KEY, value TEXT NOT NULL, stored REAL NOT NULL)")
+
+    def _is_fresh(self, stored):
+        return self.clock() - stored < self.ttl
+
+    def get(self, key):
+        """
+
+        :param key: The cache key
+        :return: The cached value, or None if it is missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_fresh(entry[1]):
+                self.hits += 1
+                return entry[0]
+
+        # fall back to the persistent tier and promote a fresh entry to memory
+        if self.db_path:
+            with self._connect() as conn, conn:
+                row = conn.execute("SELECT value, stored FROM profile_cache WHERE key = ?", (key,)).fetchone()
+
+            if row is not None and self._is_fresh(row[1]):
+                value = json.loads(row[0])
+                with self._lock:
+                    self._entries[key] = (value, row[1])
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        """
+
+        :param key: The cache key
+        :param value: A JSON serializable value
+        """
+        stored = self.clock()
+        with self._lock:
+            self._entries[key] = (value, stored)
+
+        if self.db_path:
+            with self._connect() as conn, conn:
+                conn.execute("INSERT OR REPLACE INTO profile_cache (key, value, stored) VALUES (?, ?, ?)",
+                             (key, json.dumps(value), stored))
+
+    def invalidate(self, key=None):
+        """
+
+        :param key: The key to drop, None drops every entry
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+        if self.db_path:
+            with self._connect() as conn, conn:
+                if key is None:
+                    conn.execute("DELETE FROM profile_cache")
+                else:
+                    conn.execute("DELETE FROM profile_cache WHERE key = ?", (key,))
+
+    def stats(self):
+        """
+
+        :return: A dictionary with the hit and miss counters and the number of entries held in memory
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
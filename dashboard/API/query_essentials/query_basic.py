@@ -7,8 +7,14 @@ created: 2/5/2017
 
 from googleapiclient.discovery import build
 from oauth2client.service_account import ServiceAccountCredentials
+from dashboard.API.query_essentials.columnar import ColumnAccumulator
+from dashboard.API.query_essentials.fact_store import FactStore
+from dashboard.API.query_essentials.fake_service import FakeService
+from dashboard.API.query_essentials.profile_cache import ProfileCache
+from dashboard.API.query_essentials.result_cache import ResultCache, make_key, normalize_context
 import httplib2
 import os.path
+import threading
 
 
 def get_client_credentials():
@@ -29,14 +35,14 @@ def get_svc_account():
     return "api-930@d3cubed-157122.iam.gserviceaccount.com"
 
 
-def get_service(api_name, 
-                api_version, 
-                scope, 
-                key_file_location,
-                service_account_email):
+def build_service(api_name,
+                  api_version,
+                  scope,
+                  key_file_location,
+                  service_account_email):
     """
     This function was created by Google for Hello Analyctics API tutorial
-    Get a service that communicates to a Google API.
+    Build a service that communicates to a Google API.
 
     Args:
       api_name: The name of the api to connect to.
@@ -46,7 +52,7 @@ def get_service(api_name,
       service_account_email: The service account email address.
 
     Returns:
-      A service that is connected to the specified API.
+      A tuple of the service that is connected to the specified API and the credentials it was authorized with.
     """
 
     # setup the credentials for the Google API
@@ -58,13 +64,196 @@ def get_service(api_name,
     # Build the service object.
     service = build(api_name, api_version, http=http)
 
+    return service, credentials
+
+
+class PooledService(object):
+    """
+    A service object held by the ServicePool together with the credentials it was built with.
+    """
+
+    def __init__(self, service, credentials):
+        self.service = service
+        self.credentials = credentials
+
+        # guards token refreshes on the shared credentials
+        self.lock = threading.Lock()
+
+
+class ServicePool(object):
+    """
+    Process wide, thread safe pool of Google API service objects.
+
+    A service is built once per key (api name, api version, scope, key file, service account) and then reused by
+    every query. httplib2.Http is not thread safe, so each thread gets its own Http object authorized with the
+    shared credentials, and the access token is only refreshed once it has expired.
+    """
+
+    def __init__(self, builder=build_service):
+        """
+
+        :param builder: Callable taking the key fields and returning a (service, credentials) tuple
+        """
+        self.builder = builder
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._local = threading.local()
+
+    @staticmethod
+    def make_key(api_name, api_version, scope, key_file_location, service_account_email):
+        """
+
+        :return: A hashable key for the service, scopes are order independent
+        """
+        if isinstance(scope, (list, tuple, set)):
+            scope = tuple(sorted(scope))
+        return api_name, api_version, scope, key_file_location, service_account_email
+
+    def get_entry(self, key):
+        """
+
+        :param key: A key made by make_key
+        :return: The PooledService for the key, built on first use
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry
+
+            self.misses += 1
+
+            # build while holding the lock so concurrent first requests build the client only once
+            service, credentials = self.builder(*key)
+            entry = PooledService(service, credentials)
+            self._entries[key] = entry
+            return entry
+
+    def get_service(self, api_name, api_version, scope, key_file_location, service_account_email):
+        """
+
+        :return: The pooled service for the given parameters
+        """
+        key = self.make_key(api_name, api_version, scope, key_file_location, service_account_email)
+        return self.get_entry(key).service
+
+    def get_http(self, key):
+        """
+
+        :param key: A key made by make_key
+        :return: An authorized Http object owned by the calling thread, or None if the service has no credentials
+        """
+        # the lookup for the Http object is not counted as a separate pool hit
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            entry = self.get_entry(key)
+
+        credentials = entry.credentials
+        if credentials is None:
+            return None
+
+        # refresh the shared access token only when it is missing or has expired
+        with entry.lock:
+            if not credentials.access_token or credentials.access_token_expired:
+                credentials.refresh(httplib2.Http())
+                self.refreshes += 1
+
+        https = getattr(self._local, 'https', None)
+        if https is None:
+            https = self._local.https = {}
+
+        http = https.get(key)
+        if http is None:
+            http = https[key] = credentials.authorize(httplib2.Http())
+        return http
+
+    def stats(self):
+        """
+
+        :return: A dictionary with the hit, miss and token refresh counters of the pool
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "services": len(self._entries)
+            }
+
+    def clear(self):
+        """
+        Drops every pooled service and resets the counters
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.refreshes = 0
+        self._local = threading.local()
+
+
+# One pool per process, shared by every query
+service_pool = ServicePool()
+
+
+def get_service(api_name,
+                api_version,
+                scope,
+                key_file_location,
+                service_account_email):
+    """
+    Get a service that communicates to a Google API from the process wide service pool.
+
+    :return: A service that is connected to the specified API.
+    """
+    return service_pool.get_service(api_name, api_version, scope, key_file_location, service_account_email)
+
+
+def use_fake_service(**options):
+    """
+    Replaces the process wide service pool with one that serves an offline FakeService for every key, so the queries
+    run on deterministic synthetic data without credentials or network access.
+
+    :param options: Keyword arguments of FakeService (latency, row_latency, paths, hostnames, sources, skew, ...)
+    :return: The FakeService, to inspect its request counters
+    """
+    global service_pool
+    service = FakeService(**options)
+    service_pool = ServicePool(builder=lambda *key: (service, None))
     return service
 
 
-def get_account_id(service):
+def get_context_key(context):
+    """
+
+    :param context: A dictionary that contains all information required for the dashboard element.
+    :return: The service pool key for the context
+    """
+    return ServicePool.make_key(context.get("api_name"),
+                                context.get("api_version"),
+                                context.get("scope"),
+                                context.get("key_file_location"),
+                                context.get("svc_account_email"))
+
+
+def get_service_pool_stats():
+    """
+
+    :return: The hit, miss and token refresh counters of the process wide service pool
+    """
+    return service_pool.stats()
+
+
+def get_account_id(service, http=None):
     """
 
     :param service: The service that provides credentials for Google
+    :param http: Optional authorized Http object to send the request with
     :return: List of JSON formated elements with the account information
     """
 
@@ -72,7 +261,7 @@ def get_account_id(service):
     list_accounts = []
 
     # perform API request for account information
-    account = service.management().accounts().list().execute()
+    account = service.management().accounts().list().execute(http=http)
 
     # print(account.get('items'))
     if account.get('items'):
@@ -89,11 +278,12 @@ def get_account_id(service):
     return None
 
 
-def get_profile_id(service, account):
+def get_profile_id(service, account, http=None):
     """
 
     :param service: The service that provides credential for Google
     :param account: A JSON formatted element with all necessary information
+    :param http: Optional authorized Http object to send the requests with
     :return: A 2D list the first array is the properties and the seccond array is the profile ids.
     """
     # Use the Analytics service object to get the first profile id.
@@ -104,7 +294,7 @@ def get_profile_id(service, account):
 
     # Get a list of all the properties for the first account.
     properties = service.management().webproperties().list(
-        accountId=account_id).execute()
+        accountId=account_id).execute(http=http)
 
     # test to see if there is an element to extract
     if properties.get( "items"):
@@ -118,7 +308,7 @@ def get_profile_id(service, account):
             # Get a list of all views (profiles) for the first property.
             profiles = service.management().profiles().list(
                     accountId=account_id,
-                    webPropertyId=property).execute()
+                    webPropertyId=property).execute(http=http)
 
             # if there is an element to extract get the list of Profile IDs
             if profiles.get('items'):
@@ -151,34 +341,348 @@ def get_profile_id_list(profile):
     return profileID
 
 
-def get_results(context):
+# Profile ids hardly ever change, so they are resolved through the Management API at most once per TTL
+profile_cache = ProfileCache(ttl=6 * 60 * 60)
+
+
+def configure_profile_cache(ttl=None, db_path=None):
+    """
+    Replaces the process wide profile cache
+
+    :param ttl: Number of seconds a resolved profile id stays valid, None keeps the current TTL
+    :param db_path: Optional path of a sqlite file used as persistent tier
+    """
+    global profile_cache
+    if ttl is None:
+        ttl = profile_cache.ttl
+    profile_cache = ProfileCache(ttl=ttl, db_path=db_path)
+
+
+def get_profile_cache_key(context):
     """
 
     :param context: A dictionary that contains all information required for the dashboard element.
-    :return: A JSON formatted data element with all required information from Google Analytics.
+    :return: The profile cache key for the credentials of the context
     """
+    return context.get("svc_account_email") + '|' + context.get("key_file_location")
 
-    # get service information about the account
-    service = get_service(context.get("api_name"),
-                           context.get("api_version"),
-                           context.get("scope"),
-                           context.get("key_file_location"),
-                           context.get("svc_account_email")
-                           )
+
+def resolve_profile_id(context, service=None, http=None):
+    """
+    Get the profile (view) id to query. A profile id set on the context is used as is, otherwise the first view of the
+    first property of the first account is resolved through the profile cache and only looked up with the
+    Management API when the cache has no fresh entry.
+
+    :param context: A dictionary that contains all information required for the dashboard element.
+    :param service: Optional service to use for the Management API calls
+    :param http: Optional authorized Http object to use for the Management API calls
+    :return: The profile id as a string
+    """
+    if context.get("profile_id"):
+        return context.get("profile_id")
+
+    key = get_profile_cache_key(context)
+    profile_id = profile_cache.get(key)
+    if profile_id is not None:
+        return profile_id
+
+    if service is None:
+        service = get_service(context.get("api_name"),
+                              context.get("api_version"),
+                              context.get("scope"),
+                              context.get("key_file_location"),
+                              context.get("svc_account_email")
+                              )
+        http = service_pool.get_http(get_context_key(context))
 
     # get account list
-    account = get_account_id(service)
+    account = get_account_id(service, http)
 
     # get profile information aobut the account being inquired
-    profile = get_profile_id(service, account[0])
+    profile = get_profile_id(service, account[0], http)
+
+    profile_id = profile[0][0]
+    profile_cache.set(key, profile_id)
+    return profile_id
+
+
+def list_profile_ids(context, service=None, http=None):
+    """
+    Get the ids of every profile (view) of every web property of every account the credentials of the context can
+    read, through the profile cache.
+
+    :param context: A dictionary that contains the credentials (see get_service)
+    :param service: Optional service to use for the Management API calls
+    :param http: Optional authorized Http object to use for the Management API calls
+    :return: A list of profile ids, in the order of the Management API listings
+    """
+    key = get_profile_cache_key(context) + '|all'
+    profile_ids = profile_cache.get(key)
+    if profile_ids is not None:
+        return profile_ids
+
+    if service is None:
+        service = get_service(context.get("api_name"),
+                              context.get("api_version"),
+                              context.get("scope"),
+                              context.get("key_file_location"),
+                              context.get("svc_account_email")
+                              )
+        http = service_pool.get_http(get_context_key(context))
+
+    profile_ids = []
+    for account in get_account_id(service, http) or []:
+        for property_profile_ids in get_profile_id(service, account, http) or []:
+            profile_ids.extend(property_profile_ids)
 
-    # Send API request to Google Analytics and return the JSON element to the requesting entity
+    profile_cache.set(key, profile_ids)
+    return profile_ids
+
+
+# The Core Reporting API returns at most 10,000 rows per request
+MAX_RESULTS_PER_PAGE = 10000
+
+# Number of report requests sent in one HTTP batch request
+MAX_BATCH_SIZE = 5
+
+# Report responses keyed on the normalized query, shared by every query of the process
+result_cache = ResultCache()
+
+
+def configure_result_cache(**options):
+    """
+    Replaces the process wide report result cache
+
+    :param options: Keyword arguments of ResultCache (max_entries, max_bytes, db_path, fresh_ttl, recent_ttl,
+    settle_days)
+    """
+    global result_cache
+    result_cache = ResultCache(**options)
+
+
+def get_result_cache_stats():
+    """
+
+    :return: The hit, miss and byte counters of the process wide report result cache
+    """
+    return result_cache.stats()
+
+
+# Day partitioned report rows, None queries every report range from the API
+fact_store = None
+
+
+def configure_fact_store(db_path=None, **options):
+    """
+    Replaces the process wide fact store
+
+    :param db_path: Path of the sqlite file of the store, None disables the store
+    :param options: Keyword arguments of FactStore (settle_days, recent_ttl, retention_days)
+    """
+    global fact_store
+    fact_store = FactStore(db_path, **options) if db_path else None
+
+
+def get_fact_store_stats():
+    """
+
+    :return: The sync counters of the process wide fact store, None if it is disabled
+    """
+    return fact_store.stats() if fact_store is not None else None
+
+
+def build_report_request(service, context, profile_id, start_index=None, max_results=None):
+    """
+
+    :param service: The service that provides credentials for Google
+    :param context: A dictionary that contains all information required for the dashboard element.
+    :param profile_id: The profile (view) id to query
+    :param start_index: Optional 1-based index of the first row to return
+    :param max_results: Optional maximum number of rows to return
+    :return: The Core Reporting API request for the context, ready to be executed
+    """
     return service.data().ga().get(
-        ids = 'ga:' + profile[0][0],
+        ids = 'ga:' + profile_id,
         start_date = context.get("st_date"),
         end_date = context.get("end_date"),
         metrics = context.get("api_metric"),
         dimensions = context.get("api_dimension"),
         sort = context.get("sort_key"),
-        filters = context.get("api_filter")
-        ).execute()
+        filters = context.get("api_filter"),
+        start_index = start_index,
+        max_results = max_results
+        )
+
+
+def execute_report(service, http, context, profile_id, start_index=None, max_results=None):
+    """
+    Executes a report request, unless a fresh response for the same normalized query is in the result cache
+
+    :param service: The service that provides credentials for Google
+    :param http: The authorized Http object to send the request with
+    :param context: A dictionary that contains all information required for the dashboard element.
+    :param profile_id: The profile (view) id to query
+    :param start_index: Optional 1-based index of the first row to return
+    :param max_results: Optional maximum number of rows to return
+    :return: The JSON formatted response
+    """
+    normalized = normalize_context(context, profile_id, start_index, max_results)
+    key = make_key(normalized)
+
+    response = result_cache.get(key)
+    if response is None:
+        response = build_report_request(service, context, profile_id, start_index, max_results).execute(http=http)
+        result_cache.set(key, normalized, response)
+    return response
+
+
+def get_results(context):
+    """
+
+    :param context: A dictionary that contains all information required for the dashboard element.
+    :return: A JSON formatted data element with all required information from Google Analytics.
+    """
+
+    # get the pooled service and an Http object owned by this thread
+    service = get_service(context.get("api_name"),
+                           context.get("api_version"),
+                           context.get("scope"),
+                           context.get("key_file_location"),
+                           context.get("svc_account_email")
+                           )
+    http = service_pool.get_http(get_context_key(context))
+
+    # get the profile id, cached between queries
+    profile_id = resolve_profile_id(context, service, http)
+
+    # Send API request to Google Analytics (or read it from the result cache) and return the JSON element
+    return execute_report(service, http, context, profile_id)
+
+
+def get_results_batch(contexts, max_results=None):
+    """
+    Sends the report requests of several contexts through the HTTP batch endpoint, at most MAX_BATCH_SIZE reports per
+    HTTP request, instead of one round-trip per report. Reports found in the result cache are not requested.
+
+    :param contexts: A list of dictionaries that contain all information required for the dashboard elements.
+    :param max_results: Optional maximum number of rows per report
+    :return: A list with the JSON formatted response (first page) of each context, in the order of the contexts
+    """
+    responses = [None] * len(contexts)
+
+    # reports can only share a batch when they are sent through the same service
+    groups = {}
+    for index, context in enumerate(contexts):
+        groups.setdefault(get_context_key(context), []).append(index)
+
+    for key, indices in groups.items():
+        service = service_pool.get_entry(key).service
+        http = service_pool.get_http(key)
+
+        # only the reports without a fresh cached response are sent
+        queries = {}
+        for index in indices:
+            profile_id = resolve_profile_id(contexts[index], service, http)
+            normalized = normalize_context(contexts[index], profile_id, max_results=max_results)
+            cache_key = make_key(normalized)
+
+            responses[index] = result_cache.get(cache_key)
+            if responses[index] is None:
+                queries[index] = (profile_id, normalized, cache_key)
+
+        missing = sorted(queries)
+        for start in range(0, len(missing), MAX_BATCH_SIZE):
+            chunk = missing[start:start + MAX_BATCH_SIZE]
+            errors = []
+
+            def callback(request_id, response, exception):
+                if exception is not None:
+                    errors.append(exception)
+                else:
+                    index = int(request_id)
+                    responses[index] = response
+                    result_cache.set(queries[index][2], queries[index][1], response)
+
+            batch = service.new_batch_http_request(callback=callback)
+            for index in chunk:
+                batch.add(build_report_request(service, contexts[index], queries[index][0], max_results=max_results),
+                          request_id=str(index))
+            batch.execute(http=http)
+
+            if errors:
+                raise errors[0]
+
+    return responses
+
+
+def iter_result_pages(context, page_size=MAX_RESULTS_PER_PAGE, first_page=None):
+    """
+    Generator over every page of a report, so callers never hold more than one page of raw JSON at a time.
+
+    :param context: A dictionary that contains all information required for the dashboard element.
+    :param page_size: Number of rows requested per page, at most MAX_RESULTS_PER_PAGE
+    :param first_page: Optional first page that was already fetched (e.g. by get_results_batch)
+    :return: Yields the JSON formatted response of each page in order
+    """
+    service = get_service(context.get("api_name"),
+                          context.get("api_version"),
+                          context.get("scope"),
+                          context.get("key_file_location"),
+                          context.get("svc_account_email")
+                          )
+    http = service_pool.get_http(get_context_key(context))
+    profile_id = resolve_profile_id(context, service, http)
+
+    page_size = min(page_size, MAX_RESULTS_PER_PAGE)
+    start_index = 1
+    page = first_page
+    while True:
+        if page is None:
+            page = execute_report(service, http, context, profile_id, start_index, page_size)
+        yield page
+
+        # stop on an empty page or once every row of the report has been returned
+        rows = page.get('rows') or []
+        start_index += len(rows)
+        if not rows or start_index > page.get('totalResults', 0):
+            break
+        page = None
+
+
+def get_frame(context, page_size=MAX_RESULTS_PER_PAGE, first_page=None):
+    """
+    Fetches every page of a report and streams the rows into typed column buffers.
+
+    :param context: A dictionary that contains all information required for the dashboard element.
+    :param page_size: Number of rows requested per page, at most MAX_RESULTS_PER_PAGE
+    :param first_page: Optional first page that was already fetched (e.g. by get_results_batch)
+    :return: A DataFrame with one column per columnHeaders element, typed from its dataType
+    """
+    accumulator = None
+    for page in iter_result_pages(context, page_size, first_page):
+        if accumulator is None:
+            accumulator = ColumnAccumulator(page.get('columnHeaders'), page.get('totalResults', 0))
+        accumulator.append(page.get('rows'))
+    return accumulator.to_frame()
+
+
+def get_frames(contexts, page_size=MAX_RESULTS_PER_PAGE):
+    """
+    Fetches the reports of several independent contexts. The first page of every report is requested in batches,
+    only reports larger than one page need further requests.
+
+    :param contexts: A list of dictionaries that contain all information required for the dashboard elements.
+    :param page_size: Number of rows requested per page, at most MAX_RESULTS_PER_PAGE
+    :return: A list with one DataFrame per context, in the order of the contexts
+    """
+    page_size = min(page_size, MAX_RESULTS_PER_PAGE)
+    first_pages = get_results_batch(contexts, max_results=page_size)
+
+    frames = []
+    for index, context in enumerate(contexts):
+        frames.append(get_frame(context, page_size, first_pages[index]))
+
+        # drop the raw first page as soon as it has been accumulated
+        first_pages[index] = None
+
+    return frames
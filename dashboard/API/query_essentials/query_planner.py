@@ -0,0 +1,224 @@
+"""
+file: query_planner.py
+created: 10/18/2026
+
+Collects the report queries of one dashboard build and merges the ones that only differ in their metrics (same
+dimensions, period, filters and profile) into a single report, up to MAX_METRICS metrics per report. The columns of
+each merged report are fanned back out to the queries it replaces.
+"""
+
+from collections import OrderedDict
+from functools import partial
+
+from dashboard.API.query_essentials import query_basic
+from dashboard.API.query_essentials.result_cache import split_fields
+
+
+# Maximum number of metrics of one Core Reporting API query
+MAX_METRICS = 10
+
+# Context entries that do not change which rows and columns are returned, besides the metrics
+MERGEABLE_ENTRIES = ('api_metric', 'sort_key')
+
+
+def get_fields(value):
+    """
+
+    :param value: A string of comma separated dimensions or metrics
+    :return: The list of names without surrounding whitespace, in their original order
+    """
+    if not value:
+        return []
+    return [field.strip() for field in value.split(',') if field.strip()]
+
+
+def get_merge_key(context):
+    """
+
+    :param context: A dictionary that contains all information required for the dashboard element.
+    :return: A key shared by the contexts that can be answered by one report
+    """
+    key = []
+    for name in sorted(context):
+        if name in MERGEABLE_ENTRIES:
+            continue
+        value = context[name]
+        if name == 'api_dimension':
+            value = tuple(split_fields(value))
+        elif name == 'api_filter':
+            value = (value or '').strip() or None
+        key.append((name, value))
+    return tuple(key)
+
+
+def get_period_key(context):
+    """
+
+    :param context: A dictionary that contains all information required for the dashboard element.
+    :return: The merge key without the period, shared by the merged reports that are fetched in the same batch
+    """
+    return tuple((name, value) for name, value in get_merge_key(context) if name not in ('st_date', 'end_date'))
+
+
+def sort_frame(frame, sort_key):
+    """
+    Sorts a data frame the way the Core Reporting API sorts a report
+
+    :param frame: A report data frame
+    :param sort_key: A string of comma separated metrics/dimensions, a '-' in front of a name sorts it descending
+    :return: The sorted data frame
+    """
+    fields = get_fields(sort_key)
+    if not fields:
+        return frame
+
+    columns = [field.lstrip('-') for field in fields]
+    ascending = [not field.startswith('-') for field in fields]
+    return frame.sort_values(by=columns, ascending=ascending, kind='mergesort')
+
+
+class PlannedQuery(object):
+    """
+    One merged report and the queries (tickets) it answers
+    """
+
+    def __init__(self, context, tickets):
+        self.context = context
+        self.tickets = tickets
+
+
+class QueryPlanner(object):
+    """
+    Merges the report queries that differ only in their metrics and fans the merged reports back out
+    """
+
+    def __init__(self, max_metrics=MAX_METRICS):
+        """
+
+        :param max_metrics: Maximum number of metrics of one merged report
+        """
+        self.max_metrics = max_metrics
+        self.contexts = []
+
+        # Format: [[PlannedQuery, ...], ...], the queries of one batch only differ in their period
+        self.batches = []
+        # Format: {ticket: index of the batch answering it}
+        self.batch_index = {}
+
+    def add(self, context):
+        """
+        Registers a query
+
+        :param context: A dictionary that contains all information required for the dashboard element.
+        :return: The ticket of the query, used to get its data frame from the output of fetch
+        """
+        if len(get_fields(context.get('api_metric'))) > self.max_metrics:
+            raise ValueError('A query can not request more than %d metrics' % self.max_metrics)
+
+        self.contexts.append(context)
+        return len(self.contexts) - 1
+
+    def plan(self):
+        """
+        Merges the registered queries into as few reports as possible
+
+        :return: The list of batches (see batches)
+        """
+        groups = OrderedDict()
+        for ticket, context in enumerate(self.contexts):
+            groups.setdefault(get_merge_key(context), []).append(ticket)
+
+        queries = []
+        for tickets in groups.values():
+            # first fit: each query lands in the first merged report with room for its new metrics
+            bins = []
+            for ticket in tickets:
+                metrics = get_fields(self.contexts[ticket].get('api_metric'))
+                for metric_bin in bins:
+                    new_metrics = [metric for metric in metrics if metric not in metric_bin['metrics']]
+                    if len(metric_bin['metrics']) + len(new_metrics) <= self.max_metrics:
+                        metric_bin['metrics'].extend(new_metrics)
+                        metric_bin['tickets'].append(ticket)
+                        break
+                else:
+                    bins.append({'metrics': list(metrics), 'tickets': [ticket]})
+
+            for metric_bin in bins:
+                context = dict(self.contexts[metric_bin['tickets'][0]])
+                context['api_metric'] = ','.join(metric_bin['metrics'])
+                queries.append(PlannedQuery(context, metric_bin['tickets']))
+
+        batches = OrderedDict()
+        for query in queries:
+            batches.setdefault(get_period_key(query.context), []).append(query)
+
+        self.batches = list(batches.values())
+        self.batch_index = {}
+        for index, batch in enumerate(self.batches):
+            for query in batch:
+                for ticket in query.tickets:
+                    self.batch_index[ticket] = index
+
+        return self.batches
+
+    def fan_out(self, query, frame):
+        """
+        Splits a merged report into the data frames of the queries it answers
+
+        :param query: A PlannedQuery
+        :param frame: The data frame of the merged report
+        :return: A dictionary with the data frame of every ticket of the query
+        """
+        merged_metrics = get_fields(query.context.get('api_metric'))
+
+        frames = {}
+        for ticket in query.tickets:
+            context = self.contexts[ticket]
+            dimensions = get_fields(context.get('api_dimension'))
+            metrics = get_fields(context.get('api_metric'))
+
+            result = frame[dimensions + metrics]
+            if len(metrics) < len(merged_metrics):
+                # the API leaves out the rows whose metrics are all zero, so do the same for the columns kept
+                result = result[(result[metrics] != 0).any(axis=1)]
+            if context.get('sort_key') != query.context.get('sort_key'):
+                result = sort_frame(result, context.get('sort_key'))
+
+            frames[ticket] = result.reset_index(drop=True)
+        return frames
+
+    def fetch(self, batch, page_size=query_basic.MAX_RESULTS_PER_PAGE):
+        """
+        Fetches the merged reports of one batch, their first pages in one HTTP batch request. Reports of additive
+        metrics are read from the fact store when it is enabled (see query_basic.configure_fact_store).
+
+        :param batch: One of the batches returned by plan
+        :param page_size: Maximum number of rows per request
+        :return: A dictionary with the data frame of every ticket answered by the batch
+        """
+        contexts = [query.context for query in batch]
+
+        store = query_basic.fact_store
+        if store is not None and all(store.can_answer(context) for context in contexts):
+            # summed from the stored days, only the days missing from the store are downloaded
+            reports = store.get_frames(contexts, partial(query_basic.get_frames, page_size=page_size))
+            reports = [sort_frame(report, context.get('sort_key')).reset_index(drop=True)
+                       for report, context in zip(reports, contexts)]
+        else:
+            reports = query_basic.get_frames(contexts, page_size)
+
+        frames = {}
+        for query, frame in zip(batch, reports):
+            frames.update(self.fan_out(query, frame))
+        return frames
+
+    def stats(self):
+        """
+
+        :return: A dictionary with the number of registered queries and of merged reports
+        """
+        return {
+            "queries": len(self.contexts),
+            "reports": sum(len(batch) for batch in self.batches),
+            "batches": len(self.batches)
+        }
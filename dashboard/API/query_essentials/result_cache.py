@@ -0,0 +1,269 @@
+"""
+file: result_cache.py
+created: 10/18/2026
+
+Caches Core Reporting API responses under a key built from the normalized query, in an in-memory LRU tier and an
+optional sqlite tier. Reports over closed historical ranges never change and are kept forever, reports that touch
+the most recent days are only kept for a short time.
+"""
+
+from collections import OrderedDict
+from contextlib import closing
+import datetime
+import hashlib
+import json
+import os.path
+import sqlite3
+import threading
+import time
+import zlib
+
+from dashboard.API.query_essentials.dates import resolve_date, format_date
+
+
+def split_fields(value):
+    """
+
+    :param value: A string of comma separated dimensions or metrics
+    :return: The sorted list of names without surrounding whitespace
+    """
+    if not value:
+        return []
+    return sorted(field.strip() for field in value.split(',') if field.strip())
+
+
+def normalize_context(context, profile_id, start_index=None, max_results=None, today=None):
+    """
+    Builds the canonical form of a report query: dimensions and metrics are sorted, filters and sort are stripped and
+    relative dates (today, yesterday, NdaysAgo) are resolved to absolute dates.
+
+    :param context: A dictionary that contains all information required for the dashboard element.
+    :param profile_id: The profile (view) id the report is requested for
+    :param start_index: Optional 1-based index of the first row of the page
+    :param max_results: Optional maximum number of rows of the page
+    :param today: Optional datetime.date used to resolve relative dates
+    :return: A dictionary describing the query
+    """
+    return {
+        "profile_id": profile_id,
+        "st_date": format_date(resolve_date(context.get("st_date"), today)),
+        "end_date": format_date(resolve_date(context.get("end_date"), today)),
+        "api_metric": split_fields(context.get("api_metric")),
+        "api_dimension": split_fields(context.get("api_dimension")),
+        "sort_key": (context.get("sort_key") or '').replace(' ', ''),
+        "api_filter": (context.get("api_filter") or '').strip(),
+        "start_index": start_index or 1,
+        "max_results": max_results
+    }
+
+
+def make_key(normalized):
+    """
+
+    :param normalized: A query normalized by normalize_context
+    :return: The cache key of the query
+    """
+    return hashlib.sha1(json.dumps(normalized, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ResultCache(object):
+    """
+    Two tier (memory LRU, optional sqlite) cache of report responses with freshness rules based on the date range.
+    """
+
+    def __init__(self,
+                 max_entries=256,
+                 max_bytes=256 * 1024 * 1024,
+                 db_path=None,
+                 fresh_ttl=15 * 60,
+                 recent_ttl=6 * 60 * 60,
+                 settle_days=2,
+                 clock=time.time):
+        """
+
+        :param max_entries: Number of responses kept in the memory tier
+        :param max_bytes: Size of the responses kept in the memory tier, in bytes of their JSON encoding, None only
+        limits the number of responses
+        :param db_path: Optional path of the sqlite file used as persistent tier, None keeps responses in memory only
+        :param fresh_ttl: Seconds a report whose range includes today stays valid
+        :param recent_ttl: Seconds a report ending within the last settle_days days stays valid, Google Analytics
+        may still be processing the data of those days
+        :param settle_days: Number of days after which the data of a day no longer changes
+        :param clock: Callable returning the current time in seconds
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.db_path = db_path
+        self.fresh_ttl = fresh_ttl
+        self.recent_ttl = recent_ttl
+        self.settle_days = settle_days
+        self.clock = clock
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bytes_served = 0
+        self.bytes_stored = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._memory_bytes = 0
+        self._purged = None
+
+        if self.db_path:
+            self._init_db()
+
+    def _connect(self):
+        # closed on exit, the inner "with conn" commits
+        return closing(sqlite3.connect(self.db_path, timeout=30))
+
+    def _init_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        with self._connect() as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS result_cache "
+                         "(key TEXT PRIMARY KEY, expires REAL, stored REAL NOT NULL, payload BLOB NOT NULL)")
+
+    def get_ttl(self, normalized, today=None):
+        """
+
+        :param normalized: A query normalized by normalize_context
+        :param today: Optional datetime.date of today
+        :return: The number of seconds the response stays valid, None if it never expires
+        """
+        if today is None:
+            today = datetime.date.today()
+
+        end_date = datetime.datetime.strptime(normalized["end_date"], '%Y-%m-%d').date()
+        if end_date >= today:
+            return self.fresh_ttl
+        if end_date >= today - datetime.timedelta(days=self.settle_days):
+            return self.recent_ttl
+        return None
+
+    def get(self, key):
+        """
+
+        :param key: A key made by make_key
+        :return: The cached response, or None if it is missing or expired
+        """
+        now = self.clock()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                response, expires, size = entry
+                if expires is None or now < expires:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    self.bytes_served += size
+                    return response
+                self._evict(key)
+
+        if self.db_path:
+            with self._connect() as conn, conn:
+                row = conn.execute("SELECT payload, expires FROM result_cache WHERE key = ?", (key,)).fetchone()
+
+            if row is not None and (row[1] is None or now < row[1]):
+                payload = zlib.decompress(row[0])
+                response = json.loads(payload.decode('utf-8'))
+                with self._lock:
+                    self.disk_hits += 1
+                    self.bytes_served += len(payload)
+                    self._remember(key, response, row[1], len(payload))
+                return response
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, normalized, response):
+        """
+
+        :param key: A key made by make_key
+        :param normalized: The normalized query of the response, used for the freshness rules
+        :param response: The JSON formatted response
+        """
+        ttl = self.get_ttl(normalized)
+        stored = self.clock()
+        expires = None if ttl is None else stored + ttl
+        payload = json.dumps(response).encode('utf-8')
+
+        with self._lock:
+            self.bytes_stored += len(payload)
+            self._remember(key, response, expires, len(payload))
+
+            # relative dates are resolved into the keys, so every day adds new rows: drop the expired ones at most
+            # once per fresh_ttl
+            purge = self._purged is None or stored - self._purged >= self.fresh_ttl
+            if purge:
+                self._purged = stored
+
+        if self.db_path:
+            with self._connect() as conn, conn:
+                conn.execute("INSERT OR REPLACE INTO result_cache (key, expires, stored, payload) VALUES (?, ?, ?, ?)",
+                             (key, expires, stored, sqlite3.Binary(zlib.compress(payload))))
+            if purge:
+                self.purge_expired()
+
+    def _remember(self, key, response, expires, size):
+        # caller holds the lock
+        if key in self._entries:
+            self._evict(key)
+        self._entries[key] = (response, expires, size)
+        self._memory_bytes += size
+
+        # least recently used first, until both limits hold
+        while self._entries and (len(self._entries) > self.max_entries or
+                                 (self.max_bytes is not None and self._memory_bytes > self.max_bytes)):
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key):
+        # caller holds the lock
+        self._memory_bytes -= self._entries.pop(key)[2]
+
+    def purge_expired(self):
+        """
+        Removes the expired responses from the sqlite tier, called by set at most once per fresh_ttl
+        """
+        if self.db_path:
+            with self._connect() as conn, conn:
+                conn.execute("DELETE FROM result_cache WHERE expires IS NOT NULL AND expires <= ?", (self.clock(),))
+
+    def clear(self):
+        """
+        Drops every cached response
+        """
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+
+        if self.db_path:
+            with self._connect() as conn, conn:
+                conn.execute("DELETE FROM result_cache")
+
+    def stats(self):
+        """
+
+        :return: A dictionary with the hit, miss and byte counters of the cache
+        """
+        with self._lock:
+            stats = {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bytes_served": self.bytes_served,
+                "bytes_stored": self.bytes_stored,
+                "memory_entries": len(self._entries),
+                "memory_bytes": self._memory_bytes
+            }
+
+        if self.db_path:
+            with self._connect() as conn, conn:
+                row = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM result_cache").fetchone()
+            stats["disk_entries"] = row[0]
+            stats["disk_bytes"] = row[1]
+
+        return stats
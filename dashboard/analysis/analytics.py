@@ -5,28 +5,107 @@ created: Feb 5, 2017
 '''
 
 from dashboard.API.query_essentials import query_basic as api
+from dashboard.API.query_essentials.dates import resolve_date, resolve_period, format_date
+from dashboard.API.query_essentials.query_planner import QueryPlanner
+from dashboard.analysis import channels
+from dashboard.analysis.comparison import compare_periods, compare_totals
+from dashboard.analysis.scheduler import StageScheduler
+from dashboard.analysis.frames import combine_periods, select_top, sum_by, to_labels
+from dashboard.analysis.path_dictionary import PathDictionary
+from dashboard.analysis.results import (ExecOverview, TrafficChanges, BounceRates, BounceRatesDetail, Sources,
+                                        result_property)
+from collections import OrderedDict
+from functools import partial
+import copy
 import os.path
 import pandas as pd
 import numpy as np
 import logging
+import threading
+
+
+ACTIVITY_LOG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), 'logs', 'activity.log'))
+
+activity_log_lock = threading.Lock()
+
+
+def get_activity_log():
+    '''
+    :return: The ACTIVITY logger, its file handler is added once per process however many analyses are created
+    '''
+    activity_log = logging.getLogger('ACTIVITY')
+    with activity_log_lock:
+        if not any(getattr(handler, 'baseFilename', None) == ACTIVITY_LOG_PATH for handler in activity_log.handlers):
+            activity_handler = logging.FileHandler(ACTIVITY_LOG_PATH)
+            activity_handler.setLevel(logging.DEBUG)
+            activity_handler.setFormatter(logging.Formatter('%(asctime)s <%(funcName)s>: %(message)s'))
+            activity_log.setLevel(logging.DEBUG)
+            activity_log.addHandler(activity_handler)
+    return activity_log
 
 
 class Analytics(object):
-    def __init__(self):
+    # TOP_N TRAFFIC SPIKES/DROPS SUMMARY
+    # Format (Index = ga:pagePath):
+    # |  ga:pagePath   |   ga:pageviews_prev   |   ga:pageviews_prev   |   Delta   |   Delta_%   |
+    top_n_spikes = result_property('tts_ttd', 'spikes')
+    top_n_drops = result_property('tts_ttd', 'drops')
+
+    # TOP_N TRAFFIC SPIKES/DROPS DETAIL
+    # Format (Index = ga:pagePath, ga:source):
+    # |  ga:pagePath   |    ga:source  |   ga:pageviews_prev   |   ga:pageviews_prev   |   Delta   |
+    top_n_spikes_src = result_property('tts_ttd_src', 'spikes')
+    top_n_drops_src = result_property('tts_ttd_src', 'drops')
+
+    # AVERAGE SITE BOUNCE RATE
+    bounce_rate_mean = result_property('bounce_rates', 'mean')
+
+    # TOP N HIGHEST/LOWEST BOUNCE RATES SUMMARY
+    # Format (Index = ga:pagePath):
+    # | ga:pagePath | ga:bounces | ga:sessions | ga:goalCompletionsAll | bounceRate | goalConversionRateAll | fromAvrg% |
+    highest_n_br = result_property('bounce_rates', 'highest')
+    lowest_n_br = result_property('bounce_rates', 'lowest')
+
+    # TOP N HIGHEST/LOWEST BOUNCE RATES DETAIL
+    # Format (Index = ga:pagePath, ga:source):
+    # |ga:pagePath | ga:source | ga:bounces	| ga:sessions | ga:goalCompletionsAll | bounceRate | goalConversionRateAll | fromAvrg% |
+    highest_n_br_src = result_property('bounce_rates_src', 'highest')
+    lowest_n_br_src = result_property('bounce_rates_src', 'lowest')
+
+    # TRAFFIC SOURCE SUMMARY
+    # Format (Index = category):
+    # | category | ga:sessions_prev | ga:goalCompletionsAll_prev | ga:sessions_curr | ga:goalCompletionsAll_curr | sessionsChangeRate | goalCompletionsChangeRate | goalConversionRateAll_curr | goalConversionRateAll_prev
+    srcs_summary = result_property('sources', 'summary')
+
+    # TRAFFIC SOURCE DETAIL
+    # Format (Index = category, source):
+    # | category | source | ga:sessions_prev | ga:goalCompletionsAll_prev | ga:sessions_curr | ga:goalCompletionsAll_curr | sessionsChangeRate | goalCompletionsChangeRate | goalConversionRateAll_curr | goalConversionRateAll_prev
+    srcs_detail = result_property('sources', 'detail')
+
+    # EXECUTIVE OVERVIEW
+    # Format: (previous total, current total), percentage change
+    # -VISITORS
+    exec_ov_visitors_delta = result_property('exec_overview', 'visitors')
+    exec_ov_visitors_delta_perc = result_property('exec_overview', 'visitors_perc')
+    # -VISITS
+    exec_ov_visits_delta = result_property('exec_overview', 'visits')
+    exec_ov_visits_delta_perc = result_property('exec_overview', 'visits_perc')
+    #  -PAGEVIEWS
+    exec_ov_pageviews_delta = result_property('exec_overview', 'pageviews')
+    exec_ov_pageviews_delta_perc = result_property('exec_overview', 'pageviews_perc')
+    #  -GOAL COMPLETIONS
+    exec_ov_goals_delta = result_property('exec_overview', 'goals')
+    exec_ov_goals_delta_perc = result_property('exec_overview', 'goals_perc')
+    #  -EVENTS
+    exec_ov_events_delta = result_property('exec_overview', 'events')
+    exec_ov_events_delta_perc = result_property('exec_overview', 'events_perc')
+
+    def __init__(self, profile_id=None, max_workers=6):
         super(Analytics, self).__init__()
         # UN-COMMENT TO DISABLE LOGGING
         #logging.disable(logging.CRITICAL)
 
-        formatter = logging.Formatter('%(asctime)s <%(funcName)s>: %(message)s')
-
-        self.activity_log = logging.getLogger('ACTIVITY')
-        self.activity_log.setLevel(logging.DEBUG)
-        #self.activity_handler = logging.FileHandler(os.path.dirname(os.path.abspath(__file__)) + '/activity.log')
-        ACTIVITY_LOG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), 'logs', 'activity.log'))
-        self.activity_handler = logging.FileHandler(ACTIVITY_LOG_PATH)
-        self.activity_handler.setLevel(logging.DEBUG)
-        self.activity_handler.setFormatter(formatter)
-        self.activity_log.addHandler(self.activity_handler)
+        self.activity_log = get_activity_log()
 
         self.activity_log.debug('Initializing Analytics object')
 
@@ -35,63 +114,33 @@ class Analytics(object):
         self.period_current = {'START': '31daysAgo', 'END': 'yesterday'}
         self.period_previous = {'START': '61daysAgo', 'END': '31daysAgo'}
 
+        # GOOGLE ANALYTICS VIEW (PROFILE) ID
+        # None resolves the default view through the profile cache of the query layer
+        self.profile_id = profile_id
+
+        # NUMBER OF STAGES (QUERIES AND COMPUTATIONS) RUNNING AT THE SAME TIME
+        self.max_workers = max_workers
+
+        # STAGE TIMINGS OF THE LAST RUNS
+        # Format: {stage name: {'start': seconds, 'end': seconds, 'seconds': duration, 'thread': thread name}}
+        self.stage_timings = {}
+
+        # DATES READ BY THE STAGES OF THE LAST RUNS
+        # Format: {stage name: frozenset of (start date, end date)}, see update_periods
+        self.stage_dates = {}
+        self.schedule_dates = {}
+
+        # PAGE PATHS OF THE LAST BUILD
+        # The compute stages work on integer path codes, see build_schedule
+        self.paths = None
+
         # ANALYSIS RESTRICTIONS
         self.restrictions = {"threshold_%": 18, "top_n": 5}
 
-        # TOP_N TRAFFIC SPIKES/DROPS SUMMARY
-        # Format (Index = ga:pagePath):
-        # |  ga:pagePath   |   ga:pageviews_prev   |   ga:pageviews_prev   |   Delta   |   Delta_%   |
-        self.top_n_spikes = None
-        self.top_n_drops = None
-
-        # TOP_N TRAFFIC SPIKES/DROPS DETAIL
-        # Format (Index = ga:pagePath, ga:source):
-        # |  ga:pagePath   |    ga:source  |   ga:pageviews_prev   |   ga:pageviews_prev   |   Delta   |
-        self.top_n_spikes_src = None
-        self.top_n_drops_src = None
-
-        # AVERAGE SITE BOUNCE RATE
-        self.bounce_rate_mean = None
-
-        # TOP N HIGHEST/LOWEST BOUNCE RATES SUMMARY
-        # Format (Index = ga:pagePath):
-        # | ga:pagePath | ga:bounces | ga:sessions | ga:goalCompletionsAll | bounceRate | goalConversionRateAll | fromAvrg% |
-        self.highest_n_br = None
-        self.lowest_n_br = None
-
-        # TOP N HIGHEST/LOWEST BOUNCE RATES DETAIL
-        # Format (Index = ga:pagePath, ga:source):
-        # |ga:pagePath | ga:source | ga:bounces	| ga:sessions | ga:goalCompletionsAll | bounceRate | goalConversionRateAll | fromAvrg% |
-        self.highest_n_br_src = None
-        self.lowest_n_br_src = None
-
-        # TRAFFIC SOURCE SUMMARY
-        # Format (Index = category):
-        # | category | ga:sessions_prev | ga:goalCompletionsAll_prev | ga:sessions_curr | ga:goalCompletionsAll_curr | sessionsChangeRate | goalCompletionsChangeRate | goalConversionRateAll_curr | goalConversionRateAll_prev
-        self.srcs_summary = None
-
-        # TRAFFIC SOURCE DETAIL
-        # Format (Index = category, source):
-        # | category | source | ga:sessions_prev | ga:goalCompletionsAll_prev | ga:sessions_curr | ga:goalCompletionsAll_curr | sessionsChangeRate | goalCompletionsChangeRate | goalConversionRateAll_curr | goalConversionRateAll_prev
-        self.srcs_detail = None
-
-
-        # EXECUTIVE OVERVIEW
-        # -VISITORS
-        self.exec_ov_visitors_delta = None
-        self.exec_ov_visitors_delta_perc = None
-        # -VISITS
-        self.exec_ov_visits_delta = None
-        self.exec_ov_visits_delta_perc = None
-        #  -PAGEVIEWS
-        self.exec_ov_pageviews_delta = None
-        self.exec_ov_pageviews_delta_perc = None
-        #  -GOAL COMPLETIONS
-        self.exec_ov_goals_delta = None
-        self.exec_ov_goals_delta_perc = None
-        #  -EVENTS
-        self.exec_ov_events_delta = None
-        self.exec_ov_events_delta_perc = None
+        # RESULTS OF THE COMPUTE STAGES
+        # Format: {compute stage name: immutable record of its data frames (see results)}, read through the
+        # properties of the class. The report frames a stage worked on are released when it returns.
+        self.results = {}
 
         #self.csv_directory = os.path.dirname(os.path.abspath(__file__)) + '/static/csv/'
         self.csv_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), 'static', 'csv'))
@@ -130,6 +179,7 @@ class Analytics(object):
             "scope": "https://www.googleapis.com/auth/analytics.readonly",
             "svc_account_email": svc_account,
             "key_file_location": creds_path,
+            "profile_id": self.profile_id,
             "st_date": period['START'],
             "end_date": period['END'],
             "api_metric": metrics,
@@ -138,163 +188,327 @@ class Analytics(object):
             "api_filter": filters
         }
 
-    def gen_tts_ttd(self):
+    def get_period_contexts(self, dimensions, metrics, sort_key = None, filters = None):
         '''
-        Generates TOP_N TRAFFIC SPIKES/DROPS summary and detail data frames.
+        Generates the contexts of the same query for the current and the previous period
+
+        :param dimensions: A string of comma separated dimensions to include in the query
+        :param metrics: A string of comma separated metrics to include in the query
+        :param sort_key: A string defining the sort parameter (metric/dimension) for the query
+        :param filters: A string of filters to apply to the query
+
+        :return: A list with the context for the current period followed by the context for the previous period
         '''
-        self.activity_log.debug('Generating tts & ttd summary data')
+        return [self.get_ga_api_context(self.period_current, dimensions, metrics, sort_key, filters),
+                self.get_ga_api_context(self.period_previous, dimensions, metrics, sort_key, filters)]
 
-        #call = d3a.get_client_api_call_context()
-        context = self.get_ga_api_context(period = self.period_current,
-                                          dimensions = 'ga:pagePath, ga:hostname',
-                                          metrics = 'ga:pageviews',
-                                          sort_key = '-ga:pageviews'
-                                          )
-        values = api.get_results(context)
-
-        # Get column names
-        headers = values.get('columnHeaders')
-        col_names = []
-        for header in headers:
-            col_names.append(header.get('name'))
-
-        # Get data for current period
-        page_views_current = pd.DataFrame(values.get("rows"), columns=col_names)
-
-        # Update call for second period
-        context["st_date"] = self.period_previous['START']
-        context["end_date"] = self.period_previous['END']
-        values = api.get_results(context)
-
-        # Get data for previous period
-        page_views_previous = pd.DataFrame(values.get("rows"), columns=col_names)
-
-        # Append hostname to pagePath
-        page_views_previous['ga:pagePath'] = page_views_previous['ga:hostname'].map(str) \
-                                             + page_views_previous['ga:pagePath']
-        page_views_current['ga:pagePath'] = page_views_current['ga:hostname'].map(str) \
-                                            + page_views_current['ga:pagePath']
+    def get_flight_key(self, period_current=None, period_previous=None):
+        '''
+        Relative dates are resolved, so the key changes with the day
 
-        # Drop hostname column
-        page_views_previous.drop('ga:hostname', axis=1, inplace=True)
-        page_views_current.drop('ga:hostname', axis=1, inplace=True)
+        :param period_current: Optional current period, defaults to the current period of the analysis
+        :param period_previous: Optional previous period, defaults to the previous period of the analysis
+        :return: The key shared by the analyses of the same profile and periods (see singleflight)
+        '''
+        period_current = period_current or self.period_current
+        period_previous = period_previous or self.period_previous
+        dates = [period_current['START'], period_current['END'],
+                 period_previous['START'], period_previous['END']]
+        return '|'.join([self.profile_id or 'default'] + [format_date(resolve_date(date)) for date in dates])
 
-        # Outer merge: Everything from both periods (previous first)
-        page_views_full = page_views_previous.merge(right=page_views_current,
-                                                    how='outer',
-                                                    on=['ga:pagePath'],
-                                                    suffixes=['_prev', '_curr'])
+    def build_schedule(self):
+        '''
+        Declares every query and compute stage of the dashboard together with the stages it reads from.
+        The queries are merged by a QueryPlanner, every batch of merged reports is a stage of its own and the
+        data stages pick their columns from the reports. Reports only depend on the periods, so they all run
+        concurrently, the compute stages wait for their inputs.
 
-        # Replace all NaN values with zero
-        # and Convert page views to numeric
-        #page_views_full.fillna(value=0, axis=0, inplace=True)
-        page_views_full[['ga:pageviews_prev', 'ga:pageviews_curr']] = page_views_full[
-            ['ga:pageviews_prev', 'ga:pageviews_curr']].fillna(0.0).astype(int)
+        :return: A StageScheduler holding the dashboard stages
+        '''
+        schedule = StageScheduler(max_workers=self.max_workers)
+
+        # Every hostname + page path of the build is interned once
+        self.paths = PathDictionary()
+
+        # QUERIES
+        # Format: {data stage name: context or list of contexts}
+        queries = OrderedDict([
+            ('exec_overview_data', self.query_exec_overview()),
+            ('page_views', self.query_page_views()),
+            ('page_views_src', self.query_page_views_src()),
+            ('current_page_views', self.query_current_page_views()),
+            ('bounces', self.query_bounces()),
+            ('bounces_src', self.query_bounces_src()),
+            ('sources_data', self.query_sources())
+        ])
+
+        planner = QueryPlanner()
+        tickets = OrderedDict()
+        for name, contexts in queries.items():
+            if isinstance(contexts, list):
+                tickets[name] = [planner.add(context) for context in contexts]
+            else:
+                tickets[name] = planner.add(contexts)
+
+        # MERGED REPORTS
+        for index, batch in enumerate(planner.plan()):
+            schedule.add('reports_%d' % index, partial(planner.fetch, batch))
+        self.activity_log.debug('Query plan: %(queries)d queries, %(reports)d reports, %(batches)d batches',
+                                planner.stats())
+
+        # DATA STAGES
+        # Format: {data stage name: frozenset of the (start date, end date) of its queries}
+        query_dates = {}
+        for name, contexts in queries.items():
+            query_dates[name] = frozenset((format_date(resolve_date(context['st_date'])),
+                                           format_date(resolve_date(context['end_date'])))
+                                          for context in (contexts if isinstance(contexts, list) else [contexts]))
+
+        for name, ticket in tickets.items():
+            inputs = sorted(set('reports_%d' % planner.batch_index[each]
+                                for each in (ticket if isinstance(ticket, list) else [ticket])))
+            schedule.add(name, partial(self.pick_frames, ticket), inputs=inputs)
+
+        # COMPUTE STAGES
+        schedule.add('exec_overview', self.compute_exec_overview, inputs=['exec_overview_data'])
+        schedule.add('tts_ttd', self.compute_tts_ttd, inputs=['page_views'])
+        schedule.add('tts_ttd_src', self.compute_tts_ttd_src, inputs=['tts_ttd', 'page_views_src'])
+        schedule.add('above_avrg_paths', self.compute_above_avrg_paths, inputs=['current_page_views'])
+        schedule.add('bounce_rates', self.compute_bounce_rates, inputs=['above_avrg_paths', 'bounces'])
+        schedule.add('bounce_rates_src', self.compute_bounce_rates_src, inputs=['bounce_rates', 'bounces_src'])
+        schedule.add('sources', self.compute_sources, inputs=['sources_data'])
+
+        # DATES READ BY EVERY STAGE, through the data stages it depends on
+        self.schedule_dates = OrderedDict(
+            (name, frozenset(dates for each in schedule.resolve([name]) for dates in query_dates.get(each, ())))
+            for name in schedule.stages)
+
+        return schedule
+
+    def pick_frames(self, ticket, *reports):
+        '''
+        Picks the data frames of a data stage from the outputs of the merged report stages
 
-        # Filter infusion soft path (remove everything after ?inf_contact or &inf_contact_key in path
-        page_views_full['ga:pagePath'].replace(r"\?inf_contact_key.*|&inf_contact_key.*", r"", regex = True, inplace = True)
+        :param ticket: The ticket, or list of tickets, of the data stage queries
+        :param reports: The outputs of the report stages answering the tickets
+        :return: The data frame of the ticket, or the list of data frames of the tickets
+        '''
+        frames = {}
+        for report in reports:
+            frames.update(report)
 
-        # Sum up unique paths into one row
-        page_views_full = page_views_full.groupby('ga:pagePath', as_index=False, sort=False).sum()
+        if isinstance(ticket, list):
+            return [frames[each] for each in ticket]
+        return frames[ticket]
 
-        # Add the delta value from prev to curr page views
-        page_views_full.loc[:, 'Delta'] = page_views_full['ga:pageviews_curr'] - page_views_full['ga:pageviews_prev']
+    def label_detail(self, frame):
+        '''
+        Decodes the path codes of a detail data frame, sorts it and indexes it by page path and source
 
-        # Sort by delta values
-        page_views_full.sort_values(['Delta'], ascending=False, inplace=True)
+        :param frame: A data frame with path codes in ga:pagePath and a ga:source column
+        :return: The data frame indexed by page path and source
+        '''
+        self.paths.decode_columns(frame, ['ga:pagePath'])
+        to_labels(frame, ['ga:source'])
+        frame = frame.sort_values(['ga:pagePath', 'ga:source'], kind='mergesort')
+        return frame.set_index(['ga:pagePath', 'ga:source'])
 
-        # Add delta percentage rounded to two dec places
-        page_views_full.loc[:, 'Delta_%'] = round((page_views_full['Delta'] / page_views_full['ga:pageviews_prev']) * 100, 2)
+    def run_stages(self, targets=None, schedule=None):
+        '''
+        Runs the given stages and every stage they depend on, independent stages run concurrently.
+        The timings of each stage are recorded in stage_timings, the dates each stage read in stage_dates.
+        Only the result records of the compute stages are kept, the reports and the page paths of the run are
+        released when it ends.
 
-        # Replace inf (result of division by 0) with 100
-        page_views_full.loc[:, 'Delta_%'] = page_views_full['Delta_%'].replace(np.inf, 100)
+        :param targets: A list of stage names (see build_schedule), None runs every stage
+        :param schedule: Optional schedule of build_schedule, None builds a new one
+        '''
+        schedule = schedule or self.build_schedule()
+        try:
+            schedule.run(targets)
+            for name in schedule.resolve(targets):
+                self.stage_dates[name] = self.schedule_dates[name]
+        finally:
+            self.paths = None
+            self.stage_timings.update(schedule.timings)
+            for name, timing in schedule.timings.items():
+                self.activity_log.debug('Stage %s: %.3fs (%.3fs - %.3fs)',
+                                        name, timing['seconds'], timing['start'], timing['end'])
+            self.activity_log.debug('Retained bytes: %s', self.memory_report())
+
+    def memory_report(self):
+        '''
+        :return: An ordered dictionary with the bytes retained by the result record of every compute stage that ran,
+        by stage name in alphabetical order, and their sum (key: total)
+        '''
+        report = OrderedDict((name, self.results[name].nbytes()) for name in sorted(self.results))
+        report['total'] = sum(report.values())
+        return report
 
-        # Filter out by all delta_% less than threshold
-        page_views_full = page_views_full[(abs(page_views_full['Delta_%']) >= self.restrictions["threshold_%"])]
+    def generate(self):
+        '''
+        Generates every dashboard data frame: executive overview, traffic spikes/drops, bounce rates and sources
+        '''
+        self.run_stages()
 
-        # Filter out topN spikes and topN drops
-        self.top_n_spikes = page_views_full.iloc[0:self.restrictions['top_n']].copy()
-        self.top_n_drops = page_views_full.iloc[-self.restrictions['top_n']:].copy()
+    def update_periods(self, period_current, period_previous):
+        '''
+        Changes the current and previous periods and recomputes only the stages reading dates that changed, the data
+        frames of the other stages are kept. The reports go through the query layer as usual, so the result cache and
+        the fact store answer the reports and days already downloaded.
+
+        :param period_current: The new current period, a dictionary with start date (key: START) and end date
+        (key: END) in the formats of get_ga_api_context
+        :param period_previous: The new previous period
+        :return: The names of the recomputed stages, in execution order
+        :raises ValueError: If a period is not valid (see dates.resolve_period)
+        '''
+        for period in (period_current, period_previous):
+            resolve_period(period['START'], period['END'])
 
-        # Convert negative percentages to positive
-        self.top_n_drops.loc[:, 'Delta_%'] = self.top_n_drops['Delta_%'].abs()
+        self.period_current = {'START': period_current['START'], 'END': period_current['END']}
+        self.period_previous = {'START': period_previous['START'], 'END': period_previous['END']}
 
-        # Re-arrange topN drops to sort by ascending
-        self.top_n_drops = self.top_n_drops.sort_values(['Delta'], ascending=True)
+        # Stages without dates (merged reports) only run for the stages reading them
+        schedule = self.build_schedule()
+        targets = [name for name, dates in self.schedule_dates.items()
+                   if dates and self.stage_dates.get(name) != dates]
+        if not targets:
+            return []
 
-        # Set indices
-        self.top_n_spikes.set_index(['ga:pagePath'], inplace=True)
-        self.top_n_drops.set_index(['ga:pagePath'], inplace=True)
+        self.activity_log.debug('Periods changed, recomputing: %s', ', '.join(targets))
+        self.run_stages(targets, schedule)
+        return schedule.resolve(targets)
 
-        #################### DETAILED VIEW ####################
-        self.activity_log.debug('Generating tts & ttd detailed data')
+    def with_periods(self, period_current, period_previous):
+        '''
+        Copy on write version of update_periods, for analyses shared by several requests
 
-        # Get page paths for spikes and drops
-        spike_paths = self.top_n_spikes.index.tolist()
-        drop_paths = self.top_n_drops.index.tolist()
+        :param period_current: The new current period (see update_periods)
+        :param period_previous: The new previous period
+        :return: A copy of the analysis for the new periods, this analysis is left unchanged
+        :raises ValueError: If a period is not valid (see dates.resolve_period)
+        '''
+        analysis = copy.copy(self)
+        analysis.stage_timings = {}
+        analysis.stage_dates = dict(self.stage_dates)
+        analysis.results = dict(self.results)
+        analysis.update_periods(period_current, period_previous)
+        return analysis
 
-        # Update call for page views by source: current period
-        context["st_date"] = self.period_current['START']
-        context["end_date"] = self.period_current['END']
-        context["api_dimension"] = "ga:pagePath, ga:hostname, ga:source"
-        values = api.get_results(context)
+    def gen_tts_ttd(self):
+        '''
+        Generates TOP_N TRAFFIC SPIKES/DROPS summary and detail data frames.
+        '''
+        self.run_stages(['tts_ttd', 'tts_ttd_src'])
 
-        # Get column names
-        headers = values.get('columnHeaders')
-        col_names = []
-        for header in headers:
-            col_names.append(header.get('name'))
+    def query_page_views(self):
+        '''
+        Declares the query of the page views by page path and hostname for the current and previous period
 
-        # Get data for current period
-        page_views_current = pd.DataFrame(values.get("rows"), columns=col_names)
+        :return: The contexts of the current and the previous period
+        '''
+        return self.get_period_contexts(dimensions='ga:pagePath, ga:hostname',
+                                        metrics='ga:pageviews',
+                                        sort_key='-ga:pageviews'
+                                        )
 
-        # Update call for previous period
-        context["st_date"] = self.period_previous['START']
-        context["end_date"] = self.period_previous['END']
+    def query_page_views_src(self):
+        '''
+        Declares the query of the page views by page path, hostname and source for the current and previous period
 
-        values = api.get_results(context)
+        :return: The contexts of the current and the previous period
+        '''
+        return self.get_period_contexts(dimensions='ga:pagePath, ga:hostname, ga:source',
+                                        metrics='ga:pageviews',
+                                        sort_key='-ga:pageviews'
+                                        )
 
-        # Get data for second period
-        page_views_previous = pd.DataFrame(values.get("rows"), columns=col_names)
+    def compute_tts_ttd(self, page_views):
+        '''
+        Computes the TOP_N TRAFFIC SPIKES/DROPS summary data frames
 
-        # Append hostname to pagePath
-        page_views_previous['ga:pagePath'] = page_views_previous['ga:hostname'].map(str) + page_views_previous['ga:pagePath']
-        page_views_current['ga:pagePath'] = page_views_current['ga:hostname'].map(str) + page_views_current['ga:pagePath']
+        :param page_views: The current and previous period page views by page path (see query_page_views)
+        :return: A tuple with the path codes of the top spikes and of the top drops
+        '''
+        self.activity_log.debug('Generating tts & ttd summary data')
 
-        # Drop hostname column
-        page_views_previous.drop('ga:hostname', axis=1, inplace=True)
-        page_views_current.drop('ga:hostname', axis=1, inplace=True)
+        page_views_current, page_views_previous = page_views
 
-        # Outer merge: Everything from both periods
-        page_views_full = page_views_previous.merge(right=page_views_current,
-                                                    how='outer',
-                                                    on=['ga:pagePath', 'ga:source'],
-                                                    suffixes=['_prev', '_curr'], sort=True)
+        # Append hostname to pagePath, normalize it and replace it with its path code
+        page_views_previous['ga:pagePath'] = self.paths.encode(page_views_previous['ga:hostname'],
+                                                               page_views_previous['ga:pagePath'])
+        page_views_current['ga:pagePath'] = self.paths.encode(page_views_current['ga:hostname'],
+                                                              page_views_current['ga:pagePath'])
 
-        # Replace all NaN values with zero
-        # and Convert page views to numeric
-        #page_views_full.fillna(value=0, axis=0, inplace=True)
-        page_views_full[['ga:pageviews_prev', 'ga:pageviews_curr']] = page_views_full[
-            ['ga:pageviews_prev', 'ga:pageviews_curr']].fillna(0.0).astype(int)
+        # Outer merge: Everything from both periods (previous first), missing page views are zero
+        # and Sum up unique paths into one row
+        # and Add the delta and the delta percentage (100 for new paths) from prev to curr page views
+        page_views_full = compare_periods([page_views_previous, page_views_current],
+                                          keys=['ga:pagePath'],
+                                          metrics=['ga:pageviews'])
+        page_views_full.rename(columns={'ga:pageviews_delta_curr': 'Delta', 'ga:pageviews_change_curr': 'Delta_%'},
+                               inplace=True)
 
-        # Filter infusion soft path (remove everything after ?inf_contact or &inf_contact_key in path
-        page_views_full['ga:pagePath'].replace(r"\?inf_contact_key.*|&inf_contact_key.*", r"", regex = True, inplace = True)
+        # Filter out by all delta_% less than threshold
+        page_views_full = page_views_full[(abs(page_views_full['Delta_%']) >= self.restrictions["threshold_%"])]
 
-        # Sum up unique paths into one row
-        page_views_full = page_views_full.groupby(by=['ga:pagePath', 'ga:source'], as_index=False).sum()
+        # Select topN spikes (largest positive deltas) and topN drops (largest negative deltas, sorted by ascending),
+        # equal deltas are ordered by page path
+        top_n_spikes = select_top(page_views_full[page_views_full['Delta'] > 0], self.restrictions['top_n'],
+                                  'Delta', tie_column='ga:pagePath', tie_key=self.paths.decode).copy()
+        top_n_drops = select_top(page_views_full[page_views_full['Delta'] < 0], self.restrictions['top_n'],
+                                 'Delta', ascending=True, tie_column='ga:pagePath', tie_key=self.paths.decode).copy()
 
-        self.top_n_spikes_src = page_views_full[page_views_full['ga:pagePath'].isin(spike_paths)].copy()
-        self.top_n_drops_src = page_views_full[page_views_full['ga:pagePath'].isin(drop_paths)].copy()
+        # Convert negative percentages to positive
+        top_n_drops.loc[:, 'Delta_%'] = top_n_drops['Delta_%'].abs()
 
-        # Add the delta value from prev to curr page views
-        self.top_n_spikes_src.loc[:, 'Delta'] = self.top_n_spikes_src['ga:pageviews_curr'] - self.top_n_spikes_src[
-            'ga:pageviews_prev']
-        self.top_n_drops_src.loc[:, 'Delta'] = self.top_n_drops_src['ga:pageviews_curr'] - self.top_n_drops_src[
-            'ga:pageviews_prev']
+        # Get path codes for spikes and drops
+        spike_paths = top_n_spikes['ga:pagePath'].values
+        drop_paths = top_n_drops['ga:pagePath'].values
 
         # Set indices
-        self.top_n_spikes_src.set_index(['ga:pagePath', 'ga:source'], inplace=True)
-        self.top_n_drops_src.set_index(['ga:pagePath', 'ga:source'], inplace=True)
+        self.paths.decode_columns(top_n_spikes, ['ga:pagePath']).set_index(['ga:pagePath'], inplace=True)
+        self.paths.decode_columns(top_n_drops, ['ga:pagePath']).set_index(['ga:pagePath'], inplace=True)
+
+        self.results['tts_ttd'] = TrafficChanges(spikes=top_n_spikes, drops=top_n_drops)
+        return spike_paths, drop_paths
+
+    def compute_tts_ttd_src(self, top_paths, page_views_src):
+        '''
+        Computes the TOP_N TRAFFIC SPIKES/DROPS detail data frames
+
+        :param top_paths: The path codes of the top spikes and of the top drops (see compute_tts_ttd)
+        :param page_views_src: The current and previous period page views by page path and source
+        (see query_page_views_src)
+        '''
+        #################### DETAILED VIEW ####################
+        self.activity_log.debug('Generating tts & ttd detailed data')
+
+        spike_paths, drop_paths = top_paths
+        page_views_current, page_views_previous = page_views_src
+
+        # Append hostname to pagePath, normalize it and replace it with its path code
+        page_views_previous['ga:pagePath'] = self.paths.encode(page_views_previous['ga:hostname'],
+                                                               page_views_previous['ga:pagePath'])
+        page_views_current['ga:pagePath'] = self.paths.encode(page_views_current['ga:hostname'],
+                                                              page_views_current['ga:pagePath'])
+
+        # Outer merge: Everything from both periods, missing page views are zero
+        # and Sum up unique paths into one row
+        # and Add the delta value from prev to curr page views
+        page_views_full = compare_periods([page_views_previous, page_views_current],
+                                          keys=['ga:pagePath', 'ga:source'],
+                                          metrics=['ga:pageviews'],
+                                          change_suffix=None)
+        page_views_full.rename(columns={'ga:pageviews_delta_curr': 'Delta'}, inplace=True)
+
+        top_n_spikes_src = page_views_full[page_views_full['ga:pagePath'].isin(spike_paths)].copy()
+        top_n_drops_src = page_views_full[page_views_full['ga:pagePath'].isin(drop_paths)].copy()
+
+        # Set indices, sorted by path and source
+        self.results['tts_ttd_src'] = TrafficChanges(spikes=self.label_detail(top_n_spikes_src),
+                                                     drops=self.label_detail(top_n_drops_src))
 
         '''
         # Remove multi-Index on (path,src), replace with only path index
@@ -309,46 +523,69 @@ class Analytics(object):
         '''
         Generates AVERAGE SITE BOUNCE RATE and TOP N HIGHEST/LOWEST BOUNCE RATES summary and detail data frames
         '''
-        self.activity_log.debug('Generating bouncerate above avrg paths')
+        self.run_stages(['bounce_rates', 'bounce_rates_src'])
 
-        context = self.get_ga_api_context(period=self.period_current,
-                                          dimensions='ga:pagePath, ga:hostname',
-                                          metrics='ga:pageviews',
-                                          sort_key='-ga:pageviews'
-                                          )
-        values = api.get_results(context)
+    def query_current_page_views(self):
+        '''
+        Declares the query of the page views by page path and hostname for the current period
 
-        # Get column names
-        headers = values.get('columnHeaders')
-        col_names = []
-        for header in headers:
-            col_names.append(header.get('name'))
+        :return: The context of the current period
+        '''
+        return self.get_ga_api_context(period=self.period_current,
+                                       dimensions='ga:pagePath, ga:hostname',
+                                       metrics='ga:pageviews',
+                                       sort_key='-ga:pageviews'
+                                       )
 
-        #################### PAGES ABOVE SITE AVRG PAGE VIEWS ####################
+    def query_bounces(self):
+        '''
+        Declares the query of the bounces, sessions and goal completions by page path and hostname for the current
+        period
 
-        # Get data for current period
-        page_views_current = pd.DataFrame(values.get("rows"), columns=col_names)
+        :return: The context of the current period
+        '''
+        return self.get_ga_api_context(period=self.period_current,
+                                       dimensions='ga:pagePath, ga:hostname',
+                                       metrics='ga:bounces, ga:sessions, ga:goalCompletionsAll',
+                                       sort_key='-ga:bounces'
+                                       )
 
-        # Append hostname to pagePath
-        page_views_current['ga:pagePath']=page_views_current['ga:hostname'].map(str) + page_views_current['ga:pagePath']
+    def query_bounces_src(self):
+        '''
+        Declares the query of the bounces, sessions and goal completions by page path, hostname and source for the
+        current period
 
-        # Drop hostname column
-        page_views_current.drop('ga:hostname', axis=1, inplace=True)
+        :return: The context of the current period
+        '''
+        return self.get_ga_api_context(period=self.period_current,
+                                       dimensions='ga:pagePath, ga:hostname, ga:source',
+                                       metrics='ga:bounces, ga:sessions, ga:goalCompletionsAll',
+                                       sort_key='-ga:bounces'
+                                       )
 
-        # Replace all NaN values with zero
-        # and Convert page views to numeric
-        #page_views_current.fillna(0, inplace=True)
-        page_views_current['ga:pageviews'] = page_views_current['ga:pageviews'].fillna(0.0).astype(int)
+    def compute_above_avrg_paths(self, page_views_current):
+        '''
+        Computes the page paths with more page views than the site average
 
-        # Filter infusion soft path (remove everything after ?inf_contact or &inf_contact_key in path
-        page_views_current['ga:pagePath'].replace(r"\?inf_contact_key.*|&inf_contact_key.*", r"", regex=True,
-                                                    inplace=True)
+        :param page_views_current: The current period page views by page path (see query_current_page_views)
+        :return: A numpy array of path codes
+        '''
+        self.activity_log.debug('Generating bouncerate above avrg paths')
+
+        #################### PAGES ABOVE SITE AVRG PAGE VIEWS ####################
+
+        # Append hostname to pagePath, normalize it and replace it with its path code
+        page_views_current['ga:pagePath'] = self.paths.encode(page_views_current['ga:hostname'],
+                                                              page_views_current['ga:pagePath'])
+
+        # Drop hostname column
+        page_views_current.drop('ga:hostname', axis=1, inplace=True)
 
         # Set indices
         #page_views_current.set_index(['ga:pagePath'], inplace=True)
 
         # Sum up unique paths into one row
-        page_views_current = page_views_current.groupby('ga:pagePath', as_index=False, sort=False).sum()
+        page_views_current = sum_by(page_views_current, ['ga:pagePath'])
 
         # Computer site average page views
         #avrg_pageviews = page_views_current.loc[:, 'ga:pageviews'].abs().mean()
@@ -357,58 +594,32 @@ class Analytics(object):
         # Filter out all pages with page views below site average
         page_views_current = page_views_current[page_views_current['ga:pageviews'] >= avrg_pageviews]
 
-        # Sort by page views
-        page_views_current.sort_values(['ga:pageviews'], ascending=False, inplace=True)
+        # Get path codes
+        return page_views_current['ga:pagePath'].values
 
-        # Set indices
-        page_views_current.set_index(['ga:pagePath'], inplace=True)
-
-        # Get page paths
-        above_avrg_paths = page_views_current.index.tolist()
+    def compute_bounce_rates(self, above_avrg_paths, bounce_rates_current):
+        '''
+        Computes the AVERAGE SITE BOUNCE RATE and the TOP N HIGHEST/LOWEST BOUNCE RATES summary data frames
 
+        :param above_avrg_paths: The path codes above the site average page views (see compute_above_avrg_paths)
+        :param bounce_rates_current: The current period bounces by page path (see query_bounces)
+        :return: A tuple with the path codes of the highest and of the lowest bounce rates
+        '''
         #################### BOUNCE RATES ####################
         self.activity_log.debug('Generating bounce rate summary data')
 
-        # Change context for bounce rates
-        context['api_metric'] = 'ga:bounces, ga:sessions, ga:goalCompletionsAll'
-        context['api_dimension'] = 'ga:pagePath, ga:hostname'
-        context['sort_key'] = '-ga:bounces'
-
-        values = api.get_results(context)
-
-        # Get column names
-        headers = values.get('columnHeaders')
-        col_names = []
-        for header in headers:
-            col_names.append(header.get('name'))
-
-        # Get data for current period
-        bounce_rates_current = pd.DataFrame(values.get("rows"), columns=col_names)
-
-        # Append hostname to pagePath
-        bounce_rates_current['ga:pagePath'] = bounce_rates_current['ga:hostname'].map(str) \
-                                             + bounce_rates_current['ga:pagePath']
+        # Append hostname to pagePath, normalize it and replace it with its path code
+        bounce_rates_current['ga:pagePath'] = self.paths.encode(bounce_rates_current['ga:hostname'],
+                                                                bounce_rates_current['ga:pagePath'])
 
         # Drop hostname column
         bounce_rates_current.drop('ga:hostname', axis=1, inplace=True)
 
-        # Replace all NaN values with zero
-        # and Convert bounces, sessions, and goal completions to numeric
-        #bounce_rates_current.fillna(0, inplace=True)
-        bounce_rates_current[['ga:bounces', 'ga:sessions', 'ga:goalCompletionsAll']] = bounce_rates_current[
-            ['ga:bounces', 'ga:sessions', 'ga:goalCompletionsAll']].fillna(0.0).astype(int)
-
-        # Filter infusion soft path (remove everything after ?inf_contact or &inf_contact_key in path
-        bounce_rates_current['ga:pagePath'].replace(r"\?inf_contact_key.*|&inf_contact_key.*", r"", regex = True, inplace = True)
-
         # Set indices
         #bounce_rates_current.set_index(['ga:pagePath'], inplace=True)
 
         # Sum up unique paths into one row
-        bounce_rates_current = bounce_rates_current.groupby('ga:pagePath', as_index=False, sort=False).sum()
-
-        # Sort by bounces
-        bounce_rates_current.sort_values(['ga:bounces'], ascending=False, inplace=True)
+        bounce_rates_current = sum_by(bounce_rates_current, ['ga:pagePath'])
 
         # Calculate the bounce rate
         bounce_rates_current.loc[:, 'bounceRate'] = round((bounce_rates_current['ga:bounces'] /
@@ -420,7 +631,7 @@ class Analytics(object):
 
         # Calculate the mean bounce rate
         #self.bounce_rate_mean = bounce_rates_current.loc[:, 'bounceRate'].abs().mean()
-        self.bounce_rate_mean = round(int(bounce_rates_current['bounceRate'].abs().mean()), 2)
+        bounce_rate_mean = round(int(bounce_rates_current['bounceRate'].abs().mean()), 2)
 
         # Get rows for above average paths
         bounce_rates_current = bounce_rates_current[bounce_rates_current['ga:pagePath'].isin(above_avrg_paths)].copy()
@@ -431,713 +642,198 @@ class Analytics(object):
         # Sort by bounce rate
         #bounce_rates_current.sort_values(['bounceRate', 'ga:bounces'], ascending=False, inplace=True)
 
-        # Get pages with bounce rates above 75%
-        self.highest_n_br = bounce_rates_current[bounce_rates_current['bounceRate'] >= 75].copy()
+        # Get top n pages with bounce rates above 75% by bounces, equal bounces are ordered by page path
+        highest_n_br = select_top(bounce_rates_current[bounce_rates_current['bounceRate'] >= 75],
+                                  self.restrictions['top_n'], 'ga:bounces',
+                                  tie_column='ga:pagePath', tie_key=self.paths.decode).copy()
 
-        # Get pages with bounce rates below 75%
-        self.lowest_n_br = bounce_rates_current[bounce_rates_current['bounceRate'] <= 40].copy()
+        # Get top n pages with bounce rates below 40% by sessions, equal sessions are ordered by page path
+        lowest_n_br = select_top(bounce_rates_current[bounce_rates_current['bounceRate'] <= 40],
+                                 self.restrictions['top_n'], 'ga:sessions',
+                                 tie_column='ga:pagePath', tie_key=self.paths.decode).copy()
 
-        # Set index to page path
-        self.highest_n_br.set_index(['ga:pagePath'], inplace=True)
-        self.lowest_n_br.set_index(['ga:pagePath'], inplace=True)
+        # Set index to page path code
+        highest_n_br.set_index(['ga:pagePath'], inplace=True)
+        lowest_n_br.set_index(['ga:pagePath'], inplace=True)
 
         # Calculate percent above/below average
-        self.highest_n_br.loc[:, 'fromAvrg%'] = round(((self.highest_n_br['bounceRate'] - self.bounce_rate_mean) /
-                                                                self.bounce_rate_mean) * 100, 2)
-        self.lowest_n_br.loc[:, 'fromAvrg%'] = round(((self.lowest_n_br['bounceRate'] - self.bounce_rate_mean) /
-                                                               self.bounce_rate_mean) * 100, 2)
-
-        # Sort highest n by bounces
-        self.highest_n_br = self.highest_n_br.sort_values(['ga:bounces'], ascending=False)
+        highest_n_br.loc[:, 'fromAvrg%'] = round(((highest_n_br['bounceRate'] - bounce_rate_mean) /
+                                                  bounce_rate_mean) * 100, 2)
+        lowest_n_br.loc[:, 'fromAvrg%'] = round(((lowest_n_br['bounceRate'] - bounce_rate_mean) /
+                                                 bounce_rate_mean) * 100, 2)
 
-        # Sort lowest n by sessions
-        self.lowest_n_br = self.lowest_n_br.sort_values(['ga:sessions'], ascending=False)
+        # Sort by bounceRate, equal rates keep their order
+        highest_n_br = highest_n_br.sort_values(['bounceRate'], ascending=False, kind='mergesort')
+        lowest_n_br = lowest_n_br.sort_values(['bounceRate'], ascending=False, kind='mergesort')
 
-        # Get top n
-        self.highest_n_br = self.highest_n_br.iloc[0:self.restrictions['top_n']].copy()
-        self.lowest_n_br = self.lowest_n_br.iloc[0:self.restrictions['top_n']].copy()
+        # Get path codes, then set index to page path
+        br_paths = highest_n_br.index.values, lowest_n_br.index.values
+        self.paths.decode_index(highest_n_br)
+        self.paths.decode_index(lowest_n_br)
 
-        # Sort by bounceRate
-        self.highest_n_br = self.highest_n_br.sort_values(['bounceRate'], ascending=False)
-        self.lowest_n_br = self.lowest_n_br.sort_values(['bounceRate'], ascending=False)
+        self.results['bounce_rates'] = BounceRates(mean=bounce_rate_mean, highest=highest_n_br, lowest=lowest_n_br)
+        return br_paths
 
-        highest_n_pths = self.highest_n_br.index.tolist()
-        lowest_n_pths = self.lowest_n_br.index.tolist()
+    def compute_bounce_rates_src(self, br_paths, bounce_rates_current):
+        '''
+        Computes the TOP N HIGHEST/LOWEST BOUNCE RATES detail data frames
 
+        :param br_paths: The path codes of the highest and of the lowest bounce rates (see compute_bounce_rates)
+        :param bounce_rates_current: The current period bounces by page path and source (see query_bounces_src)
+        '''
         #################### BOUNCE RATES DETAIL ####################
         self.activity_log.debug('Generating bouncerate detailed data')
 
-        # Change context for bounce rates by src
-        context['api_metric'] = 'ga:bounces, ga:sessions, ga:goalCompletionsAll'
-        context['api_dimension'] = 'ga:pagePath, ga:hostname, ga:source'
-        context['sort_key'] = '-ga:bounces'
-
-        values = api.get_results(context)
-
-        # Get column names
-        headers = values.get('columnHeaders')
-        col_names = []
-        for header in headers:
-            col_names.append(header.get('name'))
+        highest_n_pths, lowest_n_pths = br_paths
+        bounce_rate_mean = self.bounce_rate_mean
 
-        # Get data for current period
-        bounce_rates_current = pd.DataFrame(values.get("rows"), columns=col_names)
-
-        # Append hostname to pagePath
-        bounce_rates_current['ga:pagePath'] = bounce_rates_current['ga:hostname'].map(str) \
-                                              + bounce_rates_current['ga:pagePath']
+        # Append hostname to pagePath, normalize it and replace it with its path code
+        bounce_rates_current['ga:pagePath'] = self.paths.encode(bounce_rates_current['ga:hostname'],
+                                                                bounce_rates_current['ga:pagePath'])
 
         # Drop hostname column
         bounce_rates_current.drop('ga:hostname', axis=1, inplace=True)
 
-        # Replace all NaN values with zero
-
-
-        # Replace all NaN values with zero
-        # and Convert bounces, session and goal completions to numeric
-        #bounce_rates_current.fillna(0, inplace=True)
-        #bounce_rates_current.loc[:, ('ga:bounces', 'ga:sessions', 'ga:goalCompletionsAll')] = bounce_rates_current[
-        #    ['ga:bounces', 'ga:sessions', 'ga:goalCompletionsAll']].apply(pd.to_numeric)
-        bounce_rates_current[['ga:bounces', 'ga:sessions', 'ga:goalCompletionsAll']] = bounce_rates_current[
-            ['ga:bounces', 'ga:sessions', 'ga:goalCompletionsAll']].fillna(0.0).astype(int)
-
-        # Filter infusion soft path (remove everything after ?inf_contact or &inf_contact_key in path
-        bounce_rates_current['ga:pagePath'].replace(r"\?inf_contact_key.*|&inf_contact_key.*", r"", regex=True,
-                                                    inplace=True)
-
         # Sum up unique paths into one row
-        bounce_rates_current = bounce_rates_current.groupby(by=['ga:pagePath', 'ga:source'], as_index=False).sum()
+        bounce_rates_current = sum_by(bounce_rates_current, ['ga:pagePath', 'ga:source'])
 
         #bounce_rates_current.reset_index(inplace=True)
 
-        self.highest_n_br_src = bounce_rates_current[bounce_rates_current['ga:pagePath'].isin(highest_n_pths)].copy()
-        self.lowest_n_br_src = bounce_rates_current[bounce_rates_current['ga:pagePath'].isin(lowest_n_pths)].copy()
+        highest_n_br_src = bounce_rates_current[bounce_rates_current['ga:pagePath'].isin(highest_n_pths)].copy()
+        lowest_n_br_src = bounce_rates_current[bounce_rates_current['ga:pagePath'].isin(lowest_n_pths)].copy()
 
         # Calculate the bounce rate
-        self.highest_n_br_src.loc[:, 'bounceRate'] = round((self.highest_n_br_src['ga:bounces'] /
-                                                            self.highest_n_br_src['ga:sessions']) * 100, 2)
+        highest_n_br_src.loc[:, 'bounceRate'] = round((highest_n_br_src['ga:bounces'] /
+                                                       highest_n_br_src['ga:sessions']) * 100, 2)
 
-        self.lowest_n_br_src.loc[:, 'bounceRate'] = round((self.lowest_n_br_src['ga:bounces'] /
-                                                            self.lowest_n_br_src['ga:sessions']) * 100, 2)
+        lowest_n_br_src.loc[:, 'bounceRate'] = round((lowest_n_br_src['ga:bounces'] /
+                                                      lowest_n_br_src['ga:sessions']) * 100, 2)
 
         # Calculate the percentage of sessions which resulted in a conversion to at least one of the goals.
-        self.highest_n_br_src.loc[:, 'goalConversionRateAll'] = round((self.highest_n_br_src['ga:goalCompletionsAll'] /
-                                                                       self.highest_n_br_src['ga:sessions']) * 100, 2)
-        self.lowest_n_br_src.loc[:, 'goalConversionRateAll'] = round((self.lowest_n_br_src['ga:goalCompletionsAll'] /
-                                                                       self.lowest_n_br_src['ga:sessions']) * 100, 2)
+        highest_n_br_src.loc[:, 'goalConversionRateAll'] = round((highest_n_br_src['ga:goalCompletionsAll'] /
+                                                                  highest_n_br_src['ga:sessions']) * 100, 2)
+        lowest_n_br_src.loc[:, 'goalConversionRateAll'] = round((lowest_n_br_src['ga:goalCompletionsAll'] /
+                                                                 lowest_n_br_src['ga:sessions']) * 100, 2)
 
         # Calculate percent above/below average
-        self.highest_n_br_src.loc[:, 'fromAvrg%'] = round(((self.highest_n_br_src['bounceRate'] - self.bounce_rate_mean) /
-                                                       self.bounce_rate_mean) * 100, 2)
-        self.lowest_n_br_src.loc[:, 'fromAvrg%'] = round(((self.lowest_n_br_src['bounceRate'] - self.bounce_rate_mean) /
-                                                      self.bounce_rate_mean) * 100, 2)
+        highest_n_br_src.loc[:, 'fromAvrg%'] = round(((highest_n_br_src['bounceRate'] - bounce_rate_mean) /
+                                                      bounce_rate_mean) * 100, 2)
+        lowest_n_br_src.loc[:, 'fromAvrg%'] = round(((lowest_n_br_src['bounceRate'] - bounce_rate_mean) /
+                                                     bounce_rate_mean) * 100, 2)
 
-        # Set indices
-        self.highest_n_br_src.set_index(['ga:pagePath', 'ga:source'], inplace=True)
-        self.lowest_n_br_src.set_index(['ga:pagePath', 'ga:source'], inplace=True)
+        # Set indices, sorted by path and source
+        self.results['bounce_rates_src'] = BounceRatesDetail(highest=self.label_detail(highest_n_br_src),
+                                                             lowest=self.label_detail(lowest_n_br_src))
 
     def gen_sources(self):
         '''
         Generates TRAFFIC SOURCE summary and detail data frames
         '''
-        self.activity_log.debug('Generating source data')
-        context = self.get_ga_api_context(period=self.period_current,
-                                          dimensions='ga:source, ga:medium, ga:hasSocialSourceReferral, ga:socialNetwork',
-                                          metrics='ga:sessions, ga:goalCompletionsAll',
-                                          sort_key='-ga:sessions'
-                                          )
-        values = api.get_results(context)
-
-        # Get column names
-        headers = values.get('columnHeaders')
-        col_names = []
-        for header in headers:
-            col_names.append(header.get('name'))
-
-        # Get data for current period
-        sources_current = pd.DataFrame(values.get("rows"), columns=col_names)
-
-        # Update call for second period
-        context["st_date"] = self.period_previous['START']
-        context["end_date"] = self.period_previous['END']
-        values = api.get_results(context)
-
-        # Get data for previous period
-        events_previous = pd.DataFrame(values.get("rows"), columns=col_names)
-
-        # Outer merge: Everything from both periods (previous first)
-        sources_full = events_previous.merge(right=sources_current,
-                                            how='outer',
-                                            on=['ga:source', 'ga:medium', 'ga:hasSocialSourceReferral', 'ga:socialNetwork'],
-                                            suffixes=['_prev', '_curr'])
-
-        sources_full.sort_values('ga:source', ascending=True, inplace=True)
-
-        # Replace all NaN values with zero
-        # and Convert sessions and goalCompletions to numeric
-        sources_full[['ga:sessions_prev', 'ga:sessions_curr']] = sources_full[['ga:sessions_prev', 'ga:sessions_curr']].fillna(0.0).astype(int)
-        sources_full[['ga:goalCompletionsAll_prev', 'ga:goalCompletionsAll_curr']] = sources_full[['ga:goalCompletionsAll_prev', 'ga:goalCompletionsAll_curr']].fillna(0.0).astype(int)
-
-        # Add the delta percentage from prev to curr sessions
-        sources_full.loc[:, 'sessionsChangeRate'] = round(((sources_full['ga:sessions_curr'] - sources_full['ga:sessions_prev'])/
-                                             sources_full['ga:sessions_prev'])*100, 2)
-
-        # Add the delta percentage from prev to curr goalCompletions
-        sources_full.loc[:, 'goalCompletionsChangeRate'] = round(((sources_full['ga:goalCompletionsAll_curr'] - sources_full['ga:goalCompletionsAll_prev']) /
-                                                sources_full['ga:goalCompletionsAll_prev']) * 100, 2)
-
-        # Calculate the percentage of sessions which resulted in a conversion to at least one of the goals
-        sources_full.loc[:, 'goalConversionRateAll_curr'] = round((sources_full['ga:goalCompletionsAll_curr'] /
-                                                              sources_full['ga:sessions_curr']) * 100, 2)
-        sources_full.loc[:, 'goalConversionRateAll_prev'] = round((sources_full['ga:goalCompletionsAll_prev'] /
-                                                                   sources_full['ga:sessions_prev']) * 100, 2)
-
-        # Replace all NaN values for goalCompletions delta_% and goalConversionRateAll_curr to zero
-        # Occurs when BOTH numerator and denominator in the divisions above are zero
-        sources_full[['sessionsChangeRate', 'goalCompletionsChangeRate', 'goalConversionRateAll_curr', 'goalConversionRateAll_prev']] = sources_full[
-            ['sessionsChangeRate', 'goalCompletionsChangeRate', 'goalConversionRateAll_curr', 'goalConversionRateAll_prev']].fillna(0.0)
-
-        #################### SOCIAL SOURCES ####################
-        srcs_social = sources_full[sources_full['ga:hasSocialSourceReferral'] == 'Yes']
-        # srcs_social = sources_full[sources_full['ga:hasSocialSourceReferral'].str.contains(r'Yes')]
-        # Sum up unique socialNetworks into one row
-        srcs_social = srcs_social.groupby('ga:socialNetwork', as_index=False, sort=False).sum()
-
-        # Rename the ga:socialNetwork column to source
-        srcs_social.rename(columns = {'ga:socialNetwork':'source'}, inplace=True)
-
-        # Sort by current sessions
-        #srcs_social.sort_values('ga:sessions_curr', ascending=False, inplace=True)
-        srcs_social = srcs_social.sort_values(['ga:sessions_curr'], ascending=False)
-
-        # Recalculate %change in sessions and goal completions, and the conversion rate due to new grouping
-        srcs_social.loc[:, 'sessionsChangeRate'] = round(((srcs_social['ga:sessions_curr'] - srcs_social['ga:sessions_prev'])/
-                                                             srcs_social['ga:sessions_prev'])*100, 2)
-
-        # Add the delta percentage from prev to curr goalCompletions
-        srcs_social.loc[:, 'goalCompletionsChangeRate'] = round(((srcs_social['ga:goalCompletionsAll_curr'] - srcs_social['ga:goalCompletionsAll_prev']) /
-                                                                      srcs_social['ga:goalCompletionsAll_prev']) * 100, 2)
-
-        # Calculate the percentage of sessions which resulted in a conversion to at least one of the goals
-        # Calculated for the current and previous period
-        srcs_social.loc[:, 'goalConversionRateAll_curr'] = round((srcs_social['ga:goalCompletionsAll_curr'] /
-                                                                   srcs_social['ga:sessions_curr']) * 100, 2)
-        srcs_social.loc[:, 'goalConversionRateAll_prev'] = round((srcs_social['ga:goalCompletionsAll_prev'] /
-                                                                       srcs_social['ga:sessions_prev']) * 100, 2)
-
-        # Replace all NaN values for goalCompletions delta_% and goalConversionRateAll_curr to zero
-        # Occurs when BOTH numerator and denominator in the divisions above are zero
-        srcs_social[['sessionsChangeRate', 'goalCompletionsChangeRate', 'goalConversionRateAll_curr', 'goalConversionRateAll_prev']] = srcs_social[
-            ['sessionsChangeRate', 'goalCompletionsChangeRate', 'goalConversionRateAll_curr', 'goalConversionRateAll_prev']].fillna(0.0)
-
-        # Add the a category column and set it to Social
-        srcs_social.insert(0, 'category', 'Social')
-
-        self.srcs_detail = srcs_social
-
-        # Remove social sources from full table
-        sources_full = sources_full[sources_full['ga:hasSocialSourceReferral'] == 'No']
-
-        # Drop hasSocialSourceReferral and SocialNetwork columns from full table
-        sources_full.drop(['ga:hasSocialSourceReferral', 'ga:socialNetwork'], axis=1, inplace=True)
-
-        #################### ORGANIC SEARCH SOURCES ####################
-        srcs_organic_search = sources_full[sources_full['ga:medium'] == 'organic']
-        # srcs_organic_search = sources_full[sources_full['ga:medium'].str.contains(r'organic')]
-
-        # Sort by current sessions
-        srcs_organic_search = srcs_organic_search.sort_values(['ga:sessions_curr'], ascending=False)
-
-        # Rename the ga:source column to source
-        srcs_organic_search.rename(columns={'ga:source': 'source'}, inplace=True)
-
-        # Drop the ga:medium column
-        srcs_organic_search.drop('ga:medium', axis=1, inplace=True)
-
-        # Add the a category column and set it to Organic Search
-        srcs_organic_search.insert(0, 'category', 'Organic Search')
-
-        # Add to source detail table
-        self.srcs_detail = self.srcs_detail.append(srcs_organic_search)
-
-        # Remove organic search sources from full table
-        sources_full = sources_full[sources_full['ga:medium'] != 'organic']
-
-        #################### PAID SEARCH SOURCES ####################
-        srcs_paid_search = sources_full[(sources_full['ga:medium'] == 'cpc') |
-                                             (sources_full['ga:medium'] == 'ppc') |
-                                             (sources_full['ga:medium'] == 'paidsearch')]
-        #srcs_paid_search = sources_full[sources_full['ga:medium'].str.contains(r'cpc|ppc|paidsearch')]
-
-        # Sort by current sessions
-        srcs_paid_search = srcs_paid_search.sort_values(['ga:sessions_curr'], ascending=False)
-
-        # Rename the ga:source column to source
-        srcs_paid_search.rename(columns={'ga:source': 'source'}, inplace=True)
-
-        # Drop the ga:medium column
-        srcs_paid_search.drop('ga:medium', axis=1, inplace=True)
-
-        # Add the a category column and set it to Paid Search
-        srcs_paid_search.insert(0, 'category', 'Paid Search')
-
-        # Add to source detail table
-        self.srcs_detail = self.srcs_detail.append(srcs_paid_search)
-
-        # Remove paid search sources from full table
-        sources_full = sources_full[(sources_full['ga:medium'] != 'cpc') &
-                                    (sources_full['ga:medium'] != 'ppc') &
-                                    (sources_full['ga:medium'] != 'paidsearch')]
-
-        #################### DISPLAY SOURCES ####################
-        srcs_display = sources_full[(sources_full['ga:medium'] == 'display') |
-                                         (sources_full['ga:medium'] == 'cpm') |
-                                         (sources_full['ga:medium'] == 'banner)')]
-        #srcs_display = sources_full[sources_full['ga:medium'].str.contains(r'display|cpm|banner')]
-
-        # Sort by current sessions
-        srcs_display = srcs_display.sort_values(['ga:sessions_curr'], ascending=False)
-
-        # Rename the ga:source column to source
-        srcs_display.rename(columns={'ga:source': 'source'}, inplace=True)
-
-        # Drop the ga:medium column
-        srcs_display.drop('ga:medium', axis=1, inplace=True)
-
-        # Add the a category column and set it to Display
-        srcs_display.insert(0, 'category', 'Display')
+        self.run_stages(['sources'])
 
-        # Add to source detail table
-        self.srcs_detail = self.srcs_detail.append(srcs_display)
-
-        # Remove display sources from full table
-        sources_full = sources_full[(sources_full['ga:medium'] != 'display') &
-                                    (sources_full['ga:medium'] != 'cpm') &
-                                    (sources_full['ga:medium'] != 'banner)')]
-
-        #################### REFERRAL SOURCES ####################
-        srcs_referral = sources_full[sources_full['ga:medium'] == 'referral']
-        #srcs_referral = sources_full[sources_full['ga:medium'].str.contains(r'referral')]
-
-        # Sort by current sessions
-        srcs_referral = srcs_referral.sort_values(['ga:sessions_curr'], ascending=False)
-
-        # Rename the ga:source column to source
-        srcs_referral.rename(columns={'ga:source': 'source'}, inplace=True)
-
-        # Drop the ga:medium column
-        srcs_referral.drop('ga:medium', axis=1, inplace=True)
-
-        # Add the a category column and set it to Referral
-        srcs_referral.insert(0, 'category', 'Referral')
-
-        # Add to source detail table
-        self.srcs_detail = self.srcs_detail.append(srcs_referral)
-
-        # Remove referral sources from full table
-        sources_full = sources_full[sources_full['ga:medium'] != 'referral']
-
-        #################### DIRECT SOURCES ####################
-        srcs_direct = sources_full[sources_full['ga:source'] == '(direct)']
-        #srcs_direct = sources_full[sources_full['ga:source'].str.contains(r'direct') &
-        #                                sources_full['ga:medium'].str.contains(r'none|not set')]
-
-        # Sort by current sessions
-        srcs_direct = srcs_direct.sort_values(['ga:sessions_curr'], ascending=False)
-
-        # Rename the ga:source column to source
-        srcs_direct.rename(columns={'ga:source': 'source'}, inplace=True)
-
-        # Drop the ga:medium column
-        srcs_direct.drop('ga:medium', axis=1, inplace=True)
-
-        # Add the a category column and set it to Direct
-        srcs_direct.insert(0, 'category', 'Direct')
-
-        # Add to source detail table
-        self.srcs_detail = self.srcs_detail.append(srcs_direct)
-
-        # Remove referral sources from full table
-        sources_full = sources_full[sources_full['ga:source'] != '(direct)']
-
-        #################### EMAIL SOURCES ####################
-        srcs_email = sources_full[sources_full['ga:medium'] == 'email']
-
-        # Sort by current sessions
-        srcs_email = srcs_email.sort_values(['ga:sessions_curr'], ascending=False)
-
-        # Rename the ga:source column to source
-        srcs_email.rename(columns={'ga:source': 'source'}, inplace=True)
-
-        # Drop the ga:medium column
-        srcs_email.drop('ga:medium', axis=1, inplace=True)
-
-        # Add the a category column and set it to Email
-        srcs_email.insert(0, 'category', 'Email')
-
-        # Add to source detail table
-        self.srcs_detail = self.srcs_detail.append(srcs_email)
-
-        # Remove referral sources from full table
-        sources_full = sources_full[sources_full['ga:medium'] != 'email']
-
-        #################### OTHER SOURCES ####################
-        srcs_other = sources_full
-
-        # Sort by current sessions
-        srcs_other = srcs_other.sort_values(['ga:sessions_curr'], ascending=False)
-
-        # Rename the ga:source column to source
-        srcs_other.rename(columns={'ga:source': 'source'}, inplace=True)
+    def query_sources(self):
+        '''
+        Declares the query of the sessions and goal completions by source, medium and social network for the current
+        and previous period
 
-        # Drop the ga:medium column
-        srcs_other.drop('ga:medium', axis=1, inplace=True)
+        :return: The contexts of the current and the previous period
+        '''
+        return self.get_period_contexts(dimensions='ga:source, ga:medium, ga:hasSocialSourceReferral, ga:socialNetwork',
+                                        metrics='ga:sessions, ga:goalCompletionsAll',
+                                        sort_key='-ga:sessions'
+                                        )
 
-        # Add the a category column and set it to Other
-        srcs_other.insert(0, 'category', 'Other')
+    def compute_sources(self, sources):
+        '''
+        Computes the TRAFFIC SOURCE summary and detail data frames
 
-        # Add to source detail table
-        self.srcs_detail = self.srcs_detail.append(srcs_other)
+        :param sources: The current and previous period sessions by source (see query_sources)
+        '''
+        self.activity_log.debug('Generating source data')
 
-        # Set indices
-        self.srcs_detail.set_index(['category', 'source'], inplace=True)
+        sources_current, events_previous = sources
 
+        # Outer merge: Everything from both periods (previous first), missing sessions and goalCompletions are zero
+        sources_full = combine_periods(events_previous, sources_current,
+                                       keys=['ga:source', 'ga:medium', 'ga:hasSocialSourceReferral', 'ga:socialNetwork'],
+                                       metrics=['ga:sessions', 'ga:goalCompletionsAll'])
 
-        #################### CATEGORY SUMMARY ####################
-        catagories = self.srcs_detail.index.levels[0].tolist()
+        # Categorize every source by the channel grouping rules, then sum up the detail by category and source and
+        # the summary by category
+        srcs_detail, srcs_summary = channels.channel_grouping.group(sources_full)
+        self.results['sources'] = Sources(summary=srcs_summary, detail=srcs_detail)
 
-        self.srcs_summary = pd.DataFrame(columns=['ga:sessions_prev', 'ga:goalCompletionsAll_prev', 'ga:sessions_curr', 'ga:goalCompletionsAll_curr'])
-        for category in catagories:
-            cat_detail = self.srcs_detail.ix[category]
-            row = cat_detail[['ga:sessions_prev', 'ga:goalCompletionsAll_prev', 'ga:sessions_curr', 'ga:goalCompletionsAll_curr']].sum()
-            row = pd.Series(data=category, index=['category']).append(row)
-            self.srcs_summary = self.srcs_summary.append(row, ignore_index=True)
+    def gen_exec_overview(self):
+        '''
+        Generates the raw changes and percentage changes in:
+        VISITORS(users), VISITS(sessions), PAGEVIEWS, GOAL COMPLETIONS, and EVENTS
+        '''
+        self.run_stages(['exec_overview'])
 
-        # Add the delta percentage from prev to curr sessions
-        self.srcs_summary.loc[:, 'sessionsChangeRate'] = round(
-            ((self.srcs_summary['ga:sessions_curr'] - self.srcs_summary['ga:sessions_prev']) /
-             self.srcs_summary['ga:sessions_prev']) * 100, 2)
+    def query_exec_overview(self):
+        '''
+        Declares the query of the users, sessions, page views, goal completions and events by page path for the
+        current and previous period
 
-        # Add the delta percentage from prev to curr goalCompletions
-        self.srcs_summary.loc[:, 'goalCompletionsChangeRate'] = round(
-            ((self.srcs_summary['ga:goalCompletionsAll_curr'] - self.srcs_summary['ga:goalCompletionsAll_prev']) /
-             self.srcs_summary['ga:goalCompletionsAll_prev']) * 100, 2)
+        :return: The contexts of the current and the previous period
+        '''
+        return self.get_period_contexts(dimensions='ga:pagePath',
+                                        metrics='ga:users, ga:sessions, ga:pageviews, ga:goalCompletionsAll, ga:totalEvents',
+                                        sort_key='-ga:users'
+                                        )
 
-        # Calculate the percentage of sessions which resulted in a conversion to at least one of the goals
-        self.srcs_summary.loc[:, 'goalConversionRateAll_curr'] = round((self.srcs_summary['ga:goalCompletionsAll_curr'] /
-                                                                   self.srcs_summary['ga:sessions_curr']) * 100, 2)
-        self.srcs_summary.loc[:, 'goalConversionRateAll_prev'] = round((self.srcs_summary['ga:goalCompletionsAll_prev'] /
-                                                                   self.srcs_summary['ga:sessions_prev']) * 100, 2)
+    def compute_exec_overview(self, exec_ov):
+        '''
+        Computes the executive overview changes
 
-        # Replace all NaN values for goalCompletions delta_% and goalConversionRateAll_curr to zero
-        # Occurs when BOTH numerator and denominator in the divisions above are zero
-        self.srcs_summary[['sessionsChangeRate', 'goalCompletionsChangeRate', 'goalConversionRateAll_curr', 'goalConversionRateAll_prev']] = \
-            self.srcs_summary[
-            ['sessionsChangeRate', 'goalCompletionsChangeRate', 'goalConversionRateAll_curr', 'goalConversionRateAll_prev']].fillna(0.0)
+        :param exec_ov: The current and previous period totals by page path (see query_exec_overview)
+        '''
+        self.activity_log.debug('Generating executive overview data')
 
-        # Sort by current sessions
-        self.srcs_summary = self.srcs_summary.sort_values(['ga:sessions_curr'], ascending=False)
+        exec_ov_current, exec_ov_previous = exec_ov
 
-        # Set index
-        self.srcs_summary.set_index(['category'], inplace=True)
+        # Sum up every metric of both periods (previous first)
+        # and Get the site wide percentage changes (100 for metrics growing from zero)
+        totals, changes = compare_totals([exec_ov_previous, exec_ov_current],
+                                         metrics=['ga:users', 'ga:sessions', 'ga:pageviews', 'ga:goalCompletionsAll',
+                                                  'ga:totalEvents'])
 
+        # From prev to curr, then the percentage changes
+        self.results['exec_overview'] = ExecOverview(*(list(zip(totals[0], totals[1])) + list(changes[1])))
 
-    def gen_exec_overview(self):
+    ########## EXECUTIVE OVERVIEW SPLIT INTO PARTS ##########
+    #################### NOT IN USE ####################
+    def exec_ov_metric(self, metric):
         '''
-        Generates the raw changes and percentage changes in:
-        VISITORS(users), VISITS(sessions), PAGEVIEWS, GOAL COMPLETIONS, and EVENTS
+        :param metric: A metric of the executive overview (e.g. ga:users)
+        :return: A tuple with the site wide change and the site wide percentage change of the metric
         '''
-        self.activity_log.debug('Generating executive overview data')
+        contexts = self.get_period_contexts(dimensions='ga:pagePath',
+                                            metrics=metric,
+                                            sort_key='-' + metric
+                                            )
 
-        context = self.get_ga_api_context(period=self.period_current,
-                                          dimensions='ga:pagePath',
-                                          metrics='ga:users, ga:sessions, ga:pageviews, ga:goalCompletionsAll, ga:totalEvents',
-                                          sort_key='-ga:users'
-                                          )
-        values = api.get_results(context)
-
-        # Get column names
-        headers = values.get('columnHeaders')
-        col_names = []
-        for header in headers:
-            col_names.append(header.get('name'))
-
-        # Get data for current period
-        exec_ov_current = pd.DataFrame(values.get("rows"), columns=col_names)
-
-        # Update call for second period
-        context["st_date"] = self.period_previous['START']
-        context["end_date"] = self.period_previous['END']
-        values = api.get_results(context)
-
-        # Get data for previous period
-        exec_ov_previous = pd.DataFrame(values.get("rows"), columns=col_names)
-
-        # Outer merge: Everything from both periods (previous first)
-        exec_ov_full = exec_ov_previous.merge(right=exec_ov_current,
-                                          how='outer',
-                                          on=['ga:pagePath'],
-                                          suffixes=['_prev', '_curr'])
-
-        # Replace all NaN values with zero
-        # and Convert page views to numeric
-        exec_ov_full[['ga:users_prev', 'ga:users_curr']] = exec_ov_full[
-            ['ga:users_prev', 'ga:users_curr']].fillna(0.0).astype(int)
-        exec_ov_full[['ga:sessions_prev', 'ga:sessions_curr']] = exec_ov_full[
-            ['ga:sessions_prev', 'ga:sessions_curr']].fillna(0.0).astype(int)
-        exec_ov_full[['ga:pageviews_prev', 'ga:pageviews_curr']] = exec_ov_full[
-            ['ga:pageviews_prev', 'ga:pageviews_curr']].fillna(0.0).astype(int)
-        exec_ov_full[['ga:goalCompletionsAll_prev', 'ga:goalCompletionsAll_curr']] = exec_ov_full[
-            ['ga:goalCompletionsAll_prev', 'ga:goalCompletionsAll_curr']].fillna(0.0).astype(int)
-        exec_ov_full[['ga:totalEvents_prev', 'ga:totalEvents_curr']] = exec_ov_full[
-            ['ga:totalEvents_prev', 'ga:totalEvents_curr']].fillna(0.0).astype(int)
-
-        # From prev to curr
-        self.exec_ov_visitors_delta = (exec_ov_full['ga:users_prev'].sum(), exec_ov_full['ga:users_curr'].sum())
-        self.exec_ov_visits_delta = (exec_ov_full['ga:sessions_prev'].sum(), exec_ov_full['ga:sessions_curr'].sum())
-        self.exec_ov_pageviews_delta = (exec_ov_full['ga:pageviews_prev'].sum(), exec_ov_full['ga:pageviews_curr'].sum())
-        self.exec_ov_goals_delta = (exec_ov_full['ga:goalCompletionsAll_prev'].sum(), exec_ov_full['ga:goalCompletionsAll_curr'].sum())
-        self.exec_ov_events_delta = (exec_ov_full['ga:totalEvents_prev'].sum(), exec_ov_full['ga:totalEvents_curr'].sum())
-
-        # Get the site wide percentage change in page views
-        self.exec_ov_visitors_delta_perc = round((self.exec_ov_visitors_delta[1] - self.exec_ov_visitors_delta[0]) /
-                                                 (self.exec_ov_visitors_delta[0]) * 100, 2)
-        self.exec_ov_visits_delta_perc = round((self.exec_ov_visits_delta[1] - self.exec_ov_visits_delta[0]) /
-                                               (self.exec_ov_visits_delta[0]) * 100, 2)
-        self.exec_ov_pageviews_delta_perc = round((self.exec_ov_pageviews_delta[1] - self.exec_ov_pageviews_delta[0]) /
-                                                  (self.exec_ov_pageviews_delta[0]) * 100, 2)
-        self.exec_ov_goals_delta_perc = round((self.exec_ov_goals_delta[1] - self.exec_ov_goals_delta[0]) /
-                                              (self.exec_ov_goals_delta[0]) * 100, 2)
-        self.exec_ov_events_delta_perc = round((self.exec_ov_events_delta[1] - self.exec_ov_events_delta[0]) /
-                                               (self.exec_ov_events_delta[0]) * 100, 2)
+        # Get data for current and previous period in one batch
+        metric_current, metric_previous = api.get_frames(contexts)
+
+        # Sum up both periods (previous first)
+        totals, changes = compare_totals([metric_previous, metric_current], metrics=[metric])
+        return totals[1, 0] - totals[0, 0], changes[1, 0]
 
-    ########## EXECUTIVE OVERVIEW SPLIT INTO PARTS ##########
-    #################### NOT IN USE ####################
     def exec_ov_visitors(self):
-        context = self.get_ga_api_context(period=self.period_current,
-                                          dimensions='ga:pagePath',
-                                          metrics='ga:users',
-                                          sort_key='-ga:users'
-                                          )
-        values = api.get_results(context)
-
-        # Get column names
-        headers = values.get('columnHeaders')
-        col_names = []
-        for header in headers:
-            col_names.append(header.get('name'))
-
-        # Get data for current period
-        users_current = pd.DataFrame(values.get("rows"), columns=col_names)
-
-        # Update call for second period
-        context["st_date"] = self.period_previous['START']
-        context["end_date"] = self.period_previous['END']
-        values = api.get_results(context)
-
-        # Get data for previous period
-        users_previous = pd.DataFrame(values.get("rows"), columns=col_names)
-
-        # Outer merge: Everything from both periods (previous first)
-        users_full = users_previous.merge(right=users_current,
-                                                    how='outer',
-                                                    on=['ga:pagePath'],
-                                                    suffixes=['_prev', '_curr'])
-
-        # Replace all NaN values with zero
-        # and Convert page views to numeric
-        users_full[['ga:users_prev', 'ga:users_curr']] = users_full[
-            ['ga:users_prev', 'ga:users_curr']].fillna(0.0).astype(int)
-
-        # Add the delta value from prev to curr page views
-        users_full.loc[:, 'Delta'] = users_full['ga:users_curr'] - users_full['ga:users_prev']
-
-        # Get site wide change in page views
-        self.exec_ov_visitors_delta = users_full['Delta'].sum()
-
-        # Get the site wide percentage change in page views
-        self.exec_ov_visitors_delta_perc = round(self.exec_ov_visitors_delta / users_full['ga:users_prev'].sum() *100, 2)
+        return self.exec_ov_metric('ga:users')
 
     def exec_ov_visits(self):
-        context = self.get_ga_api_context(period=self.period_current,
-                                          dimensions='ga:pagePath',
-                                          metrics='ga:sessions',
-                                          sort_key='-ga:sessions'
-                                          )
-        values = api.get_results(context)
-
-        # Get column names
-        headers = values.get('columnHeaders')
-        col_names = []
-        for header in headers:
-            col_names.append(header.get('name'))
-
-        # Get data for current period
-        sessions_current = pd.DataFrame(values.get("rows"), columns=col_names)
-
-        # Update call for second period
-        context["st_date"] = self.period_previous['START']
-        context["end_date"] = self.period_previous['END']
-        values = api.get_results(context)
-
-        # Get data for previous period
-        sessions_previous = pd.DataFrame(values.get("rows"), columns=col_names)
-
-        # Outer merge: Everything from both periods (previous first)
-        sessions_full = sessions_previous.merge(right=sessions_current,
-                                                    how='outer',
-                                                    on=['ga:pagePath'],
-                                                    suffixes=['_prev', '_curr'])
-
-        # Replace all NaN values with zero
-        # and Convert page views to numeric
-        sessions_full[['ga:sessions_prev', 'ga:sessions_curr']] = sessions_full[
-            ['ga:sessions_prev', 'ga:sessions_curr']].fillna(0.0).astype(int)
-
-        # Add the delta value from prev to curr page views
-        sessions_full.loc[:, 'Delta'] = sessions_full['ga:sessions_curr'] - sessions_full['ga:sessions_prev']
-
-        # Get site wide change in page views
-        self.exec_ov_visits_delta = sessions_full['Delta'].sum()
-
-        # Get the site wide percentage change in page views
-        self.exec_ov_visits_delta_perc = round(self.exec_ov_visits_delta / sessions_full['ga:sessions_prev'].sum() *100, 2)
+        return self.exec_ov_metric('ga:sessions')
 
     def exec_ov_pageviews(self):
-        context = self.get_ga_api_context(period=self.period_current,
-                                          dimensions='ga:pagePath',
-                                          metrics='ga:pageviews',
-                                          sort_key='-ga:pageviews'
-                                          )
-        values = api.get_results(context)
-
-        # Get column names
-        headers = values.get('columnHeaders')
-        col_names = []
-        for header in headers:
-            col_names.append(header.get('name'))
-
-        # Get data for current period
-        page_views_current = pd.DataFrame(values.get("rows"), columns=col_names)
-
-        # Update call for second period
-        context["st_date"] = self.period_previous['START']
-        context["end_date"] = self.period_previous['END']
-        values = api.get_results(context)
-
-        # Get data for previous period
-        page_views_previous = pd.DataFrame(values.get("rows"), columns=col_names)
-
-        # Outer merge: Everything from both periods (previous first)
-        page_views_full = page_views_previous.merge(right=page_views_current,
-                                                    how='outer',
-                                                    on=['ga:pagePath'],
-                                                    suffixes=['_prev', '_curr'])
-
-        # Replace all NaN values with zero
-        # and Convert page views to numeric
-        #page_views_full.fillna(value=0, axis=0, inplace=True)
-        page_views_full[['ga:pageviews_prev', 'ga:pageviews_curr']] = page_views_full[
-            ['ga:pageviews_prev', 'ga:pageviews_curr']].fillna(0.0).astype(int)
-
-        # Add the delta value from prev to curr page views
-        page_views_full.loc[:, 'Delta'] = page_views_full['ga:pageviews_curr'] - page_views_full['ga:pageviews_prev']
-
-        # Get site wide change in page views
-        self.exec_ov_pageviews_delta = page_views_full['Delta'].sum()
-
-        # Get the site wide percentage change in page views
-        self.exec_ov_pageviews_delta_perc = round(self.exec_ov_pageviews_delta / page_views_full['ga:pageviews_prev'].sum() *100, 2)
+        return self.exec_ov_metric('ga:pageviews')
 
     def exec_ov_goalcompletions(self):
-        context = self.get_ga_api_context(period=self.period_current,
-                                          dimensions='ga:pagePath',
-                                          metrics='ga:goalCompletionsAll',
-                                          sort_key='-ga:goalCompletionsAll'
-                                          )
-        values = api.get_results(context)
-
-        # Get column names
-        headers = values.get('columnHeaders')
-        col_names = []
-        for header in headers:
-            col_names.append(header.get('name'))
-
-        # Get data for current period
-        goal_compl_current = pd.DataFrame(values.get("rows"), columns=col_names)
-
-        # Update call for second period
-        context["st_date"] = self.period_previous['START']
-        context["end_date"] = self.period_previous['END']
-        values = api.get_results(context)
-
-        # Get data for previous period
-        goal_compl_previous = pd.DataFrame(values.get("rows"), columns=col_names)
-
-        # Outer merge: Everything from both periods (previous first)
-        goal_compl_full = goal_compl_previous.merge(right=goal_compl_current,
-                                                how='outer',
-                                                on=['ga:pagePath'],
-                                                suffixes=['_prev', '_curr'])
-
-        # Replace all NaN values with zero
-        # and Convert page views to numeric
-        goal_compl_full[['ga:goalCompletionsAll_prev', 'ga:goalCompletionsAll_curr']] = goal_compl_full[
-            ['ga:goalCompletionsAll_prev', 'ga:goalCompletionsAll_curr']].fillna(0.0).astype(int)
-
-        # Add the delta value from prev to curr page views
-        goal_compl_full.loc[:, 'Delta'] = goal_compl_full['ga:goalCompletionsAll_curr'] - goal_compl_full['ga:goalCompletionsAll_prev']
-
-        # Get site wide change in page views
-        self.exec_ov_goals_delta = goal_compl_full['Delta'].sum()
-
-        # Get the site wide percentage change in page views
-        self.exec_ov_goals_delta_perc = round(self.exec_ov_goals_delta / goal_compl_full['ga:goalCompletionsAll_prev'].sum() * 100, 2)
+        return self.exec_ov_metric('ga:goalCompletionsAll')
 
     def exec_ov_events(self):
-        context = self.get_ga_api_context(period=self.period_current,
-                                          dimensions='ga:pagePath',
-                                          metrics='ga:totalEvents',
-                                          sort_key='-ga:totalEvents'
-                                          )
-        values = api.get_results(context)
-
-        # Get column names
-        headers = values.get('columnHeaders')
-        col_names = []
-        for header in headers:
-            col_names.append(header.get('name'))
-
-        # Get data for current period
-        events_current = pd.DataFrame(values.get("rows"), columns=col_names)
-
-        # Update call for second period
-        context["st_date"] = self.period_previous['START']
-        context["end_date"] = self.period_previous['END']
-        values = api.get_results(context)
-
-        # Get data for previous period
-        events_previous = pd.DataFrame(values.get("rows"), columns=col_names)
-
-        # Outer merge: Everything from both periods (previous first)
-        events_full = events_previous.merge(right=events_current,
-                                                    how='outer',
-                                                    on=['ga:pagePath'],
-                                                    suffixes=['_prev', '_curr'])
-
-        # Replace all NaN values with zero
-        # and Convert page views to numeric
-        events_full[['ga:totalEvents_prev', 'ga:totalEvents_curr']] = events_full[
-            ['ga:totalEvents_prev', 'ga:totalEvents_curr']].fillna(0.0).astype(int)
-
-        # Add the delta value from prev to curr page views
-        events_full.loc[:, 'Delta'] = events_full['ga:totalEvents_curr'] - events_full['ga:totalEvents_prev']
-
-        # Get site wide change in page views
-        self.exec_ov_events_delta = events_full['Delta'].sum()
-
-        # Get the site wide percentage change in page views
-        self.exec_ov_events_delta_perc = round(self.exec_ov_events_delta / events_full['ga:totalEvents_prev'].sum() * 100, 2)
+        return self.exec_ov_metric('ga:totalEvents')
 
     def get_top_spikes_smry(self):
         return self.top_n_spikes
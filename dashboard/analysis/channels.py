@@ -0,0 +1,134 @@
+'''
+file: channels.py
+created: Oct 18, 2026
+
+Groups the traffic sources of the dashboard into channels (Social, Organic Search, ...) from a declarative rule table.
+Every rule matches the values of some dimensions of the sources report, the first matching rule gives the category of
+a source and sources matched by no rule fall into the default category. The categories of all the sources are assigned
+in one vectorized pass, the detail and the summary of the channels are one groupby each.
+'''
+
+import numpy as np
+import pandas as pd
+
+from dashboard.analysis.comparison import percent_change, percent_ratio
+from dashboard.analysis.frames import sum_by
+
+
+# Format: (rule, ...), rules are tried in order and listed in that order on the dashboard
+# rule: {'category': name, 'match': {dimension: (value, ...)}, 'source': dimension naming the source (ga:source)}
+# A source matches a rule when the value of every dimension of match is one of the listed values
+DEFAULT_CHANNEL_RULES = (
+    {'category': 'Social', 'match': {'ga:hasSocialSourceReferral': ('Yes',)}, 'source': 'ga:socialNetwork'},
+    {'category': 'Organic Search', 'match': {'ga:medium': ('organic',)}},
+    {'category': 'Paid Search', 'match': {'ga:medium': ('cpc', 'ppc', 'paidsearch')}},
+    {'category': 'Display', 'match': {'ga:medium': ('display', 'cpm', 'banner')}},
+    {'category': 'Referral', 'match': {'ga:medium': ('referral',)}},
+    {'category': 'Direct', 'match': {'ga:source': ('(direct)',)}},
+    {'category': 'Email', 'match': {'ga:medium': ('email',)}},
+)
+
+DEFAULT_CATEGORY = 'Other'
+
+# Metrics of the sources report, summed by the detail and the summary
+SOURCE_METRICS = ['ga:sessions_prev', 'ga:goalCompletionsAll_prev', 'ga:sessions_curr', 'ga:goalCompletionsAll_curr']
+
+
+def add_rates(frame):
+    '''
+    Adds the change rates of sessions and goal completions and the conversion rates of both periods, in %.
+    A change rate is inf when the previous period is zero (shown as such by the dashboard), a rate is zero when both of
+    its terms are zero.
+
+    :param frame: A data frame with the SOURCE_METRICS columns
+    :return: The data frame
+    '''
+    frame['sessionsChangeRate'] = percent_change(frame['ga:sessions_prev'].values, frame['ga:sessions_curr'].values,
+                                                 from_zero=np.inf)
+    frame['goalCompletionsChangeRate'] = percent_change(frame['ga:goalCompletionsAll_prev'].values,
+                                                        frame['ga:goalCompletionsAll_curr'].values, from_zero=np.inf)
+    frame['goalConversionRateAll_curr'] = percent_ratio(frame['ga:goalCompletionsAll_curr'].values,
+                                                        frame['ga:sessions_curr'].values)
+    frame['goalConversionRateAll_prev'] = percent_ratio(frame['ga:goalCompletionsAll_prev'].values,
+                                                        frame['ga:sessions_prev'].values)
+    return frame
+
+
+class ChannelGrouping(object):
+    '''
+    Rule table assigning a channel category to every traffic source
+    '''
+
+    def __init__(self, rules=DEFAULT_CHANNEL_RULES, default_category=DEFAULT_CATEGORY):
+        '''
+        :param rules: The rule table (see DEFAULT_CHANNEL_RULES)
+        :param default_category: Category of the sources matched by no rule
+        '''
+        self.rules = tuple(rules)
+        self.default_category = default_category
+
+        # categories in dashboard order, several rules may share a category
+        self.categories = []
+        for rule in self.rules:
+            if rule['category'] not in self.categories:
+                self.categories.append(rule['category'])
+        if default_category not in self.categories:
+            self.categories.append(default_category)
+
+    def assign(self, frame):
+        '''
+        :param frame: The sources data frame, with the dimensions of the rules
+        :return: A tuple with the position in categories of the category of every row and a numpy object array of
+        the source name of every row
+        '''
+        default = self.categories.index(self.default_category)
+        codes = np.full(len(frame), default, dtype=np.int64)
+        sources = frame['ga:source'].values.astype(object)
+        unmatched = np.ones(len(frame), dtype=bool)
+
+        for rule in self.rules:
+            matched = unmatched.copy()
+            for dimension, values in rule['match'].items():
+                matched &= frame[dimension].isin(values).values
+            codes[matched] = self.categories.index(rule['category'])
+            if rule.get('source', 'ga:source') != 'ga:source':
+                sources[matched] = frame[rule['source']].values.astype(object)[matched]
+            unmatched &= ~matched
+
+        return codes, sources
+
+    def group(self, sources):
+        '''
+        :param sources: The sources data frame of both periods (see Analytics.compute_sources), with the SOURCE_METRICS
+        :return: A tuple with the detail data frame, indexed by category and source and sorted by category then
+        current sessions, and the summary data frame, indexed by category and sorted by current sessions
+        '''
+        codes, names = self.assign(sources)
+        frame = pd.DataFrame({'channel': codes, 'source': names})
+        for metric in SOURCE_METRICS:
+            frame[metric] = sources[metric].values
+
+        detail = sum_by(frame, ['channel', 'source'], SOURCE_METRICS)
+        detail = detail.sort_values(['channel', 'ga:sessions_curr'], ascending=[True, False], kind='mergesort')
+        detail.insert(0, 'category', np.array(self.categories, dtype=object)[detail['channel'].values])
+
+        summary = sum_by(detail, ['category'], SOURCE_METRICS)
+        summary = summary.sort_values(['ga:sessions_curr'], ascending=False, kind='mergesort')
+
+        detail = add_rates(detail.drop('channel', axis=1)).set_index(['category', 'source'])
+        summary = add_rates(summary).set_index(['category'])
+        return detail, summary
+
+
+channel_grouping = ChannelGrouping()
+
+
+def configure(rules=None, default_category=DEFAULT_CATEGORY):
+    '''
+    Replaces the process wide channel grouping of the traffic sources
+
+    :param rules: The rule table (see DEFAULT_CHANNEL_RULES), None keeps the default rules
+    :param default_category: Category of the sources matched by no rule
+    '''
+    global channel_grouping
+    channel_grouping = ChannelGrouping(DEFAULT_CHANNEL_RULES if rules is None else rules, default_category)
@@ -0,0 +1,106 @@
+'''
+file: comparison.py
+created: Oct 18, 2026
+
+Compares the metrics of a report over N periods (previous and current, or week over week, month over month, year over
+year, ...). The periods are joined once on their keys (see frames.combine_frames), then the deltas and percentage
+changes of every metric and period are computed in one pass over the stacked metric values. A zero denominator gives
+the same result everywhere: 0 when nothing changed, from_zero (with the sign of the delta) otherwise.
+'''
+
+import numpy as np
+
+from dashboard.analysis.frames import combine_frames
+
+
+# Percentage change of a metric growing from zero
+FROM_ZERO = 100.0
+
+
+def percent_change(previous, current, from_zero=FROM_ZERO, decimals=2):
+    '''
+    :param previous: The values of the reference period, a number or a numpy array
+    :param current: The values of the compared period, broadcast against previous
+    :param from_zero: The change of a value growing from zero (e.g. 100.0 or np.inf), negated for a value dropping
+    below zero
+    :param decimals: Number of decimal places of the result
+    :return: The percentage changes from previous to current, 0 where both are zero, a float or a numpy float array
+    '''
+    previous = np.asarray(previous, dtype=np.float64)
+    delta = np.asarray(current, dtype=np.float64) - previous
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = np.asarray(np.round(delta / previous * 100, decimals))
+    zero = np.broadcast_to(previous == 0, change.shape)
+    moved = zero & (delta != 0)
+    change[zero] = 0.0
+    change[moved] = np.sign(delta[moved]) * from_zero
+
+    return change if change.ndim else change[()]
+
+
+def percent_ratio(numerator, denominator, decimals=2):
+    '''
+    :param numerator: A number or a numpy array (e.g. goal completions)
+    :param denominator: A number or a numpy array (e.g. sessions)
+    :param decimals: Number of decimal places of the result
+    :return: The ratios in %, 0 where the denominator is zero
+    '''
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.asarray(np.round(numerator / denominator * 100, decimals))
+    ratio[np.broadcast_to(denominator == 0, ratio.shape)] = 0.0
+
+    return ratio if ratio.ndim else ratio[()]
+
+
+def compare_periods(frames, keys, metrics, suffixes=('_prev', '_curr'), baseline=0, from_zero=FROM_ZERO,
+                    delta_suffix='_delta', change_suffix='_change', sort=False):
+    '''
+    :param frames: The data frames of the periods, in the order of suffixes
+    :param keys: Names of the dimension columns to join on
+    :param metrics: Names of the metric columns
+    :param suffixes: Suffix of the metric columns of every period
+    :param baseline: Position of the period every other period is compared with
+    :param from_zero: The percentage change of a metric growing from zero (see percent_change)
+    :param delta_suffix: Inserted between a metric and a period suffix to name the delta columns
+    :param change_suffix: Inserted between a metric and a period suffix to name the percentage change columns, None
+    leaves out the percentage changes
+    :param sort: Sort the result by the keys (see frames.combine_frames)
+    :return: A data frame with the keys, the metrics of every period, then for every period other than the baseline
+    the delta and the percentage change of every metric, e.g. ga:pageviews_delta_curr and ga:pageviews_change_curr
+    '''
+    combined = combine_frames(frames, keys, metrics, suffixes, sort)
+
+    # Format: (rows, periods, metrics)
+    values = np.stack([combined[[metric + suffix for metric in metrics]].values for suffix in suffixes], axis=1)
+    compared = [period for period in range(len(suffixes)) if period != baseline]
+    previous = values[:, [baseline], :]
+    current = values[:, compared, :]
+
+    deltas = current - previous
+    changes = percent_change(previous, current, from_zero) if change_suffix is not None else None
+
+    for position, period in enumerate(compared):
+        for column, metric in enumerate(metrics):
+            combined[metric + delta_suffix + suffixes[period]] = deltas[:, position, column]
+            if changes is not None:
+                combined[metric + change_suffix + suffixes[period]] = changes[:, position, column]
+    return combined
+
+
+def compare_totals(frames, metrics, baseline=0, from_zero=FROM_ZERO):
+    '''
+    Site wide comparison, the metrics of every period are summed over all of its rows without joining the periods
+
+    :param frames: The data frames of the periods
+    :param metrics: Names of the metric columns
+    :param baseline: Position of the period every other period is compared with
+    :param from_zero: The percentage change of a metric growing from zero (see percent_change)
+    :return: A tuple with the numpy arrays (periods x metrics) of the totals and of their percentage changes from the
+    baseline period
+    '''
+    totals = np.array([frame[metrics].values.sum(axis=0) for frame in frames])
+    return totals, percent_change(totals[[baseline]], totals, from_zero)
@@ -0,0 +1,131 @@
+'''
+file: datatable.py
+created: Oct 18, 2026
+
+Encodes data frames as Google Charts DataTable JSON ({"cols": [...], "rows": [{"c": [{"v": ..., "f": ...}]}]}). Every
+column is encoded at once into the list of the JSON literals of its cells, then each row is one string format of those
+literals, so no dictionary is built per cell and numpy scalars never go through json.dumps. NaN and infinite values
+are written as null, which DataTable reads as missing. The output is the output of json.dumps with its default
+separators, with "</" escaped so it can be pasted into a script block. String cells are encoded by the C encoder of
+json.dumps itself (encode_basestring_ascii).
+'''
+
+from collections import OrderedDict
+from json.encoder import encode_basestring_ascii
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+
+# Keys of a column spec written to the cols of the DataTable, in this order
+COLUMN_KEYS = ('id', 'label', 'type', 'p')
+
+
+def encode_value(value):
+    '''
+    :param value: A value of an object column: a string, None, a number or a numpy scalar
+    :return: The JSON literal of the value, null for None, NaN and infinite values
+    :raises TypeError: If the value can not be encoded
+    '''
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    if value is None:
+        return 'null'
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, int):
+        return int.__repr__(value)
+    if isinstance(value, float):
+        return float.__repr__(value) if math.isfinite(value) else 'null'
+    return json.dumps(value)
+
+
+def get_missing(values):
+    '''
+    :param values: A numpy array
+    :return: The positions of the None, NaN and infinite values
+    '''
+    if values.dtype.kind == 'f':
+        return np.flatnonzero(~np.isfinite(values))
+    if values.dtype.kind == 'O':
+        return np.flatnonzero(pd.isnull(values))
+    return np.array([], dtype=np.intp)
+
+
+def encode_column(values):
+    '''
+    :param values: A Series, an Index or a numpy array
+    :return: A list with the JSON literal of every value, null for None, NaN and infinite values
+    '''
+    values = np.asarray(values)
+    kind = values.dtype.kind
+    if kind == 'f':
+        literals = list(map(float.__repr__, values.tolist()))
+    elif kind in 'iu':
+        literals = list(map(int.__repr__, values.tolist()))
+    elif kind == 'b':
+        return ['true' if value else 'false' for value in values.tolist()]
+    elif kind in 'US':
+        return list(map(encode_basestring_ascii, values.astype(str).tolist()))
+    else:
+        return list(map(encode_value, values.tolist()))
+
+    for position in get_missing(values).tolist():
+        literals[position] = 'null'
+    return literals
+
+
+def format_column(values, pattern):
+    '''
+    :param values: A Series, an Index or a numpy array of numbers
+    :param pattern: A printf style pattern, e.g. '%.1f%%'
+    :return: A list with the JSON string literal of every formatted value, null for None, NaN and infinite values
+    '''
+    values = np.asarray(values)
+    literals = list(map(encode_basestring_ascii, map(pattern.__mod__, values.tolist())))
+    for position in get_missing(values).tolist():
+        literals[position] = 'null'
+    return literals
+
+
+def datatable_json(frame, columns):
+    '''
+    :param frame: A data frame, one row per row of the DataTable
+    :param columns: A list of column specs, one per column of the DataTable: dictionaries with the id, label, type and
+    p of the column (only the keys given are written) and
+        value: the column of frame holding the values, None for the index,
+        formatted: optional column of frame holding the formatted values (f) of the cells,
+        pattern: optional printf style pattern formatting the values into the formatted values
+    :return: The DataTable JSON string
+    :raises KeyError: If a column of a spec is not a column of the frame
+    '''
+    cols = []
+    cells = []
+    literals = []
+    for column in columns:
+        cols.append(OrderedDict((key, column[key]) for key in COLUMN_KEYS if key in column))
+
+        name = column.get('value')
+        values = encode_column(frame.index if name is None else frame[name])
+        literals.append(values)
+
+        if 'formatted' in column:
+            formatted = column['formatted']
+            literals.append(values if formatted == name else
+                            encode_column(frame.index if formatted is None else frame[formatted]))
+            cells.append('{"v": %s, "f": %s}')
+        elif 'pattern' in column:
+            literals.append(format_column(frame.index if name is None else frame[name], column['pattern']))
+            cells.append('{"v": %s, "f": %s}')
+        else:
+            cells.append('{"v": %s}')
+
+    row = '{"c": [' + ', '.join(cells) + ']}'
+    rows = [row % cell_literals for cell_literals in zip(*literals)]
+
+    # "</" only appears in strings, where "<\/" is the same string
+    return ('{"cols": %s, "rows": [%s]}' % (json.dumps(cols), ', '.join(rows))).replace('</', '<\\/')
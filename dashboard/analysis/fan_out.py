@@ -0,0 +1,208 @@
+'''
+file: fan_out.py
+created: Oct 18, 2026
+
+Builds the dashboard analyses of several Google Analytics views (profiles), e.g. the client views of an agency, on
+one bounded pool of workers, so the total time grows with the number of clients divided by the pool size. Every
+profile has its own limit of builds running at the same time, so a client can neither take every worker nor exceed
+the concurrent request quota of its view, and its own cache of built analyses, so a large client never evicts the
+others. The executive overviews of the clients are rolled up into one "all clients" overview.
+'''
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import numpy as np
+import pandas as pd
+
+from dashboard.API.query_essentials import query_basic as api
+from dashboard.analysis import singleflight
+from dashboard.analysis.analytics import Analytics
+from dashboard.analysis.comparison import percent_change
+from dashboard.analysis.recent import RecentAnalyses
+
+
+# Executive overview of an analysis rolled up over the clients
+# Format: {name: attribute holding the (previous, current) totals of the metric}
+OVERVIEW_METRICS = OrderedDict([
+    ('visitors', 'exec_ov_visitors_delta'),
+    ('visits', 'exec_ov_visits_delta'),
+    ('pageviews', 'exec_ov_pageviews_delta'),
+    ('goal_completions', 'exec_ov_goals_delta'),
+    ('events', 'exec_ov_events_delta')
+])
+
+ALL_CLIENTS = 'All clients'
+
+
+def roll_up(analyses, label=ALL_CLIENTS):
+    '''
+    :param analyses: A dictionary of built analyses, by profile id
+    :param label: Index of the row summing every client
+    :return: A data frame indexed by profile id, then label, with the previous and current totals (<name>_prev,
+    <name>_curr) and the percentage change (<name>_change) of every metric of OVERVIEW_METRICS. Visitors of several
+    clients are added up, a visitor of two clients counts twice.
+    '''
+    profile_ids = list(analyses)
+
+    # Format: (profiles, metrics)
+    previous = np.array([[getattr(analyses[profile_id], attribute)[0] for attribute in OVERVIEW_METRICS.values()]
+                         for profile_id in profile_ids], dtype=np.int64).reshape(len(profile_ids), len(OVERVIEW_METRICS))
+    current = np.array([[getattr(analyses[profile_id], attribute)[1] for attribute in OVERVIEW_METRICS.values()]
+                        for profile_id in profile_ids], dtype=np.int64).reshape(len(profile_ids), len(OVERVIEW_METRICS))
+
+    previous = np.vstack([previous, previous.sum(axis=0)])
+    current = np.vstack([current, current.sum(axis=0)])
+    changes = percent_change(previous, current)
+
+    overview = pd.DataFrame(index=pd.Index(profile_ids + [label], name='profile_id'))
+    for column, name in enumerate(OVERVIEW_METRICS):
+        overview[name + '_prev'] = previous[:, column]
+        overview[name + '_curr'] = current[:, column]
+        overview[name + '_change'] = changes[:, column]
+    return overview
+
+
+class ProfileFanOut(object):
+    '''
+    Builds the analyses of several profiles concurrently, the pool is shared by every caller of the process
+    '''
+
+    def __init__(self, max_workers=4, per_profile=1, stage_workers=3, max_entries=4):
+        '''
+        :param max_workers: Maximum number of analyses built at the same time, over all profiles
+        :param per_profile: Maximum number of analyses of the same profile built at the same time, builds of the same
+        profile and periods are shared anyway (see singleflight)
+        :param stage_workers: Maximum number of stages running at the same time in each analysis, a profile never has
+        more than per_profile * stage_workers reports in flight (the Core Reporting API allows 10 per view)
+        :param max_entries: Number of built analyses kept per profile, 0 keeps none
+        '''
+        self.max_workers = max_workers
+        self.per_profile = per_profile
+        self.stage_workers = stage_workers
+        self.max_entries = max_entries
+
+        self.lock = threading.Lock()
+        self.executor = None
+
+        # Format: {profile id: BoundedSemaphore}, {profile id: RecentAnalyses}
+        self.limits = {}
+        self.caches = {}
+
+        self.builds = 0
+        self.hits = 0
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            return self.executor
+
+    def get_profile(self, profile_id):
+        '''
+        :param profile_id: A profile id
+        :return: A tuple with the concurrency limit and the cache of the profile
+        '''
+        with self.lock:
+            if profile_id not in self.limits:
+                self.limits[profile_id] = threading.BoundedSemaphore(self.per_profile)
+                self.caches[profile_id] = RecentAnalyses(self.max_entries)
+            return self.limits[profile_id], self.caches[profile_id]
+
+    def get_analysis(self, profile_id, period_current=None, period_previous=None):
+        '''
+        :param profile_id: A profile id
+        :param period_current: Optional current period (see Analytics.period_current), None keeps the default one
+        :param period_previous: Optional previous period, None keeps the default one
+        :return: The built analysis of the profile and periods, from the cache of the profile when it was built before
+        '''
+        analysis = Analytics(profile_id=profile_id, max_workers=self.stage_workers)
+        if period_current is not None:
+            analysis.period_current = period_current
+        if period_previous is not None:
+            analysis.period_previous = period_previous
+
+        key = analysis.get_flight_key()
+        limit, cache = self.get_profile(profile_id)
+
+        cached = cache.get(key)
+        if cached is None:
+            with limit:
+                # built by another caller while this one waited for the limit
+                cached = cache.get(key)
+                if cached is None:
+                    def generate():
+                        analysis.generate()
+                        return analysis
+
+                    cached = singleflight.analysis_flight.do(key, generate)
+                    cache.put(key, cached)
+                    with self.lock:
+                        self.builds += 1
+                    return cached
+
+        with self.lock:
+            self.hits += 1
+        return cached
+
+    def build(self, profile_ids, period_current=None, period_previous=None):
+        '''
+        :param profile_ids: The profile ids to build
+        :param period_current: Optional current period of every analysis (see get_analysis)
+        :param period_previous: Optional previous period of every analysis
+        :return: A tuple with the dictionary of the built analyses and the dictionary of the errors of the profiles
+        that failed, both by profile id in the order of profile_ids
+        '''
+        executor = self.get_executor()
+        futures = OrderedDict((profile_id, executor.submit(self.get_analysis, profile_id, period_current,
+                                                           period_previous))
+                              for profile_id in OrderedDict.fromkeys(profile_ids))
+
+        analyses = OrderedDict()
+        errors = OrderedDict()
+        for profile_id, future in futures.items():
+            try:
+                analyses[profile_id] = future.result()
+            except Exception as error:
+                errors[profile_id] = error
+        return analyses, errors
+
+    def list_profiles(self):
+        '''
+        :return: The ids of every profile readable with the credentials of the dashboard
+        '''
+        return api.list_profile_ids({
+            "api_name": "analytics",
+            "api_version": "v3",
+            "scope": "https://www.googleapis.com/auth/analytics.readonly",
+            "svc_account_email": api.get_svc_account(),
+            "key_file_location": api.get_client_credentials()
+        })
+
+    def stats(self):
+        '''
+        :return: A dictionary with the number of analyses built and served from the caches of the profiles, and the
+        bytes retained by the result records of the cached analyses
+        '''
+        with self.lock:
+            caches = list(self.caches.values())
+            stats = {'builds': self.builds, 'hits': self.hits, 'profiles': len(caches)}
+
+        analyses = [analysis for cache in caches for analysis in cache.values()]
+        stats['cached'] = len(analyses)
+        stats['retained_bytes'] = sum(analysis.memory_report()['total'] for analysis in analyses)
+        return stats
+
+
+profile_fan_out = ProfileFanOut()
+
+
+def configure(**options):
+    '''
+    Replaces the process wide fan out of the profile analyses
+
+    :param options: Keyword arguments of ProfileFanOut (max_workers, per_profile, stage_workers, max_entries)
+    '''
+    global profile_fan_out
+    profile_fan_out = ProfileFanOut(**options)
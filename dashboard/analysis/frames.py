@@ -0,0 +1,205 @@
+'''
+file: frames.py
+created: Oct 18, 2026
+
+Operations on the typed report data frames (see columnar): string work on categorical dimensions runs once per
+distinct value instead of once per row, and the two periods of a report are combined without going through NaN
+and float columns.
+'''
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+def as_categorical(series):
+    '''
+    :param series: A dimension column
+    :return: The column as a categorical Series
+    '''
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    return series.astype('category')
+
+
+def from_distinct(values, codes, index, name):
+    '''
+    :param values: Numpy object array of the distinct values before deduplication
+    :param codes: Position in values of every row
+    :param index: Index of the resulting Series
+    :param name: Name of the resulting Series
+    :return: A categorical Series with sorted, unique categories
+    '''
+    value_codes, categories = pd.factorize(values, sort=True)
+    return pd.Series(pd.Categorical.from_codes(value_codes[codes], categories), index=index, name=name)
+
+
+def distinct_pairs(left, right):
+    '''
+    Concatenates two dimension columns (e.g. hostname and page path) once per distinct pair of values
+
+    :param left: A dimension column
+    :param right: A dimension column of the same frame
+    :return: A tuple with a numpy object array of the distinct concatenated strings and the position in it of every
+    row
+    '''
+    left = as_categorical(left)
+    right = as_categorical(right)
+
+    width = len(right.cat.categories)
+    pairs = left.cat.codes.values.astype(np.int64) * width + right.cat.codes.values
+    distinct, codes = np.unique(pairs, return_inverse=True)
+
+    values = left.cat.categories.values.astype(object)[distinct // width] + \
+        right.cat.categories.values.astype(object)[distinct % width]
+    return values, codes
+
+
+def concat_dimensions(left, right):
+    '''
+    :param left: A dimension column
+    :param right: A dimension column of the same frame
+    :return: The categorical column of the concatenated strings (see distinct_pairs)
+    '''
+    values, codes = distinct_pairs(left, right)
+    return from_distinct(values, codes, left.index, right.name)
+
+
+def replace_values(series, pattern, replacement):
+    '''
+    Regular expression replacement run once per distinct value of a dimension column
+
+    :param series: A dimension column
+    :param pattern: A regular expression
+    :param replacement: The replacement string
+    :return: The categorical column of the replaced values
+    '''
+    series = as_categorical(series)
+    values = series.cat.categories.to_series().str.replace(pattern, replacement, regex=True).values
+    return from_distinct(values.astype(object), series.cat.codes.values, series.index, series.name)
+
+
+def to_labels(frame, columns):
+    '''
+    Turns categorical columns back to plain strings, for the small frames handed to the views
+
+    :param frame: A data frame
+    :param columns: Names of the columns to convert
+    :return: The data frame
+    '''
+    for column in columns:
+        if isinstance(frame[column].dtype, pd.CategoricalDtype):
+            frame[column] = frame[column].astype(object)
+    return frame
+
+
+def sum_by(frame, keys, columns=None, sort=False):
+    '''
+    Sums the rows sharing the same keys, only the combinations of categorical keys present in the frame are kept
+
+    :param frame: A data frame
+    :param keys: Names of the columns to group by
+    :param columns: Names of the columns to sum, None sums every numeric column
+    :param sort: Sort the result by the keys, otherwise keys keep the order of their first appearance
+    :return: A data frame with the keys and the summed columns
+    '''
+    grouped = frame.groupby(keys, as_index=False, sort=False, observed=True)
+    result = grouped.sum() if columns is None else grouped[columns].sum()
+
+    # groupby puts the categories of the keys in the order of appearance, sort them again so the keys sort like
+    # strings
+    for key in keys:
+        if isinstance(result[key].dtype, pd.CategoricalDtype):
+            result[key] = result[key].cat.reorder_categories(result[key].cat.categories.sort_values())
+
+    if sort:
+        result = result.sort_values(keys, kind='mergesort').reset_index(drop=True)
+    return result
+
+
+def select_top(frame, n, by, ascending=False, tie_column=None, tie_key=None):
+    '''
+    Partial selection of the n rows with the largest (or smallest) values of a column, in linear time: only the rows
+    reaching the n-th value are sorted. Rows with equal values are ordered by the tie column, then by position.
+
+    :param frame: A data frame
+    :param n: Number of rows to keep
+    :param by: Name of the numeric column to rank by
+    :param ascending: Select the smallest values instead of the largest ones
+    :param tie_column: Optional name of the column ordering the rows with equal values
+    :param tie_key: Optional callable turning the values of the tie column into the values compared (e.g. codes into
+    labels), only called for the candidate rows
+    :return: The selected rows, sorted
+    '''
+    if n <= 0 or frame.empty:
+        return frame.iloc[:0]
+
+    values = frame[by].values
+    keys = values if ascending else -values
+    if len(keys) > n:
+        # every row up to the n-th key, including all the rows tied with it
+        nth = np.partition(keys, n - 1)[n - 1]
+        candidates = np.flatnonzero(keys <= nth)
+    else:
+        candidates = np.arange(len(keys))
+
+    sort_keys = [candidates]
+    if tie_column is not None:
+        ties = frame[tie_column].values[candidates]
+        sort_keys.append(tie_key(ties) if tie_key is not None else ties)
+    sort_keys.append(keys[candidates])
+
+    # lexsort sorts by the last key first
+    return frame.iloc[candidates[np.lexsort(sort_keys)[:n]]]
+
+
+def combine_frames(frames, keys, metrics, suffixes, sort=False):
+    '''
+    Outer join of N periods of a report, the metrics of rows sharing the same keys are summed. A key missing from a
+    period gets zero metrics for it, so integer metrics stay integers.
+
+    :param frames: The data frames of the periods
+    :param keys: Names of the dimension columns to join on
+    :param metrics: Names of the metric columns
+    :param suffixes: Suffix of the metric columns of every period
+    :param sort: Sort the result by the keys, otherwise keys keep the order of their first appearance (first period
+    first)
+    :return: A data frame with the keys, then the metrics of every period
+    '''
+    period_columns = [[metric + suffix for metric in metrics] for suffix in suffixes]
+    columns = [column for own in period_columns for column in own]
+
+    parts = []
+    for frame, own in zip(frames, period_columns):
+        part = frame[keys + metrics].copy()
+        part.columns = keys + own
+        for other in period_columns:
+            if other is not own:
+                for column, metric in zip(other, metrics):
+                    part[column] = np.zeros(len(part), dtype=frame[metric].dtype)
+        parts.append(part[keys + columns])
+
+    combined = pd.concat(parts, ignore_index=True)
+
+    # categoricals with different categories would be concatenated as objects
+    for key in keys:
+        if all(isinstance(frame[key].dtype, pd.CategoricalDtype) for frame in frames):
+            combined[key] = union_categoricals([frame[key] for frame in frames], sort_categories=True)
+
+    return sum_by(combined, keys, columns, sort)
+
+
+def combine_periods(previous, current, keys, metrics, suffixes=('_prev', '_curr'), sort=False):
+    '''
+    Outer join of the previous and current period of a report (see combine_frames)
+
+    :param previous: The previous period data frame
+    :param current: The current period data frame
+    :param keys: Names of the dimension columns to join on
+    :param metrics: Names of the metric columns
+    :param suffixes: Suffixes of the previous and current period metric columns
+    :param sort: Sort the result by the keys, otherwise keys keep the order of their first appearance (previous
+    period first)
+    :return: A data frame with the keys, the previous period metrics and the current period metrics
+    '''
+    return combine_frames([previous, current], keys, metrics, suffixes, sort)
@@ -0,0 +1,131 @@
+'''
+file: normalization.py
+created: Oct 18, 2026
+
+Normalizes the hostname + page path of the reports, so the same page reached through tracking links, a differently
+cased hostname or a trailing slash is counted once. The rules are applied with vectorized string operations to the
+paths not seen before, the result of every distinct raw path is kept for the life of the process.
+'''
+
+import re
+import threading
+
+import pandas as pd
+
+
+# Query parameters removed by default, * matches any characters of the parameter name
+DEFAULT_STRIP_PARAMS = ('utm_*', 'fbclid', 'inf_contact_key')
+
+
+def get_param_pattern(names):
+    '''
+    :param names: Names of query parameters, * matches any characters of a name
+    :return: A regular expression matching &name or &name=value, for every name, up to the next parameter
+    '''
+    alternatives = '|'.join(re.escape(name).replace(r'\*', '[^&=]*') for name in names)
+    return r'&(?:%s)(?:=[^&]*)?(?=&|$)' % alternatives
+
+
+class UrlNormalizer(object):
+    '''
+    Configurable, memoized normalization of hostname + page path strings
+    '''
+
+    def __init__(self, strip_params=DEFAULT_STRIP_PARAMS, lowercase_host=True, trim_trailing_slash=True,
+                 collapse_numeric_ids=False, numeric_id_placeholder=':id', max_entries=500000):
+        '''
+        :param strip_params: Names of the query parameters to remove, * matches any characters of a name
+        :param lowercase_host: Lowercase the hostname (everything before the first /)
+        :param trim_trailing_slash: Remove the trailing slashes of the path, the root path / is kept
+        :param collapse_numeric_ids: Replace the path segments made of digits only with numeric_id_placeholder
+        :param numeric_id_placeholder: The replacement of the numeric path segments
+        :param max_entries: Maximum number of remembered raw paths, the memo is emptied when it is full
+        '''
+        self.param_pattern = get_param_pattern(strip_params) if strip_params else None
+        self.lowercase_host = lowercase_host
+        self.trim_trailing_slash = trim_trailing_slash
+        self.collapse_numeric_ids = collapse_numeric_ids
+        self.numeric_id_placeholder = numeric_id_placeholder
+        self.max_entries = max_entries
+
+        self.lock = threading.Lock()
+        # Format: {raw path: normalized path}
+        self.memo = {}
+        self.hits = 0
+        self.misses = 0
+
+    def apply(self, values):
+        '''
+        Applies the rules to every value, without the memo
+
+        :param values: A list of raw hostname + page path strings
+        :return: A list of the normalized paths
+        '''
+        urls = pd.Series(values, dtype=object)
+        if urls.empty:
+            return []
+
+        parts = urls.str.partition('?')
+        base, query = parts[0], parts[2]
+        if self.param_pattern is not None:
+            # links without ? carry their parameters in the path (e.g. /page&inf_contact_key=...)
+            base = base.str.replace(self.param_pattern, '', regex=True)
+            query = ('&' + query).str.replace(self.param_pattern, '', regex=True).str[1:]
+        query = query.where(query == '', '?' + query)
+
+        parts = base.str.partition('/')
+        host, slash, path = parts[0], parts[1], parts[2]
+        if self.lowercase_host:
+            host = host.str.lower()
+        if self.collapse_numeric_ids:
+            path = path.str.replace(r'(?<![^/])\d+(?![^/])', self.numeric_id_placeholder, regex=True)
+        if self.trim_trailing_slash:
+            path = path.str.rstrip('/')
+
+        return (host + slash + path + query).tolist()
+
+    def normalize(self, values):
+        '''
+        :param values: A sequence of raw hostname + page path strings
+        :return: A list of the normalized paths, computed once per distinct raw path
+        '''
+        with self.lock:
+            normalized = [self.memo.get(value) for value in values]
+        missing = [index for index, value in enumerate(normalized) if value is None]
+
+        if missing:
+            raw_values = [values[index] for index in missing]
+            computed = self.apply(raw_values)
+            for index, value in zip(missing, computed):
+                normalized[index] = value
+
+            with self.lock:
+                if len(self.memo) + len(raw_values) > self.max_entries:
+                    self.memo.clear()
+                self.memo.update(zip(raw_values, computed))
+
+        with self.lock:
+            self.hits += len(normalized) - len(missing)
+            self.misses += len(missing)
+        return normalized
+
+    def stats(self):
+        '''
+        :return: A dictionary with the number of remembered paths, memo hits and misses
+        '''
+        with self.lock:
+            return {'entries': len(self.memo), 'hits': self.hits, 'misses': self.misses}
+
+
+url_normalizer = UrlNormalizer()
+
+
+def configure(**options):
+    '''
+    Replaces the process wide normalizer of the report paths
+
+    :param options: Keyword arguments of UrlNormalizer (strip_params, lowercase_host, trim_trailing_slash,
+    collapse_numeric_ids, numeric_id_placeholder, max_entries)
+    '''
+    global url_normalizer
+    url_normalizer = UrlNormalizer(**options)
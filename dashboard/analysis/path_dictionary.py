@@ -0,0 +1,104 @@
+'''
+file: path_dictionary.py
+created: Oct 18, 2026
+
+Interns the page paths of an analysis build. Every distinct hostname + page path is normalized (see normalization)
+and given an integer code once, the compute stages merge, group and filter on the codes and the paths are decoded
+back to strings only in the data frames handed to the dashboard views.
+'''
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from dashboard.analysis import normalization
+from dashboard.analysis.frames import distinct_pairs
+
+
+class PathDictionary(object):
+    '''
+    Thread safe, append only mapping between normalized page paths and integer codes, shared by the stages of one
+    analysis build
+    '''
+
+    def __init__(self, normalize=None):
+        '''
+        :param normalize: Callable turning a numpy object array of raw hostname + page path strings into the list of
+        their normalized paths, None uses the process wide normalizer (see normalization)
+        '''
+        self.normalize = normalize or normalization.url_normalizer.normalize
+        self.lock = threading.Lock()
+
+        # Format: {normalized path: code}, the code of a path is its position in values
+        self.codes = {}
+        self.values = []
+
+        # Format: {raw hostname + page path: code}, so a raw path is normalized once per build
+        self.raw_codes = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def intern(self, raw_values):
+        '''
+        :param raw_values: A numpy object array of distinct raw hostname + page path strings
+        :return: A numpy int32 array with the code of the normalized path of every value
+        '''
+        codes = np.empty(len(raw_values), dtype=np.int32)
+        with self.lock:
+            missing = []
+            for index, value in enumerate(raw_values):
+                code = self.raw_codes.get(value)
+                if code is None:
+                    missing.append(index)
+                else:
+                    codes[index] = code
+
+            if missing:
+                for index, path in zip(missing, self.normalize(raw_values[missing])):
+                    code = self.codes.get(path)
+                    if code is None:
+                        code = len(self.values)
+                        self.codes[path] = code
+                        self.values.append(path)
+                    self.raw_codes[raw_values[index]] = code
+                    codes[index] = code
+        return codes
+
+    def encode(self, hostnames, paths):
+        '''
+        Concatenates the hostname and page path columns of a report and interns the result
+
+        :param hostnames: The ga:hostname column
+        :param paths: The ga:pagePath column
+        :return: A numpy int32 array with the path code of every row
+        '''
+        raw_values, positions = distinct_pairs(hostnames, paths)
+        return self.intern(raw_values)[positions]
+
+    def decode(self, codes):
+        '''
+        :param codes: Path codes
+        :return: A numpy object array of the paths
+        '''
+        with self.lock:
+            return np.array([self.values[code] for code in codes], dtype=object)
+
+    def decode_columns(self, frame, columns):
+        '''
+        :param frame: A data frame
+        :param columns: Names of the columns holding path codes
+        :return: The data frame, with the paths in place of the codes
+        '''
+        for column in columns:
+            frame[column] = self.decode(frame[column].values)
+        return frame
+
+    def decode_index(self, frame):
+        '''
+        :param frame: A data frame indexed by path codes
+        :return: The data frame, indexed by the paths
+        '''
+        frame.index = pd.Index(self.decode(frame.index.values), name=frame.index.name)
+        return frame
@@ -0,0 +1,91 @@
+'''
+file: recent.py
+created: Oct 18, 2026
+
+Keeps the last dashboard analyses built by the process, by profile and period (see Analytics.get_flight_key). A time
+frame change starts from the analysis the page shows and only recomputes the stages reading dates that changed.
+'''
+
+from collections import OrderedDict
+import threading
+
+
+class RecentAnalyses(object):
+    '''
+    Thread safe, least recently used set of built analyses
+    '''
+
+    def __init__(self, max_entries=8):
+        '''
+        :param max_entries: Maximum number of analyses kept, 0 keeps none
+        '''
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+
+        # Format: {flight key: Analytics}, least recently used first
+        self.analyses = OrderedDict()
+
+    def get(self, key):
+        '''
+        :param key: A flight key, may be None
+        :return: The analysis of the key, or None
+        '''
+        with self.lock:
+            analysis = self.analyses.get(key)
+            if analysis is not None:
+                self.analyses.move_to_end(key)
+            return analysis
+
+    def put(self, key, analysis):
+        '''
+        :param key: The flight key of the analysis
+        :param analysis: A built Analytics object, shared by the requests: it must not be changed afterwards
+        '''
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.analyses[key] = analysis
+            self.analyses.move_to_end(key)
+            while len(self.analyses) > self.max_entries:
+                self.analyses.popitem(last=False)
+
+    def latest(self, profile_id=None):
+        '''
+        :param profile_id: A Google Analytics view (profile) id, None for the default view
+        :return: The most recently used analysis of the profile, whatever its periods, or None
+        '''
+        with self.lock:
+            for analysis in reversed(list(self.analyses.values())):
+                if analysis.profile_id == profile_id:
+                    return analysis
+        return None
+
+    def values(self):
+        '''
+        :return: A list of the analyses kept, least recently used first
+        '''
+        with self.lock:
+            return list(self.analyses.values())
+
+    def __len__(self):
+        with self.lock:
+            return len(self.analyses)
+
+
+# Analyses of the process, see DashboardView
+recent_analyses = RecentAnalyses()
+
+# Analyses of the process that only ran the stages of one element, by flight key and stage names (see
+# DashboardView.get_element), kept apart so a time frame change never starts from one of them
+element_analyses = RecentAnalyses()
+
+
+def configure(max_entries=8):
+    '''
+    Replaces the process wide sets of recent analyses
+
+    :param max_entries: Maximum number of analyses kept in each set, 0 keeps none
+    '''
+    global recent_analyses, element_analyses
+    recent_analyses = RecentAnalyses(max_entries)
+    element_analyses = RecentAnalyses(max_entries)
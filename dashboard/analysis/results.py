@@ -0,0 +1,117 @@
+'''
+file: results.py
+created: Oct 18, 2026
+
+Immutable result records of the compute stages of an analysis. A stage reduces its reports to the few rows the
+dashboard renders and keeps only those in its record, the merged report frames it worked on are released when it
+returns. Records report the bytes they retain, so the memory held by the analyses of a long lived worker can be
+accounted for per stage.
+'''
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+
+def get_nbytes(value):
+    '''
+    :param value: A field of a record
+    :return: The number of bytes retained by the value, including the strings of object columns
+    '''
+    if value is None:
+        return 0
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(get_nbytes(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class StageResult(object):
+    '''
+    Base class of the records, the fields are the __slots__ of the subclass and can not be set after construction.
+    The data frames of a record are shared by every request rendering it and must be treated as read only.
+    '''
+    __slots__ = ()
+
+    def __init__(self, *args, **kwargs):
+        '''
+        :param args: Values of the fields, in __slots__ order
+        :param kwargs: Values of the fields, by name
+        '''
+        values = dict(zip(self.__slots__, args))
+        values.update(kwargs)
+        missing = [name for name in self.__slots__ if name not in values]
+        if missing or len(values) != len(self.__slots__):
+            raise TypeError('%s takes the fields %s' % (type(self).__name__, ', '.join(self.__slots__)))
+
+        for name in self.__slots__:
+            object.__setattr__(self, name, values[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError('%s is immutable' % type(self).__name__)
+
+    def __delattr__(self, name):
+        raise AttributeError('%s is immutable' % type(self).__name__)
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, ', '.join(self.__slots__))
+
+    def nbytes(self):
+        '''
+        :return: The number of bytes retained by the record and its fields
+        '''
+        return sys.getsizeof(self) + sum(get_nbytes(getattr(self, name)) for name in self.__slots__)
+
+
+class ExecOverview(StageResult):
+    '''
+    Executive overview: the (previous, current) totals and the percentage change of every metric
+    '''
+    __slots__ = ('visitors', 'visits', 'pageviews', 'goals', 'events',
+                 'visitors_perc', 'visits_perc', 'pageviews_perc', 'goals_perc', 'events_perc')
+
+
+class TrafficChanges(StageResult):
+    '''
+    TOP_N TRAFFIC SPIKES/DROPS summary or detail data frames
+    '''
+    __slots__ = ('spikes', 'drops')
+
+
+class BounceRates(StageResult):
+    '''
+    AVERAGE SITE BOUNCE RATE and TOP N HIGHEST/LOWEST BOUNCE RATES summary data frames
+    '''
+    __slots__ = ('mean', 'highest', 'lowest')
+
+
+class BounceRatesDetail(StageResult):
+    '''
+    TOP N HIGHEST/LOWEST BOUNCE RATES detail data frames
+    '''
+    __slots__ = ('highest', 'lowest')
+
+
+class Sources(StageResult):
+    '''
+    TRAFFIC SOURCE summary and detail data frames
+    '''
+    __slots__ = ('summary', 'detail')
+
+
+def result_property(stage, field):
+    '''
+    :param stage: Name of a compute stage (see Analytics.build_schedule)
+    :param field: Name of a field of the record of the stage
+    :return: A read only property with the field of the record of the stage, None until the stage ran
+    '''
+    def get(self):
+        result = self.results.get(stage)
+        return None if result is None else getattr(result, field)
+    return property(get)
@@ -0,0 +1,149 @@
+'''
+file: scheduler.py
+created: Oct 18, 2026
+
+Runs the query and compute stages of the analysis as a dependency graph. Every stage declares the stages it reads
+from, stages whose inputs are ready run concurrently on a bounded thread pool. The output of a stage is released as
+soon as the last stage reading it is done, so the merged reports of a run are not all held until its end.
+'''
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import threading
+import time
+
+
+class Stage(object):
+    '''
+    A named unit of work and the names of the stages whose outputs it takes as arguments
+    '''
+
+    def __init__(self, name, func, inputs=()):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+
+
+class StageScheduler(object):
+    '''
+    Dependency graph of stages executed on a bounded thread pool
+    '''
+
+    def __init__(self, max_workers=4):
+        '''
+        :param max_workers: Maximum number of stages running at the same time
+        '''
+        self.max_workers = max_workers
+        self.stages = OrderedDict()
+
+        # Format: {stage name: {'start': seconds, 'end': seconds, 'seconds': duration, 'thread': thread name}}
+        # start and end are relative to the start of the run
+        self.timings = OrderedDict()
+
+    def add(self, name, func, inputs=()):
+        '''
+        Declares a stage
+
+        :param name: Unique name of the stage
+        :param func: Callable taking the outputs of the input stages as positional arguments, in declared order
+        :param inputs: Names of the stages this stage reads from
+        '''
+        if name in self.stages:
+            raise ValueError('Stage already declared: ' + name)
+        self.stages[name] = Stage(name, func, inputs)
+
+    def resolve(self, targets=None):
+        '''
+        :param targets: Names of the stages to run, None runs every stage
+        :return: The target stages and every stage they depend on, in a valid execution order
+        '''
+        if targets is None:
+            targets = list(self.stages)
+
+        ordered = []
+        visiting = set()
+        done = set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name not in self.stages:
+                raise ValueError('Unknown stage: ' + name)
+            if name in visiting:
+                raise ValueError('Stage dependency cycle at: ' + name)
+
+            visiting.add(name)
+            for input_name in self.stages[name].inputs:
+                visit(input_name)
+            visiting.discard(name)
+
+            done.add(name)
+            ordered.append(name)
+
+        for target in targets:
+            visit(target)
+
+        return ordered
+
+    def run(self, targets=None):
+        '''
+        Runs the target stages and their dependencies, each stage starts as soon as all of its inputs are done.
+        The output of a stage is released once every stage reading it is done.
+
+        :param targets: Names of the stages to run, None runs every stage
+        :return: A dictionary with the output of every target stage, or of every stage no other stage reads from when
+        targets is None
+        '''
+        pending = self.resolve(targets)
+        outputs = {}
+        origin = time.time()
+
+        # Format: {stage name: number of stages of the run reading its output, not done yet}
+        readers = dict.fromkeys(pending, 0)
+        for name in pending:
+            for input_name in self.stages[name].inputs:
+                readers[input_name] += 1
+        kept = set(targets) if targets is not None else set(name for name in pending if not readers[name])
+
+        def execute(stage, args):
+            start = time.time()
+            try:
+                return stage.func(*args)
+            finally:
+                end = time.time()
+                self.timings[stage.name] = {
+                    'start': round(start - origin, 4),
+                    'end': round(end - origin, 4),
+                    'seconds': round(end - start, 4),
+                    'thread': threading.current_thread().name
+                }
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {}
+
+            while pending or running:
+                # submit every stage whose inputs are all available
+                for name in list(pending):
+                    stage = self.stages[name]
+                    if all(input_name in outputs for input_name in stage.inputs):
+                        args = [outputs[input_name] for input_name in stage.inputs]
+                        running[executor.submit(execute, stage, args)] = name
+                        pending.remove(name)
+
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        # let the running stages finish, skip the ones that were not started and fail the run
+                        for other in running:
+                            other.cancel()
+                        raise error
+                    outputs[name] = future.result()
+
+                    for input_name in self.stages[name].inputs:
+                        readers[input_name] -= 1
+                        if not readers[input_name] and input_name not in kept:
+                            del outputs[input_name]
+
+        return outputs
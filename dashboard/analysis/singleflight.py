@@ -0,0 +1,180 @@
+'''
+file: singleflight.py
+created: Oct 18, 2026
+
+Coalesces concurrent computations of the same dashboard data. Threads asking for a key that is already being
+computed wait for the computation in flight and share its result. Processes on the same host take turns through a
+lock file per key, the ones that wait find the reports of the first one in the persistent result cache.
+'''
+
+import hashlib
+import os
+import os.path
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # no lock files (Windows): computations are only coalesced between the threads of one process
+    fcntl = None
+
+
+class Flight(object):
+    '''
+    A computation in flight and the result shared by everyone waiting for it
+    '''
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight(object):
+    '''
+    Runs at most one computation per key at a time, concurrent callers share its result
+    '''
+
+    def __init__(self, lock_dir=None, lock_timeout=300, poll_interval=0.1):
+        '''
+        :param lock_dir: Optional directory of the lock files shared by the processes of the host, None only
+        coalesces the threads of the current process
+        :param lock_timeout: Seconds to wait for another process before computing anyway
+        :param poll_interval: Seconds between two attempts to take a lock file
+        '''
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+
+        self.leaders = 0
+        self.shared = 0
+        self.process_waits = 0
+        self.lock_timeouts = 0
+
+        self._lock = threading.Lock()
+        self._flights = {}
+
+        if self.lock_dir and not os.path.isdir(self.lock_dir):
+            os.makedirs(self.lock_dir)
+
+    def do(self, key, func):
+        '''
+        Runs func, unless a computation of the same key is already in flight in this process
+
+        :param key: A string identifying the computation
+        :param func: Callable without arguments computing the result
+        :return: The result of func, computed by this caller or by the caller it waited for
+        '''
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+                self.leaders += 1
+            else:
+                flight.waiters += 1
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            with self._process_lock(key):
+                flight.result = func()
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+        return flight.result
+
+    def _process_lock(self, key):
+        return ProcessLock(self, key)
+
+    def get_lock_path(self, key):
+        '''
+        :param key: A string identifying the computation
+        :return: The path of the lock file of the key
+        '''
+        return os.path.join(self.lock_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.lock')
+
+    def stats(self):
+        '''
+        :return: A dictionary with the number of computations run, of callers that shared one and of waits on
+        other processes
+        '''
+        with self._lock:
+            return {
+                'leaders': self.leaders,
+                'shared': self.shared,
+                'process_waits': self.process_waits,
+                'lock_timeouts': self.lock_timeouts,
+                'in_flight': len(self._flights)
+            }
+
+
+class ProcessLock(object):
+    '''
+    Exclusive lock file of a key, held while the key is computed. Waiting gives up after the lock timeout, so a stuck
+    process delays the others but never blocks them.
+    '''
+
+    def __init__(self, flight, key):
+        self.flight = flight
+        self.key = key
+        self.handle = None
+
+    def __enter__(self):
+        if not self.flight.lock_dir:
+            return self
+
+        self.handle = open(self.flight.get_lock_path(self.key), 'a')
+        deadline = time.time() + self.flight.lock_timeout
+        waited = False
+
+        while True:
+            try:
+                fcntl.flock(self.handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except (IOError, OSError):
+                if not waited:
+                    waited = True
+                    with self.flight._lock:
+                        self.flight.process_waits += 1
+                if time.time() >= deadline:
+                    with self.flight._lock:
+                        self.flight.lock_timeouts += 1
+                    self.handle.close()
+                    self.handle = None
+                    break
+                time.sleep(self.flight.poll_interval)
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.handle is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+            self.handle.close()
+            self.handle = None
+
+
+# Dashboard computations of the process, keyed by profile and period (see Analytics.get_flight_key)
+analysis_flight = SingleFlight()
+
+
+def configure(**options):
+    '''
+    Replaces the process wide single flight of the dashboard computations
+
+    :param options: Keyword arguments of SingleFlight (lock_dir, lock_timeout, poll_interval)
+    '''
+    global analysis_flight
+    analysis_flight = SingleFlight(**options)
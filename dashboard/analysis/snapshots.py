@@ -0,0 +1,355 @@
+'''
+file: snapshots.py
+created: Oct 18, 2026
+
+Snapshots of the rendered dashboard: the payload of DashboardView.init_elements for a profile and its periods,
+serialized to JSON and stored in a local sqlite file. A refresher builds them outside of the requests (a management
+command run by cron, or a thread of the web process), so loading the dashboard reads one row instead of running the
+queries, the data frame transforms and the element builders. Every refresh adds a new version, the last max_versions
+versions of a profile and periods are kept.
+'''
+
+from contextlib import closing
+import json
+import os.path
+import sqlite3
+import threading
+import time
+
+from dashboard.analysis import recent, singleflight
+from dashboard.analysis.analytics import Analytics
+
+
+# Layout of the stored payload, snapshots of another layout are never served
+SNAPSHOT_FORMAT = 1
+
+
+def get_periods_key(period_current, period_previous):
+    '''
+    Relative dates are kept as they are, a snapshot of the default periods stays the snapshot of the default periods
+    when the day changes (see Snapshot.key for the dates it was built for)
+
+    :param period_current: A period of the analysis, a dictionary with start date (key: START) and end date (key: END)
+    :param period_previous: The previous period
+    :return: The key of the periods of a snapshot
+    '''
+    return '|'.join([period_current['START'], period_current['END'],
+                     period_previous['START'], period_previous['END']])
+
+
+class Snapshot(object):
+    '''
+    A stored dashboard payload
+    '''
+
+    def __init__(self, profile_id, periods, version, key, created, seconds, elements):
+        '''
+        :param profile_id: The Google Analytics view (profile) id, None for the default view
+        :param periods: The key of the periods (see get_periods_key)
+        :param version: Version of the snapshot, increasing for every refresh of the profile and periods
+        :param key: The flight key of the analysis it was built from (see Analytics.get_flight_key)
+        :param created: Time the snapshot was stored, in seconds since the epoch
+        :param seconds: Seconds taken to build the payload
+        :param elements: The payload, a list of dashboard elements (see DashboardView.init_elements)
+        '''
+        self.profile_id = profile_id
+        self.periods = periods
+        self.version = version
+        self.key = key
+        self.created = created
+        self.seconds = seconds
+        self.elements = elements
+
+    def age(self, now=None):
+        '''
+        :param now: The current time in seconds since the epoch, None uses time.time()
+        :return: Seconds since the snapshot was stored
+        '''
+        return (time.time() if now is None else now) - self.created
+
+
+class SnapshotStore(object):
+    '''
+    Versioned sqlite store of the dashboard payloads, by profile and periods
+    '''
+
+    def __init__(self, db_path, max_versions=5, max_age=None, clock=time.time):
+        '''
+        :param db_path: Path of the sqlite file
+        :param max_versions: Number of versions kept per profile and periods, older ones are removed on save
+        :param max_age: Seconds a snapshot is served for (see serve), None serves any age
+        :param clock: Callable returning the current time in seconds
+        '''
+        self.db_path = db_path
+        self.max_versions = max(max_versions, 1)
+        self.max_age = max_age
+        self.clock = clock
+
+        self.loads = 0
+        self.misses = 0
+        self.saves = 0
+
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self):
+        # closed on exit, the inner "with conn" commits
+        return closing(sqlite3.connect(self.db_path, timeout=30))
+
+    def _init_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        with self._connect() as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS snapshots "
+                         "(profile TEXT NOT NULL, periods TEXT NOT NULL, version INTEGER NOT NULL, "
+                         "format INTEGER NOT NULL, key TEXT NOT NULL, created REAL NOT NULL, seconds REAL NOT NULL, "
+                         "payload TEXT NOT NULL, PRIMARY KEY (profile, periods, version))")
+
+    def save(self, profile_id, periods, key, elements, seconds=0.0):
+        '''
+        :param profile_id: The Google Analytics view (profile) id, None for the default view
+        :param periods: The key of the periods (see get_periods_key)
+        :param key: The flight key of the analysis the payload was built from
+        :param elements: The payload, it must be JSON serializable
+        :param seconds: Seconds taken to build the payload
+        :return: The stored Snapshot
+        '''
+        payload = json.dumps(elements, separators=(',', ':'))
+        profile = profile_id or ''
+        created = self.clock()
+
+        with self._lock, self._connect() as conn, conn:
+            row = conn.execute("SELECT MAX(version) FROM snapshots WHERE profile = ? AND periods = ?",
+                               (profile, periods)).fetchone()
+            version = (row[0] or 0) + 1
+            conn.execute("INSERT INTO snapshots (profile, periods, version, format, key, created, seconds, payload) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                         (profile, periods, version, SNAPSHOT_FORMAT, key, created, seconds, payload))
+            conn.execute("DELETE FROM snapshots WHERE profile = ? AND periods = ? AND version <= ?",
+                         (profile, periods, version - self.max_versions))
+            self.saves += 1
+
+        return Snapshot(profile_id, periods, version, key, created, seconds, elements)
+
+    def latest(self, profile_id, periods):
+        '''
+        :param profile_id: The Google Analytics view (profile) id, None for the default view
+        :param periods: The key of the periods (see get_periods_key)
+        :return: The last Snapshot stored for the profile and periods, or None
+        '''
+        with self._connect() as conn, conn:
+            row = conn.execute("SELECT version, key, created, seconds, payload FROM snapshots "
+                               "WHERE profile = ? AND periods = ? AND format = ? ORDER BY version DESC LIMIT 1",
+                               (profile_id or '', periods, SNAPSHOT_FORMAT)).fetchone()
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.loads += 1
+
+        version, key, created, seconds, payload = row
+        return Snapshot(profile_id, periods, version, key, created, seconds, json.loads(payload))
+
+    def serve(self, profile_id, periods, key):
+        '''
+        Relative periods resolve to other dates when the day changes, a snapshot built for the dates of another day
+        is never served
+
+        :param profile_id: The Google Analytics view (profile) id, None for the default view
+        :param periods: The key of the periods (see get_periods_key)
+        :param key: The flight key of the profile and periods today (see Analytics.get_flight_key)
+        :return: The last Snapshot of the profile and periods if it was built for the dates of key and is younger
+        than max_age, or None
+        '''
+        snapshot = self.latest(profile_id, periods)
+        if snapshot is None or snapshot.key != key:
+            return None
+        if self.max_age is not None and snapshot.age(self.clock()) >= self.max_age:
+            return None
+        return snapshot
+
+    def versions(self, profile_id, periods):
+        '''
+        :param profile_id: The Google Analytics view (profile) id, None for the default view
+        :param periods: The key of the periods (see get_periods_key)
+        :return: A list of (version, flight key, created) of the stored snapshots, latest first
+        '''
+        with self._connect() as conn, conn:
+            return [tuple(row) for row in conn.execute(
+                "SELECT version, key, created FROM snapshots WHERE profile = ? AND periods = ? ORDER BY version DESC",
+                (profile_id or '', periods))]
+
+    def stats(self):
+        '''
+        :return: A dictionary with the number of snapshots loaded, missed and saved by this process
+        '''
+        with self._lock:
+            return {'loads': self.loads, 'misses': self.misses, 'saves': self.saves}
+
+
+def build_elements(profile_id, period_current, period_previous):
+    '''
+    Builds the analysis of a profile and periods, then the dashboard elements of the analysis
+
+    :param profile_id: The Google Analytics view (profile) id, None for the default view
+    :param period_current: The current period (see Analytics.period_current)
+    :param period_previous: The previous period
+    :return: A tuple with the flight key of the analysis and the list of dashboard elements
+    '''
+    # imported here: the view module needs the Django settings
+    from dashboard.views import DashboardView
+
+    analysis = Analytics(profile_id=profile_id)
+    analysis.period_current = dict(period_current)
+    analysis.period_previous = dict(period_previous)
+
+    def generate():
+        analysis.generate()
+        return analysis
+
+    key = analysis.get_flight_key()
+    analysis = singleflight.analysis_flight.do(key, generate)
+    # time frame changes of the pages showing the snapshot start from this analysis
+    recent.recent_analyses.put(key, analysis)
+
+    view = DashboardView()
+    view.analysis = analysis
+    return key, view.init_elements()
+
+
+class SnapshotRefresher(object):
+    '''
+    Rebuilds the snapshots of the configured profiles and periods once they are due
+    '''
+
+    def __init__(self, store, profiles=None, periods=None, refresh_interval=60 * 60, build=build_elements,
+                 clock=time.time):
+        '''
+        :param store: The SnapshotStore to refresh
+        :param profiles: The profile ids to refresh, None refreshes the default view only
+        :param periods: A list of (current period, previous period) to refresh, None refreshes the default periods of
+        Analytics
+        :param refresh_interval: Seconds after which a snapshot is due, a snapshot built for other dates (the day
+        changed) is due anyway
+        :param build: Callable taking the profile id, current and previous period and returning the flight key and the
+        payload (see build_elements)
+        :param clock: Callable returning the current time in seconds
+        '''
+        self.store = store
+        self.profiles = list(profiles) if profiles else [None]
+        if periods is None:
+            defaults = Analytics()
+            periods = [(defaults.period_current, defaults.period_previous)]
+        self.periods = [(dict(current), dict(previous)) for current, previous in periods]
+        self.refresh_interval = refresh_interval
+        self.build = build
+        self.clock = clock
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def is_due(self, snapshot, key):
+        '''
+        :param snapshot: The latest Snapshot of a profile and periods, or None
+        :param key: The flight key of the profile and periods today
+        :return: True if the snapshot has to be rebuilt
+        '''
+        return (snapshot is None or snapshot.key != key or
+                snapshot.age(self.clock()) >= self.refresh_interval)
+
+    def refresh(self, force=False):
+        '''
+        Rebuilds the snapshots that are due, one profile and periods at a time. A failing build leaves the previous
+        snapshot in place.
+
+        :param force: Rebuild every snapshot, due or not
+        :return: A list of (profile id, periods key, version or None if it was not due, error or None)
+        '''
+        refreshed = []
+        for profile_id in self.profiles:
+            for period_current, period_previous in self.periods:
+                periods = get_periods_key(period_current, period_previous)
+                key = Analytics(profile_id=profile_id).get_flight_key(period_current, period_previous)
+                if not force and not self.is_due(self.store.latest(profile_id, periods), key):
+                    refreshed.append((profile_id, periods, None, None))
+                    continue
+
+                start = time.time()
+                try:
+                    key, elements = self.build(profile_id, period_current, period_previous)
+                except Exception as error:
+                    refreshed.append((profile_id, periods, None, error))
+                    continue
+                snapshot = self.store.save(profile_id, periods, key, elements, round(time.time() - start, 3))
+                refreshed.append((profile_id, periods, snapshot.version, None))
+        return refreshed
+
+    def run(self, interval=None):
+        '''
+        Refreshes the snapshots until stop is called
+
+        :param interval: Seconds between two refreshes, None checks every tenth of refresh_interval (at least every
+        minute)
+        '''
+        interval = interval or max(min(self.refresh_interval / 10.0, 60.0), 1.0)
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception:
+                # the store is retried on the next round
+                pass
+            self._stop.wait(interval)
+
+    def start(self, interval=None):
+        '''
+        Refreshes the snapshots on a daemon thread of the process
+
+        :param interval: Seconds between two refreshes (see run)
+        '''
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, args=(interval,), name='snapshot-refresher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        '''
+        :param timeout: Seconds to wait for the refresh in progress, None waits until it is done
+        '''
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+# Dashboard snapshots of the process, None builds the dashboard on every request (see DashboardView)
+snapshot_store = None
+snapshot_refresher = None
+
+
+def configure(db_path=None, max_versions=5, refresh_interval=60 * 60, max_age=None, profiles=None, periods=None,
+              background=False):
+    '''
+    Replaces the process wide snapshot store and refresher
+
+    :param db_path: Path of the sqlite file of the snapshots, None disables the snapshots
+    :param max_versions: Number of versions kept per profile and periods
+    :param refresh_interval: Seconds after which the refresher rebuilds a snapshot
+    :param max_age: Seconds a snapshot is served for, None serves any age
+    :param profiles: The profile ids refreshed, None refreshes the default view
+    :param periods: A list of (current period, previous period) refreshed, None refreshes the default periods
+    :param background: Refresh on a daemon thread of the process, otherwise the snapshot management command refreshes
+    '''
+    global snapshot_store, snapshot_refresher
+    if snapshot_refresher is not None:
+        snapshot_refresher.stop(timeout=0)
+
+    snapshot_store = SnapshotStore(db_path, max_versions, max_age) if db_path else None
+    snapshot_refresher = (SnapshotRefresher(snapshot_store, profiles, periods, refresh_interval)
+                          if snapshot_store is not None else None)
+    if background and snapshot_refresher is not None:
+        snapshot_refresher.start()
@@ -1,5 +1,6 @@
 from __future__ import unicode_literals
 from django.apps import AppConfig
+from django.conf import settings
 
 """ @file apps.py
     @author Justin Chambers
@@ -10,3 +11,31 @@ from django.apps import AppConfig
 
 class DashboardConfig(AppConfig):
     name = 'dashboard'
+
+    def ready(self):
+        """ @brief ready
+            @description configures the Google Analytics query layer caches and fact store, the page path
+                        normalization, the traffic source channels, the coalescing of concurrent dashboard
+                        computations, the recent analyses kept for time frame changes, the fan out over the
+                        client profiles and the dashboard snapshots from the project settings
+        """
+        from dashboard.API.query_essentials import query_basic as api
+        from dashboard.analysis import channels, fan_out, normalization, recent, singleflight, snapshots
+
+        api.configure_profile_cache(ttl=getattr(settings, 'GA_PROFILE_CACHE_TTL', None),
+                                    db_path=getattr(settings, 'GA_PROFILE_CACHE_DB', None))
+        api.configure_result_cache(**getattr(settings, 'GA_RESULT_CACHE', {}))
+        api.configure_fact_store(**(getattr(settings, 'GA_FACT_STORE', None) or {}))
+
+        normalization.configure(**getattr(settings, 'DASHBOARD_URL_NORMALIZATION', {}))
+        channels.configure(**getattr(settings, 'DASHBOARD_CHANNEL_GROUPING', {}))
+
+        singleflight.configure(lock_dir=getattr(settings, 'DASHBOARD_FLIGHT_LOCK_DIR', None),
+                               lock_timeout=getattr(settings, 'DASHBOARD_FLIGHT_LOCK_TIMEOUT', 300))
+        recent.configure(max_entries=getattr(settings, 'DASHBOARD_RECENT_ANALYSES', 8))
+        fan_out.configure(**getattr(settings, 'DASHBOARD_FAN_OUT', {}))
+        snapshots.configure(**(getattr(settings, 'DASHBOARD_SNAPSHOTS', None) or {}))
+
+        # offline synthetic Google Analytics data, see fake_service
+        if getattr(settings, 'GA_FAKE_SERVICE', None) is not None:
+            api.use_fake_service(**settings.GA_FAKE_SERVICE)
@@ -0,0 +1,515 @@
+'''
+file: runner.py
+created: Oct 18, 2026
+
+Measures where the time and memory of a dashboard render go, without the network: the Analytics gen_* stages and
+the DashboardView element builders run against the offline FakeService at several report sizes. Every stage reports
+its wall time, the growth of the peak RSS of the process and the memory it allocated (tracemalloc). Results are
+stored as JSON baselines that later runs are compared with.
+'''
+
+from collections import OrderedDict
+import datetime
+import gc
+import json
+import os
+import os.path
+import platform
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # no peak RSS on Windows
+    resource = None
+
+import numpy as np
+import pandas as pd
+
+from dashboard.API.query_essentials import query_basic as api
+from dashboard.API.query_essentials.profile_cache import ProfileCache
+from dashboard.API.query_essentials.result_cache import ResultCache
+from dashboard.analysis.datatable import COLUMN_KEYS, datatable_json
+
+
+# Rows of the largest report (page path, hostname and source) of each benchmark size
+DEFAULT_SIZES = (1000, 100000, 1000000)
+
+# Sources sending traffic to each page of the synthetic site, rows = pages * SOURCES_PER_PATH
+SOURCES_PER_PATH = 5
+
+# Analytics stages, in dashboard order
+ANALYTICS_STAGES = ('gen_exec_overview', 'gen_tts_ttd', 'gen_bouncerate', 'gen_sources')
+
+# DashboardView builders, in dashboard order (see DashboardView.init_elements)
+VIEW_STAGES = ('init_exec_overview', 'init_top_spikes', 'init_top_drops', 'init_bounce_rates', 'init_sources')
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+# Measures compared between two runs, the lower the better
+COMPARED_MEASURES = ('seconds', 'peak_rss_growth_mb', 'alloc_peak_mb')
+
+# Sources of the data frames of each row builder benchmark
+ROW_BUILDER_SIZES = (1000, 10000, 100000)
+
+# Traffic source categories of the row builder benchmark
+ROW_BUILDER_CATEGORIES = ('Direct', 'Organic Search', 'Paid Search', 'Social', 'Referral', 'Other')
+
+# Rows of the tables of each DataTable encoder benchmark
+DATATABLE_SIZES = (10000, 100000, 1000000)
+
+# Columns of the DataTable benchmark: sources, page views with their formatted values and formatted bounce rates
+DATATABLE_COLUMNS = [
+    {'id': 'src', 'label': 'Referral Source', 'type': 'string', 'value': None},
+    {'id': 'views_prev', 'label': 'Previous Page Views', 'type': 'number',
+     'value': 'views_prev', 'formatted': 'views_prev'},
+    {'id': 'views_curr', 'label': 'Current Page Views', 'type': 'number',
+     'value': 'views_curr', 'formatted': 'views_curr'},
+    {'id': 'bounce_rate', 'label': 'Bounce Rate', 'type': 'number', 'value': 'bounce_rate', 'pattern': '%.1f%%'}
+]
+
+
+def get_peak_rss_mb():
+    '''
+    :return: The peak resident set size of the process in MB, None if the platform does not report it
+    '''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+
+def measure(func, repeat=1, trace_allocations=True):
+    '''
+    Runs a stage repeat times for its wall time, then once more under tracemalloc for its allocations
+
+    :param func: Callable without arguments
+    :param repeat: Number of timed runs, the best one is reported
+    :param trace_allocations: False skips the tracemalloc run, which is several times slower than a timed run
+    :return: A dictionary with the measures of the stage, or with its error if it failed
+    '''
+    gc.collect()
+    rss_before = get_peak_rss_mb()
+
+    timings = []
+    try:
+        for _ in range(repeat):
+            start = time.time()
+            func()
+            timings.append(time.time() - start)
+    except Exception as error:
+        return {'error': repr(error)}
+
+    rss_after = get_peak_rss_mb()
+    result = OrderedDict([
+        ('seconds', round(min(timings), 4)),
+        ('seconds_all', [round(seconds, 4) for seconds in timings]),
+        ('peak_rss_mb', None if rss_after is None else round(rss_after, 1)),
+        ('peak_rss_growth_mb', None if rss_after is None else round(rss_after - rss_before, 1))
+    ])
+
+    if trace_allocations:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        result['alloc_peak_mb'] = round(peak / (1024.0 * 1024.0), 2)
+        result['alloc_retained_mb'] = round(current / (1024.0 * 1024.0), 2)
+
+    return result
+
+
+def run_size(rows, repeat=1, trace_allocations=True, stages=None, **site_options):
+    '''
+    Benchmarks every stage on a synthetic site whose largest report has the given number of rows
+
+    :param rows: Rows of the largest report
+    :param repeat: Number of timed runs of each stage
+    :param trace_allocations: False skips the allocation measures
+    :param stages: Optional names of the stages to run (see ANALYTICS_STAGES and VIEW_STAGES)
+    :param site_options: Extra keyword arguments of FakeService
+    :return: A dictionary with the measures of every stage and the bytes retained by the result records of the
+    analysis (see Analytics.memory_report)
+    '''
+    # imported here: the view module needs the Django settings
+    from dashboard.analysis.analytics import Analytics
+    from dashboard.views import DashboardView
+
+    site_options.setdefault('paths', max(rows // SOURCES_PER_PATH, 1))
+    site_options.setdefault('sources_per_path', SOURCES_PER_PATH)
+    site_options.setdefault('sources', max(40, SOURCES_PER_PATH))
+
+    saved = (api.service_pool, api.result_cache, api.profile_cache, api.fact_store)
+    try:
+        # responses are neither cached nor stored, every run decodes the pages the fake service formats, like the
+        # ones of the API
+        start = time.time()
+        service = api.use_fake_service(**site_options)
+        api.result_cache = ResultCache(max_entries=0)
+        api.profile_cache = ProfileCache()
+        api.fact_store = None
+
+        analysis = Analytics()
+        # warm up: the fake service generates its reports once, the measured runs only page through them.
+        # The view builders also need the data frames of every stage. A failing stage is reported by measure.
+        for name in ANALYTICS_STAGES:
+            try:
+                getattr(analysis, name)()
+            except Exception:
+                pass
+        warmup = time.time() - start
+
+        view = DashboardView()
+        view.analysis = analysis
+
+        results = OrderedDict()
+        for name in ANALYTICS_STAGES:
+            if stages is None or name in stages:
+                results[name] = measure(getattr(analysis, name), repeat, trace_allocations)
+        for name in VIEW_STAGES:
+            if stages is None or name in stages:
+                results[name] = measure(getattr(view, name), repeat, trace_allocations)
+
+        return OrderedDict([
+            ('rows', rows),
+            ('paths', site_options['paths']),
+            ('warmup_seconds', round(warmup, 2)),
+            ('api_requests', service.requests),
+            ('stages', results),
+            ('result_bytes', analysis.memory_report())
+        ])
+    finally:
+        api.service_pool, api.result_cache, api.profile_cache, api.fact_store = saved
+
+
+def get_row_builder_analysis(sources):
+    '''
+    :param sources: Number of referral sources of every data frame
+    :return: An analysis holding synthetic result records: one spike, one drop, one high and one low bounce rate page
+    with the given number of sources each, and the given number of sources spread over ROW_BUILDER_CATEGORIES
+    '''
+    # imported here: the analysis modules configure themselves from the Django settings
+    from dashboard.analysis.analytics import Analytics
+    from dashboard.analysis.results import TrafficChanges, BounceRates, BounceRatesDetail, Sources
+
+    random = np.random.RandomState(sources)
+    names = np.array(['source-%d.example.com' % index for index in range(sources)], dtype=object)
+
+    def get_detail(path, columns):
+        index = pd.MultiIndex.from_arrays([np.repeat(path, sources).astype(object), names],
+                                          names=['ga:pagePath', 'ga:source'])
+        return pd.DataFrame(columns, index=index)
+
+    def get_traffic(path, sign):
+        previous = random.randint(0, 1000, sources)
+        current = np.maximum(previous + sign * random.randint(0, 500, sources), 0)
+        summary = pd.DataFrame({'ga:pageviews_prev': [previous.sum()], 'ga:pageviews_curr': [current.sum()],
+                                'Delta': [current.sum() - previous.sum()], 'Delta_%': [sign * 50.0]},
+                               index=pd.Index([path], name='ga:pagePath'))
+        detail = get_detail(path, OrderedDict([('ga:pageviews_prev', previous), ('ga:pageviews_curr', current),
+                                               ('Delta', current - previous)]))
+        return summary, detail
+
+    def get_bounces(path, rate):
+        columns = OrderedDict([('ga:bounces', random.randint(0, 100, sources)),
+                               ('ga:sessions', random.randint(100, 200, sources)),
+                               ('ga:goalCompletionsAll', random.randint(0, 20, sources))])
+        columns['bounceRate'] = np.round(columns['ga:bounces'] / columns['ga:sessions'] * 100, 2)
+        columns['goalConversionRateAll'] = np.round(columns['ga:goalCompletionsAll'] / columns['ga:sessions'] * 100, 2)
+        columns['fromAvrg%'] = np.round((columns['bounceRate'] - 50.0) / 50.0 * 100, 2)
+        summary = pd.DataFrame({'ga:bounces': [90], 'ga:sessions': [100], 'ga:goalCompletionsAll': [5],
+                                'bounceRate': [rate], 'goalConversionRateAll': [5.0],
+                                'fromAvrg%': [(rate - 50.0) / 50.0 * 100]},
+                               index=pd.Index([path], name='ga:pagePath'))
+        return summary, get_detail(path, columns)
+
+    spikes, spikes_src = get_traffic('www.example.com/spike', 1)
+    drops, drops_src = get_traffic('www.example.com/drop', -1)
+    highest, highest_src = get_bounces('www.example.com/high', 90.0)
+    lowest, lowest_src = get_bounces('www.example.com/low', 20.0)
+
+    categories = np.array(ROW_BUILDER_CATEGORIES, dtype=object)[np.arange(sources) % len(ROW_BUILDER_CATEGORIES)]
+    detail = OrderedDict([('ga:sessions_prev', random.randint(0, 1000, sources)),
+                          ('ga:goalCompletionsAll_prev', random.randint(0, 50, sources)),
+                          ('ga:sessions_curr', random.randint(0, 1000, sources)),
+                          ('ga:goalCompletionsAll_curr', random.randint(0, 50, sources))])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        detail['sessionsChangeRate'] = np.round((detail['ga:sessions_curr'] - detail['ga:sessions_prev']) /
+                                                detail['ga:sessions_prev'] * 100, 2)
+        detail['goalCompletionsChangeRate'] = np.round((detail['ga:goalCompletionsAll_curr'] -
+                                                        detail['ga:goalCompletionsAll_prev']) /
+                                                       detail['ga:goalCompletionsAll_prev'] * 100, 2)
+    detail['goalConversionRateAll_curr'] = random.randint(0, 1000, sources) / 100.0
+    detail['goalConversionRateAll_prev'] = random.randint(0, 1000, sources) / 100.0
+    srcs_detail = pd.DataFrame(detail, index=pd.MultiIndex.from_arrays([categories, names],
+                                                                       names=['category', 'ga:source']))
+    srcs_detail = srcs_detail.sort_index(kind='mergesort')
+    srcs_summary = srcs_detail.groupby(level='category', sort=True).sum()
+
+    analysis = Analytics()
+    analysis.results = {
+        'tts_ttd': TrafficChanges(spikes=spikes, drops=drops),
+        'tts_ttd_src': TrafficChanges(spikes=spikes_src, drops=drops_src),
+        'bounce_rates': BounceRates(mean=50.0, highest=highest, lowest=lowest),
+        'bounce_rates_src': BounceRatesDetail(highest=highest_src, lowest=lowest_src),
+        'sources': Sources(summary=srcs_summary, detail=srcs_detail)
+    }
+    return analysis
+
+
+def run_row_builders(sizes=ROW_BUILDER_SIZES, repeat=3):
+    '''
+    Benchmarks the DashboardView builders of the table and chart rows (fill_srcs, build_detail and fill_br) on data
+    frames with the given numbers of sources, without building an analysis. The cost of a row should not grow with
+    the number of rows.
+
+    :param sizes: Number of sources of the data frames, one benchmark per size
+    :param repeat: Number of timed runs of each builder, the best one is reported
+    :return: A dictionary with the seconds and the microseconds per row of every builder, by size
+    '''
+    # imported here: the view module needs the Django settings
+    from dashboard.views import DashboardView
+
+    results = OrderedDict()
+    for sources in sizes:
+        view = DashboardView()
+        view.analysis = get_row_builder_analysis(sources)
+
+        builders = OrderedDict([
+            # the sources table lists every source, the bounce rates list the sources of both pages
+            ('fill_srcs', (view.fill_srcs, sources)),
+            ('build_detail', (lambda: view.build_detail({'type': 'spike', 'path': 'www.example.com/spike'}),
+                              sources)),
+            ('fill_br', (view.fill_br, 2 * sources))
+        ])
+
+        measures = OrderedDict()
+        for name, (func, rows) in builders.items():
+            result = measure(func, repeat, trace_allocations=False)
+            if 'error' not in result:
+                result = OrderedDict([('seconds', result['seconds']), ('rows', rows),
+                                      ('us_per_row', round(result['seconds'] / rows * 1e6, 2))])
+            measures[name] = result
+        results[str(sources)] = measures
+    return results
+
+
+def format_row_builders(results):
+    '''
+    :param results: The output of run_row_builders
+    :return: The measures as a text table, one line per size and builder
+    '''
+    lines = ['%-10s %-20s %10s %10s %12s' % ('sources', 'builder', 'seconds', 'rows', 'us per row')]
+    for size, measures in results.items():
+        for name, result in measures.items():
+            if 'error' in result:
+                lines.append('%-10s %-20s failed: %s' % (size, name, result['error']))
+                continue
+            lines.append('%-10s %-20s %10s %10s %12s' % (size, name, result['seconds'], result['rows'],
+                                                         result['us_per_row']))
+    return '\n'.join(lines)
+
+
+def get_datatable_frame(rows):
+    '''
+    :param rows: Number of rows
+    :return: A data frame with the columns of DATATABLE_COLUMNS, indexed by source
+    '''
+    rng = np.random.RandomState(rows)
+    return pd.DataFrame({
+        'views_prev': rng.randint(0, 100000, rows),
+        'views_curr': rng.randint(0, 100000, rows),
+        'bounce_rate': rng.uniform(0, 100, rows)
+    }, index=pd.Index(['source-%d.example.com' % source for source in range(rows)], name='ga:source'))
+
+
+def dump_datatable(frame, columns):
+    '''
+    Reference encoder: the DataTable built as one dictionary per cell, then json.dumps, as the dashboard charts were
+    encoded before datatable_json
+
+    :param frame: A data frame, one row per row of the DataTable
+    :param columns: A list of column specs (see datatable.datatable_json)
+    :return: The DataTable JSON string
+    '''
+    index = frame.index.tolist()
+    cells = []
+    for column in columns:
+        values = index if column.get('value') is None else frame[column['value']].tolist()
+        if 'formatted' in column:
+            formatted = index if column['formatted'] is None else frame[column['formatted']].tolist()
+        elif 'pattern' in column:
+            formatted = [column['pattern'] % value for value in values]
+        else:
+            formatted = None
+        cells.append((values, formatted))
+
+    return json.dumps({
+        'cols': [OrderedDict((key, column[key]) for key in COLUMN_KEYS if key in column) for column in columns],
+        'rows': [{'c': [{'v': values[row]} if formatted is None else {'v': values[row], 'f': formatted[row]}
+                        for values, formatted in cells]} for row in range(len(frame))]
+    })
+
+
+def run_datatables(sizes=DATATABLE_SIZES, repeat=3):
+    '''
+    Benchmarks datatable_json against the reference encoder (dump_datatable) on tables of the given numbers of rows
+
+    :param sizes: Number of rows of the tables, one benchmark per size
+    :param repeat: Number of timed runs of each encoder, the best one is reported
+    :return: A dictionary with the seconds of both encoders, the speedup and whether both wrote the same JSON, by size
+    '''
+    results = OrderedDict()
+    for rows in sizes:
+        frame = get_datatable_frame(rows)
+        reference = measure(lambda: dump_datatable(frame, DATATABLE_COLUMNS), repeat, trace_allocations=False)
+        encoder = measure(lambda: datatable_json(frame, DATATABLE_COLUMNS), repeat, trace_allocations=False)
+        if 'error' in reference or 'error' in encoder:
+            results[str(rows)] = {'error': reference.get('error') or encoder.get('error')}
+            continue
+
+        results[str(rows)] = OrderedDict([
+            ('json_dumps_seconds', reference['seconds']),
+            ('datatable_json_seconds', encoder['seconds']),
+            ('speedup', round(reference['seconds'] / max(encoder['seconds'], 1e-4), 1)),
+            ('identical', dump_datatable(frame, DATATABLE_COLUMNS) == datatable_json(frame, DATATABLE_COLUMNS))
+        ])
+    return results
+
+
+def format_datatables(results):
+    '''
+    :param results: The output of run_datatables
+    :return: The measures as a text table, one line per size
+    '''
+    lines = ['%-10s %12s %16s %8s %10s' % ('rows', 'json.dumps', 'datatable_json', 'speedup', 'identical')]
+    for size, result in results.items():
+        if 'error' in result:
+            lines.append('%-10s failed: %s' % (size, result['error']))
+            continue
+        lines.append('%-10s %12s %16s %8s %10s' % (size, result['json_dumps_seconds'],
+                                                    result['datatable_json_seconds'], result['speedup'],
+                                                    result['identical']))
+    return '\n'.join(lines)
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, repeat=1, trace_allocations=True, stages=None, **site_options):
+    '''
+    :param sizes: Rows of the largest report, one benchmark per size
+    :param repeat: Number of timed runs of each stage
+    :param trace_allocations: False skips the allocation measures
+    :param stages: Optional names of the stages to run
+    :param site_options: Extra keyword arguments of FakeService
+    :return: A dictionary with the environment and the measures of every size
+    '''
+    return OrderedDict([
+        ('created', datetime.datetime.now().isoformat()),
+        ('environment', OrderedDict([
+            ('python', platform.python_version()),
+            ('numpy', np.__version__),
+            ('pandas', pd.__version__),
+            ('machine', platform.machine()),
+            ('repeat', repeat)
+        ])),
+        ('sizes', OrderedDict((str(rows), run_size(rows, repeat, trace_allocations, stages, **site_options))
+                              for rows in sizes))
+    ])
+
+
+def get_baseline_path(name, directory=BASELINE_DIR):
+    '''
+    :param name: Name of the baseline
+    :param directory: Directory of the baselines
+    :return: The path of the JSON file of the baseline
+    '''
+    return os.path.join(directory, name + '.json')
+
+
+def save_baseline(results, name, directory=BASELINE_DIR):
+    '''
+    :param results: The output of run_benchmark
+    :param name: Name of the baseline
+    :param directory: Directory of the baselines
+    :return: The path of the JSON file written
+    '''
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    path = get_baseline_path(name, directory)
+    with open(path, 'w') as baseline:
+        json.dump(results, baseline, indent=2)
+    return path
+
+
+def load_baseline(name, directory=BASELINE_DIR):
+    '''
+    :param name: Name of the baseline, or path of its JSON file
+    :param directory: Directory of the baselines
+    :return: The stored output of run_benchmark
+    '''
+    path = name if os.path.isfile(name) else get_baseline_path(name, directory)
+    with open(path) as baseline:
+        return json.load(baseline, object_pairs_hook=OrderedDict)
+
+
+def compare(results, baseline):
+    '''
+    :param results: The output of run_benchmark
+    :param baseline: A stored output of run_benchmark
+    :return: A list of (size, stage, measure, baseline value, current value, change in %) for the stages and sizes
+    found in both
+    '''
+    rows = []
+    for size, current in results['sizes'].items():
+        previous = baseline['sizes'].get(size)
+        if previous is None:
+            continue
+        for stage, measures in current['stages'].items():
+            before = previous['stages'].get(stage, {})
+            for name in COMPARED_MEASURES:
+                if measures.get(name) is None or before.get(name) is None:
+                    continue
+                change = None
+                if before[name]:
+                    change = round((measures[name] - before[name]) / float(before[name]) * 100, 1)
+                rows.append((size, stage, name, before[name], measures[name], change))
+    return rows
+
+
+def format_results(results):
+    '''
+    :param results: The output of run_benchmark
+    :return: The measures as a text table, one line per size and stage
+    '''
+    lines = ['%-10s %-20s %10s %14s %14s %14s' % ('rows', 'stage', 'seconds', 'rss growth MB', 'alloc peak MB',
+                                                  'retained MB')]
+    for size, result in results['sizes'].items():
+        for stage, measures in result['stages'].items():
+            if 'error' in measures:
+                lines.append('%-10s %-20s failed: %s' % (size, stage, measures['error']))
+                continue
+            lines.append('%-10s %-20s %10s %14s %14s %14s' % (size, stage, measures['seconds'],
+                                                              measures['peak_rss_growth_mb'],
+                                                              measures.get('alloc_peak_mb', '-'),
+                                                              measures.get('alloc_retained_mb', '-')))
+        if result.get('result_bytes'):
+            lines.append('%-10s %-20s %s' % (size, 'result bytes', ', '.join('%s %d' % item
+                                                                            for item in result['result_bytes'].items())))
+    return '\n'.join(lines)
+
+
+def format_comparison(rows):
+    '''
+    :param rows: The output of compare
+    :return: The comparison as a text table
+    '''
+    lines = ['%-10s %-20s %-20s %12s %12s %9s' % ('rows', 'stage', 'measure', 'baseline', 'current', 'change')]
+    for size, stage, name, before, after, change in rows:
+        lines.append('%-10s %-20s %-20s %12s %12s %9s' % (size, stage, name, before, after,
+                                                          '-' if change is None else '%+.1f%%' % change))
+    return '\n'.join(lines)
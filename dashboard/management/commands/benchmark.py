@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.benchmarks import runner
+
+""" @file benchmark.py
+    @date 20261018
+    @description This file contains the benchmark management command:
+                 python manage.py benchmark [--sizes 1000 100000] [--save NAME] [--compare NAME]
+                 python manage.py benchmark --row-builders 1000 10000 100000
+                 python manage.py benchmark --datatables 10000 100000 1000000
+"""
+
+
+class Command(BaseCommand):
+    """ @brief Command
+        @description Benchmarks the Analytics stages and the dashboard element builders on synthetic data
+    """
+    help = 'Measures wall time, peak RSS and allocations of the Analytics gen_* stages and of the dashboard ' \
+           'element builders on synthetic Google Analytics data of several sizes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=list(runner.DEFAULT_SIZES),
+                            help='Rows of the largest report, one benchmark per size')
+        parser.add_argument('--repeat', type=int, default=1,
+                            help='Number of timed runs of each stage, the best one is reported')
+        parser.add_argument('--stages', nargs='+', default=None,
+                            choices=runner.ANALYTICS_STAGES + runner.VIEW_STAGES,
+                            help='Stages to run, all of them by default')
+        parser.add_argument('--no-allocations', action='store_true',
+                            help='Skip the tracemalloc run of each stage')
+        parser.add_argument('--save', metavar='NAME',
+                            help='Store the results as the JSON baseline NAME')
+        parser.add_argument('--compare', metavar='NAME',
+                            help='Compare the results with the JSON baseline NAME (or the path of a baseline file)')
+        parser.add_argument('--row-builders', nargs='+', type=int, metavar='SOURCES',
+                            help='Only measure the cost per row of the table and chart row builders, on data frames '
+                                 'with these numbers of sources')
+        parser.add_argument('--datatables', nargs='+', type=int, metavar='ROWS',
+                            help='Only compare the DataTable JSON encoder with json.dumps, on tables with these '
+                                 'numbers of rows')
+
+    def handle(self, *args, **options):
+        """ @brief handle
+            @description runs the benchmark, prints the measures and stores or compares the baseline
+        """
+        if options['row_builders']:
+            results = runner.run_row_builders(sizes=options['row_builders'], repeat=options['repeat'])
+            self.stdout.write(runner.format_row_builders(results))
+            return
+
+        if options['datatables']:
+            results = runner.run_datatables(sizes=options['datatables'], repeat=options['repeat'])
+            self.stdout.write(runner.format_datatables(results))
+            return
+
+        results = runner.run_benchmark(sizes=options['sizes'],
+                                       repeat=options['repeat'],
+                                       trace_allocations=not options['no_allocations'],
+                                       stages=options['stages'])
+        self.stdout.write(runner.format_results(results))
+
+        if options['save']:
+            path = runner.save_baseline(results, options['save'])
+            self.stdout.write('Baseline stored in ' + path)
+
+        if options['compare']:
+            baseline = runner.load_baseline(options['compare'])
+            self.stdout.write(runner.format_comparison(runner.compare(results, baseline)))
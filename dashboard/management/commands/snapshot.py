@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.analysis import snapshots
+
+""" @file snapshot.py
+    @date 20261018
+    @description This file contains the snapshot management command:
+                 python manage.py snapshot [--force] [--loop [--interval SECONDS]] [--list]
+"""
+
+
+class Command(BaseCommand):
+    """ @brief Command
+        @description Refreshes the stored dashboard snapshots of the profiles and periods of DASHBOARD_SNAPSHOTS
+    """
+    help = 'Builds the dashboard snapshots that are due (older than refresh_interval, or built for other dates) ' \
+           'and stores them, so the dashboard page loads them instead of building the dashboard.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Rebuild every snapshot, due or not')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep refreshing until interrupted')
+        parser.add_argument('--interval', type=float, default=60.0,
+                            help='Seconds between two refreshes with --loop')
+        parser.add_argument('--list', action='store_true',
+                            help='List the stored versions instead of refreshing')
+
+    def handle(self, *args, **options):
+        """ @brief handle
+            @description refreshes the snapshots once, or every interval seconds with --loop, and prints the
+                        version stored for every profile and periods
+        """
+        refresher = snapshots.snapshot_refresher
+        if refresher is None:
+            raise CommandError('Snapshots are disabled, set DASHBOARD_SNAPSHOTS["db_path"] in the settings')
+
+        if options['list']:
+            for profile_id in refresher.profiles:
+                for period_current, period_previous in refresher.periods:
+                    periods = snapshots.get_periods_key(period_current, period_previous)
+                    for version, key, created in refresher.store.versions(profile_id, periods):
+                        self.stdout.write('%-12s %-40s v%-4d %s  %s' % (
+                            profile_id or 'default', periods, version, key,
+                            time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(created))))
+            return
+
+        # this process refreshes in the foreground
+        refresher.stop()
+
+        while True:
+            for profile_id, periods, version, error in refresher.refresh(force=options['force']):
+                if error is not None:
+                    status = 'failed: %r' % error
+                else:
+                    status = 'stored v%d' % version if version is not None else 'up to date'
+                self.stdout.write('%-12s %-40s %s' % (profile_id or 'default', periods, status))
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
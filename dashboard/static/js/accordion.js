@@ -12,9 +12,10 @@ $('.accordion').on('click', '.accordion-control', function (e) {
 
 /**
  * @brief onClickAccordionControlSummary
- * @description function handles the show/hide animation for the accordion elements (unique to the dashboard)
+ * @description function handles the show/hide animation for the accordion elements (unique to the dashboard),
+ * delegated to the document so the elements loaded after the page (see loader.js) are handled too
  */
-$('.accordion-summary').on('click', '.accordion-control-summary', function (e) {
+$(document).on('click', '.accordion-summary .accordion-control-summary', function (e) {
     e.preventDefault();
     $(this)
         .next('.accordion-panel-detail')
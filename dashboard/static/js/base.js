@@ -9,9 +9,10 @@ $(document).ready(function() {
 
 /**
  * @brief onClickActionDetail
- * @description function controls the action (recommendation) dialog show/hide
+ * @description function controls the action (recommendation) dialog show/hide, delegated to the document so
+ * the elements loaded after the page (see loader.js) are handled too
  */
-$('.action-detail').on('click', function() {
+$(document).on('click', '.action-detail', function() {
     $(this)
         .parent()
         .parent()
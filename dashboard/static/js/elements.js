@@ -100,4 +100,42 @@ function drawColumnChartConditional(chart_context) {
     var chart = new google.visualization.ColumnChart(
         document.getElementById(chart_context['tag']));
     chart.draw(data, options);
-}
\ No newline at end of file
+}
+/**
+ * @brief drawElementCharts
+ * @description function draws the charts of a dashboard element received as JSON (see loader.js), the same way the
+ * dashboard page draws the charts of the elements it renders
+ * @param element: the element content, as built by the init_ functions of DashboardView
+ * @param chart_width: the width of the charts
+ */
+function drawElementCharts(element, chart_width) {
+    var container = element['container'];
+    if (container['chart_type'] === 'column-summary') {
+        drawColumnChartConditional({
+            'data': JSON.parse(container['chart_data']),
+            'tag': container['chart_tag'],
+            'title': container['chart_title'],
+            'x-axis': container['chart_x_lbl'],
+            'y-axis': container['chart_y_lbl'],
+            'y-ticks': container['chart_y_ticks'],
+            'width': chart_width,
+            'height': 600
+        });
+    }
+    if ($.isArray(container)) {
+        $.each(container, function (i, item) {
+            if (item['chart_type'] === 'column-detail') {
+                drawColumnChart({
+                    'data': JSON.parse(item['chart_data']),
+                    'tag': item['chart_tag'],
+                    'title': item['chart_title'],
+                    'x-axis': item['chart_x_lbl'],
+                    'y-axis': item['chart_y_lbl'],
+                    'colors': item['chart_colors'],
+                    'width': chart_width,
+                    'height': 600
+                });
+            }
+        });
+    }
+}
@@ -0,0 +1,59 @@
+/**
+ * @brief showElement
+ * @description function swaps the placeholder of an element for the element, then draws its charts once the charts
+ * library is loaded
+ * @param placeholder: the placeholder of the element
+ * @param html: the HTML of the element
+ * @param element: the element content, as built by the init_ functions of DashboardView
+ */
+function showElement(placeholder, html, element) {
+    var block = $($.parseHTML($.trim(html)));
+    placeholder.next('.dashboard-element-spacer').remove();
+    placeholder.replaceWith(block);
+    block.find('.show-hide').text("Show Details");
+    block.find('.show-hide-srcs').text("Show Referral Sources");
+    google.charts.setOnLoadCallback(function () {
+        drawElementCharts(element, $('.app-container').width());
+    });
+}
+
+/**
+ * @brief failElement
+ * @description function replaces the loading message of the placeholder of an element that could not be built
+ * @param name: the name of the element
+ */
+function failElement(name) {
+    $('#placeholder-' + name).find('.dashboard-element-large').text('This element could not be loaded.');
+}
+
+/**
+ * @brief loadElements
+ * @description function fetches every element placeholder of the page shell at once from its JSON endpoint and
+ * swaps each placeholder for its element as soon as that element arrives, so the slowest element no longer delays
+ * the others
+ */
+function loadElements() {
+    $('.dashboard-element-placeholder').each(function () {
+        var placeholder = $(this);
+        $.getJSON(placeholder.data('url'))
+            .done(function (response) {
+                showElement(placeholder, response['html'], response['element']);
+            })
+            .fail(function () {
+                placeholder.find('.dashboard-element-large').text('This element could not be loaded.');
+            });
+    });
+}
+
+/**
+ * @brief streamElement
+ * @description function swaps the placeholder of an element for the hidden fragment the streamed page just
+ * flushed (see DashboardView.stream_page)
+ * @param name: the name of the element
+ * @param element: the element content
+ */
+function streamElement(name, element) {
+    var fragment = $('#fragment-' + name);
+    showElement($('#placeholder-' + name), fragment.html(), element);
+    fragment.remove();
+}
@@ -1,6 +1,41 @@
-from django.test import TestCase
+from contextlib import closing
+import datetime
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import weakref
+from unittest import mock
+import numpy as np
+import pandas as pd
+from django.test import RequestFactory, SimpleTestCase, TestCase
 from django.core.urlresolvers import resolve
+from dashboard import views
 from dashboard.views import DashboardView
+from dashboard.API.query_essentials import query_basic
+from dashboard.API.query_essentials.columnar import ColumnAccumulator, decode_response, parse_numbers
+from dashboard.API.query_essentials.fact_store import FactStore
+from dashboard.API.query_essentials.profile_cache import ProfileCache
+from dashboard.API.query_essentials.query_planner import QueryPlanner
+from dashboard.API.query_essentials.result_cache import ResultCache, make_key, normalize_context
+from dashboard.analysis.analytics import Analytics
+from dashboard.analysis.channels import ChannelGrouping
+from dashboard.analysis.comparison import compare_periods, compare_totals, percent_change
+from dashboard.analysis.datatable import datatable_json
+from dashboard.analysis.frames import combine_periods, concat_dimensions, replace_values, select_top
+from dashboard.analysis.normalization import UrlNormalizer
+from dashboard.analysis.path_dictionary import PathDictionary
+from dashboard.analysis import recent, snapshots
+from dashboard.analysis.fan_out import ProfileFanOut, roll_up
+from dashboard.analysis.recent import RecentAnalyses
+from dashboard.analysis.scheduler import StageScheduler
+from dashboard.analysis.singleflight import SingleFlight
+from dashboard.analysis.snapshots import SnapshotRefresher, SnapshotStore
+from dashboard.benchmarks import runner
 
 """ @file views.py
     @author Joseph Ravenna
@@ -20,3 +55,1107 @@ class DashboardTest(TestCase):
     def test_root_url_resolves_to_home_page_view(self):
         found = resolve('/dashboard/')
         self.assertEqual(found.func, DashboardView)
+
+
+class StubCredentials(object):
+
+    def __init__(self):
+        self.access_token = None
+        self.access_token_expired = False
+        self.refresh_count = 0
+
+    def refresh(self, http):
+        self.access_token = 'token'
+        self.refresh_count += 1
+
+    def authorize(self, http):
+        return http
+
+
+class IsolatedGlobalsMixin(object):
+    '''
+    Gives every test fresh query caches, recent analyses and no fact or snapshot store, and restores every module
+    global of the query layer and of the analysis afterwards, whatever the test swapped
+    '''
+
+    def setUp(self):
+        super(IsolatedGlobalsMixin, self).setUp()
+        for target, values in ((query_basic, {'service_pool': query_basic.service_pool, 'result_cache': ResultCache(),
+                                              'profile_cache': ProfileCache(), 'fact_store': None}),
+                               (recent, {'recent_analyses': RecentAnalyses(), 'element_analyses': RecentAnalyses()}),
+                               (snapshots, {'snapshot_store': None})):
+            patcher = mock.patch.multiple(target, **values)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class ServicePoolTest(SimpleTestCase):
+
+    def setUp(self):
+        self.builds = []
+
+        def builder(*key):
+            self.builds.append(key)
+            return object(), StubCredentials()
+
+        self.pool = query_basic.ServicePool(builder=builder)
+        self.args = ('analytics', 'v3', 'scope', '/tmp/key.p12', 'svc@example.com')
+
+    def test_service_is_built_once_per_key(self):
+        first = self.pool.get_service(*self.args)
+        second = self.pool.get_service(*self.args)
+        self.assertIs(first, second)
+        self.assertEqual(len(self.builds), 1)
+        self.assertEqual(self.pool.stats()['hits'], 1)
+        self.assertEqual(self.pool.stats()['misses'], 1)
+
+    def test_concurrent_first_use_builds_once(self):
+        threads = [threading.Thread(target=self.pool.get_service, args=self.args) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.builds), 1)
+        self.assertEqual(self.pool.stats()['misses'], 1)
+
+    def test_token_refreshed_only_when_expired(self):
+        key = query_basic.ServicePool.make_key(*self.args)
+        self.pool.get_http(key)
+        self.pool.get_http(key)
+        credentials = self.pool.get_entry(key).credentials
+        self.assertEqual(credentials.refresh_count, 1)
+
+        credentials.access_token_expired = True
+        self.pool.get_http(key)
+        self.assertEqual(credentials.refresh_count, 2)
+
+
+class ProfileCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, 'profiles.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def clock(self):
+        return self.now
+
+    def test_entries_expire_after_ttl(self):
+        cache = ProfileCache(ttl=60, clock=self.clock)
+        cache.set('svc|key', '12345')
+        self.assertEqual(cache.get('svc|key'), '12345')
+
+        self.now += 61
+        self.assertIsNone(cache.get('svc|key'))
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_sqlite_tier_survives_a_new_cache(self):
+        ProfileCache(ttl=60, db_path=self.db_path, clock=self.clock).set('svc|key', '12345')
+
+        cache = ProfileCache(ttl=60, db_path=self.db_path, clock=self.clock)
+        self.assertEqual(cache.get('svc|key'), '12345')
+
+    def test_resolve_profile_id_uses_management_api_once(self):
+        calls = []
+
+        class Request(object):
+            def __init__(self, name, result):
+                self.name = name
+                self.result = result
+
+            def execute(self, http=None):
+                calls.append(self.name)
+                return self.result
+
+        class Management(object):
+            def accounts(self):
+                return self
+
+            def webproperties(self):
+                return self
+
+            def profiles(self):
+                return self
+
+            def list(self, **kwargs):
+                if 'webPropertyId' in kwargs:
+                    return Request('profiles', {'totalResults': 1, 'items': [{'id': '777'}]})
+                if 'accountId' in kwargs:
+                    return Request('properties', {'totalResults': 1, 'items': [{'id': 'UA-1-1'}]})
+                return Request('accounts', {'totalResults': 1, 'items': [{'id': '1'}]})
+
+        class Service(object):
+            def management(self):
+                return Management()
+
+        cache = query_basic.profile_cache
+        query_basic.profile_cache = ProfileCache(ttl=60)
+        try:
+            context = {'svc_account_email': 'svc@example.com', 'key_file_location': '/tmp/key.p12'}
+            self.assertEqual(query_basic.resolve_profile_id(context, Service()), '777')
+            self.assertEqual(query_basic.resolve_profile_id(context, Service()), '777')
+            self.assertEqual(calls, ['accounts', 'properties', 'profiles'])
+        finally:
+            query_basic.profile_cache = cache
+
+
+class PagedReportService(object):
+    """
+    Minimal stand-in for the Core Reporting API that serves a fixed report one page at a time
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.requests = []
+        self.batches = 0
+
+    def data(self):
+        return self
+
+    def ga(self):
+        return self
+
+    def get(self, **kwargs):
+        return PagedReportRequest(self, kwargs)
+
+    def new_batch_http_request(self, callback=None):
+        return ReportBatch(self, callback)
+
+
+class PagedReportRequest(object):
+
+    def __init__(self, service, kwargs):
+        self.service = service
+        self.kwargs = kwargs
+
+    def execute(self, http=None):
+        self.service.requests.append(self.kwargs)
+        start = (self.kwargs.get('start_index') or 1) - 1
+        stop = start + (self.kwargs.get('max_results') or 1000)
+        page = {
+            'columnHeaders': [{'name': 'ga:pagePath', 'columnType': 'DIMENSION', 'dataType': 'STRING'},
+                              {'name': 'ga:pageviews', 'columnType': 'METRIC', 'dataType': 'INTEGER'}],
+            'totalResults': len(self.service.rows)
+        }
+        if self.service.rows[start:stop]:
+            page['rows'] = self.service.rows[start:stop]
+        return page
+
+
+class ReportBatch(object):
+
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self.requests.append((request_id, request))
+
+    def execute(self, http=None):
+        self.service.batches += 1
+        for request_id, request in self.requests:
+            self.callback(request_id, request.execute(http), None)
+
+
+class PagedFetchTest(IsolatedGlobalsMixin, SimpleTestCase):
+
+    def setUp(self):
+        super(PagedFetchTest, self).setUp()
+        self.rows = [['/page-' + str(index), str(index * 10)] for index in range(5)]
+        self.service = PagedReportService(self.rows)
+        query_basic.service_pool = query_basic.ServicePool(builder=lambda *key: (self.service, None))
+        self.context = {'profile_id': '1', 'st_date': '7daysAgo', 'end_date': 'yesterday',
+                        'api_metric': 'ga:pageviews', 'api_dimension': 'ga:pagePath'}
+
+    def test_pages_are_requested_until_total_results(self):
+        frame = query_basic.get_frame(self.context, page_size=2)
+        self.assertEqual([request['start_index'] for request in self.service.requests], [1, 3, 5])
+        self.assertEqual(frame['ga:pagePath'].tolist(), [row[0] for row in self.rows])
+        self.assertEqual(frame['ga:pageviews'].tolist(), [0, 10, 20, 30, 40])
+        self.assertEqual(frame['ga:pageviews'].dtype.kind, 'i')
+
+    def test_accumulator_grows_past_total_results(self):
+        accumulator = ColumnAccumulator([{'name': 'ga:bounceRate', 'dataType': 'PERCENT'}], total_rows=1)
+        accumulator.append([['12.5']])
+        accumulator.append([['50.0'], ['75.25']])
+        self.assertEqual(accumulator.to_frame()['ga:bounceRate'].tolist(), [12.5, 50.0, 75.25])
+
+    def test_first_pages_are_batched(self):
+        contexts = [dict(self.context, st_date='31daysAgo'), dict(self.context, st_date='61daysAgo')]
+        frames = query_basic.get_frames(contexts, page_size=2)
+        self.assertEqual(self.service.batches, 1)
+        self.assertEqual(len(self.service.requests), 6)
+        self.assertEqual([len(frame) for frame in frames], [5, 5])
+
+    def test_cached_pages_are_not_requested_again(self):
+        query_basic.get_frames([self.context], page_size=2)
+        frames = query_basic.get_frames([self.context, dict(self.context, st_date='31daysAgo')], page_size=2)
+        # only the three pages of the new period are requested again
+        self.assertEqual(self.service.batches, 2)
+        self.assertEqual(len(self.service.requests), 6)
+        self.assertEqual([len(frame) for frame in frames], [5, 5])
+
+
+class TypedFramesTest(SimpleTestCase):
+
+    def setUp(self):
+        self.response = {
+            'columnHeaders': [{'name': 'ga:hostname', 'columnType': 'DIMENSION', 'dataType': 'STRING'},
+                              {'name': 'ga:pagePath', 'columnType': 'DIMENSION', 'dataType': 'STRING'},
+                              {'name': 'ga:pageviews', 'columnType': 'METRIC', 'dataType': 'INTEGER'},
+                              {'name': 'ga:bounceRate', 'columnType': 'METRIC', 'dataType': 'PERCENT'}],
+            'rows': [['b.com', '/x?inf_contact_key=1', '3', '50.0'], ['a.com', '/y', '2', '12.5'],
+                     ['b.com', '/x', '1', '0.0']]
+        }
+
+    def test_columns_are_typed_from_the_headers(self):
+        frame = decode_response(self.response)
+        self.assertEqual(str(frame['ga:pagePath'].dtype), 'category')
+        self.assertEqual(frame['ga:pageviews'].dtype.name, 'int32')
+        self.assertEqual(frame['ga:bounceRate'].dtype.name, 'float64')
+        self.assertEqual(frame.sort_values('ga:hostname')['ga:hostname'].tolist(), ['a.com', 'b.com', 'b.com'])
+
+        frame['ga:pagePath'] = replace_values(concat_dimensions(frame['ga:hostname'], frame['ga:pagePath']),
+                                              r'\?inf_contact_key.*', '')
+        self.assertEqual(frame['ga:pagePath'].tolist(), ['b.com/x', 'a.com/y', 'b.com/x'])
+
+    def test_malformed_numbers_are_rejected(self):
+        self.assertEqual(parse_numbers(['3', '12'], np.int64).tolist(), [3, 12])
+        self.assertEqual(parse_numbers(['1.5', '2'], np.float64).tolist(), [1.5, 2.0])
+        for values, dtype in ((['1', 'x'], np.int64), (['1', ''], np.float64), (['1.5', '2'], np.int64)):
+            with self.assertRaises(ValueError):
+                parse_numbers(values, dtype)
+
+    def test_periods_are_combined_without_missing_values(self):
+        previous = pd.DataFrame({'ga:pagePath': pd.Categorical(['/b', '/a']), 'ga:pageviews': [4, 1]})
+        current = pd.DataFrame({'ga:pagePath': pd.Categorical(['/c', '/b', '/b']), 'ga:pageviews': [7, 2, 3]})
+        combined = combine_periods(previous, current, ['ga:pagePath'], ['ga:pageviews'], sort=True)
+        self.assertEqual(combined['ga:pagePath'].tolist(), ['/a', '/b', '/c'])
+        self.assertEqual(combined['ga:pageviews_prev'].tolist(), [1, 4, 0])
+        self.assertEqual(combined['ga:pageviews_curr'].tolist(), [0, 5, 7])
+        self.assertEqual(combined['ga:pageviews_curr'].dtype.kind, 'i')
+
+
+class UrlNormalizerTest(SimpleTestCase):
+
+    def test_rules(self):
+        normalizer = UrlNormalizer(collapse_numeric_ids=True)
+        self.assertEqual(normalizer.apply(['Shop.COM/Cart/?utm_source=x&id=3&fbclid=abc',
+                                           'shop.com/orders/1234/items/?utm_medium=cpc',
+                                           'shop.com/x&inf_contact_key=9',
+                                           'shop.com/?fbclidx=1',
+                                           'shop.com/v2/']),
+                         ['shop.com/Cart?id=3', 'shop.com/orders/:id/items', 'shop.com/x', 'shop.com/?fbclidx=1',
+                          'shop.com/v2'])
+
+        normalizer = UrlNormalizer(strip_params=(), lowercase_host=False, trim_trailing_slash=False)
+        self.assertEqual(normalizer.apply(['A.com/x/?utm_source=y']), ['A.com/x/?utm_source=y'])
+
+    def test_distinct_paths_are_normalized_once(self):
+        normalizer = UrlNormalizer(max_entries=3)
+        self.assertEqual(normalizer.normalize(['a.com/x/', 'a.com/x?utm_source=y']), ['a.com/x', 'a.com/x'])
+        self.assertEqual(normalizer.normalize(['a.com/x/', 'a.com/y']), ['a.com/x', 'a.com/y'])
+        self.assertEqual(normalizer.stats(), {'entries': 3, 'hits': 1, 'misses': 3})
+
+        # the memo is emptied when it would exceed max_entries
+        normalizer.normalize(['a.com/z'])
+        self.assertEqual(normalizer.stats()['entries'], 1)
+
+
+class PathDictionaryTest(SimpleTestCase):
+
+    def test_normalized_paths_share_one_code(self):
+        paths = PathDictionary()
+        previous = paths.encode(pd.Series(['a.com', 'b.com', 'a.com']),
+                                pd.Series(['/x?inf_contact_key=1', '/x', '/x']))
+        current = paths.encode(pd.Series(['b.com', 'a.com']), pd.Series(['/y', '/x&inf_contact_key=2']))
+
+        self.assertEqual(previous.dtype.name, 'int32')
+        self.assertEqual(previous[0], previous[2])
+        self.assertEqual(current[1], previous[0])
+        self.assertEqual(len(paths), 3)
+        self.assertEqual(paths.decode(current).tolist(), ['b.com/y', 'a.com/x'])
+
+        frame = pd.DataFrame({'ga:pagePath': previous, 'ga:pageviews': [1, 2, 3]}).set_index('ga:pagePath')
+        self.assertEqual(paths.decode_index(frame).index.tolist(), ['a.com/x', 'b.com/x', 'a.com/x'])
+
+
+class SelectTopTest(SimpleTestCase):
+
+    def test_ties_are_ordered_by_label(self):
+        frame = pd.DataFrame({'path': [3, 1, 0, 2, 4], 'delta': [5, 9, 5, 5, -1]})
+        labels = {0: '/c', 1: '/z', 2: '/a', 3: '/b', 4: '/d'}
+        decode = lambda codes: np.array([labels[code] for code in codes], dtype=object)
+
+        top = select_top(frame, 3, 'delta', tie_column='path', tie_key=decode)
+        self.assertEqual(top['path'].tolist(), [1, 2, 3])
+        self.assertEqual(select_top(frame, 2, 'delta', ascending=True)['path'].tolist(), [4, 3])
+        self.assertEqual(len(select_top(frame, 10, 'delta')), 5)
+        self.assertTrue(select_top(frame.iloc[:0], 3, 'delta').empty)
+
+
+class ComparisonTest(SimpleTestCase):
+
+    def test_periods_are_compared_with_the_baseline(self):
+        weeks = [pd.DataFrame({'ga:pagePath': ['/a', '/b'], 'ga:pageviews': [10, 4]}),
+                 pd.DataFrame({'ga:pagePath': ['/a', '/c'], 'ga:pageviews': [15, 3]}),
+                 pd.DataFrame({'ga:pagePath': ['/b'], 'ga:pageviews': [2]})]
+
+        compared = compare_periods(weeks, ['ga:pagePath'], ['ga:pageviews'], suffixes=('_w0', '_w1', '_w2'), sort=True)
+        self.assertEqual(compared.columns.tolist()[:4], ['ga:pagePath', 'ga:pageviews_w0', 'ga:pageviews_w1',
+                                                         'ga:pageviews_w2'])
+        self.assertEqual(compared['ga:pageviews_delta_w1'].tolist(), [5, -4, 3])
+        self.assertEqual(compared['ga:pageviews_change_w1'].tolist(), [50.0, -100.0, 100.0])
+        self.assertEqual(compared['ga:pageviews_change_w2'].tolist(), [-100.0, -50.0, 0.0])
+        self.assertEqual(compared['ga:pageviews_delta_w2'].dtype, np.int64)
+
+        totals, changes = compare_totals(weeks, ['ga:pageviews'])
+        self.assertEqual(totals[:, 0].tolist(), [14, 18, 2])
+        self.assertEqual(changes[:, 0].tolist(), [0.0, 28.57, -85.71])
+
+    def test_zero_denominators(self):
+        self.assertEqual(percent_change(0, 0), 0.0)
+        self.assertEqual(percent_change(0, 7), 100.0)
+        self.assertEqual(percent_change(0, 7, from_zero=np.inf), np.inf)
+        self.assertEqual(percent_change(np.array([0, 0, 3]), np.array([0, 2, 6]), from_zero=np.inf).tolist(),
+                         [0.0, np.inf, 100.0])
+
+
+class ChannelGroupingTest(SimpleTestCase):
+
+    def setUp(self):
+        self.sources = pd.DataFrame({
+            'ga:source': ['google', 'google', 'facebook.com', 'm.facebook.com', 'news.com', '(direct)'],
+            'ga:medium': ['organic', 'cpc', 'referral', 'referral', 'email', '(none)'],
+            'ga:hasSocialSourceReferral': ['No', 'No', 'Yes', 'Yes', 'No', 'No'],
+            'ga:socialNetwork': ['(not set)', '(not set)', 'Facebook', 'Facebook', '(not set)', '(not set)'],
+            'ga:sessions_prev': [10, 0, 4, 1, 3, 0],
+            'ga:goalCompletionsAll_prev': [1, 0, 0, 0, 0, 0],
+            'ga:sessions_curr': [20, 5, 2, 2, 3, 0],
+            'ga:goalCompletionsAll_curr': [2, 1, 0, 0, 0, 0]
+        })
+
+    def test_first_matching_rule_gives_the_category(self):
+        detail, summary = ChannelGrouping().group(self.sources)
+        self.assertEqual(detail.index.tolist(), [('Social', 'Facebook'), ('Organic Search', 'google'),
+                                                 ('Paid Search', 'google'), ('Direct', '(direct)'),
+                                                 ('Email', 'news.com')])
+        self.assertEqual(summary.index.tolist(), ['Organic Search', 'Paid Search', 'Social', 'Email', 'Direct'])
+        self.assertEqual(detail.loc[('Social', 'Facebook'), 'ga:sessions_prev'], 5)
+        self.assertEqual(summary.loc['Paid Search', 'sessionsChangeRate'], np.inf)
+        self.assertEqual(summary.loc['Direct', 'sessionsChangeRate'], 0.0)
+
+    def test_custom_rules(self):
+        rules = [{'category': 'Google', 'match': {'ga:source': ('google',)}}]
+        detail, summary = ChannelGrouping(rules, default_category='Rest').group(self.sources)
+        self.assertEqual(summary.index.tolist(), ['Google', 'Rest'])
+        self.assertEqual(summary['ga:sessions_curr'].tolist(), [25, 7])
+        self.assertEqual(detail.loc['Rest'].index.tolist(), ['news.com', 'facebook.com', 'm.facebook.com',
+                                                             '(direct)'])
+
+
+class ResultCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.today = datetime.date.today()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, 'results.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def clock(self):
+        return self.now
+
+    def normalize(self, st_date, end_date, **context):
+        context.update({'st_date': st_date, 'end_date': end_date})
+        return normalize_context(context, '1', today=self.today)
+
+    def test_equivalent_queries_share_a_key(self):
+        yesterday = (self.today - datetime.timedelta(days=1)).strftime('%Y-%m-%d')
+        first = self.normalize('7daysAgo', 'yesterday', api_metric='ga:pageviews, ga:users',
+                               api_dimension='ga:pagePath,ga:hostname')
+        second = self.normalize((self.today - datetime.timedelta(days=7)).strftime('%Y-%m-%d'), yesterday,
+                                api_metric='ga:users,ga:pageviews', api_dimension='ga:hostname, ga:pagePath')
+        self.assertEqual(make_key(first), make_key(second))
+        self.assertNotEqual(make_key(first), make_key(dict(first, start_index=10001)))
+
+    def test_ttl_depends_on_the_end_date(self):
+        cache = ResultCache(fresh_ttl=60, recent_ttl=600, settle_days=2)
+        self.assertEqual(cache.get_ttl(self.normalize('7daysAgo', 'today'), self.today), 60)
+        self.assertEqual(cache.get_ttl(self.normalize('7daysAgo', 'yesterday'), self.today), 600)
+        self.assertIsNone(cache.get_ttl(self.normalize('30daysAgo', '3daysAgo'), self.today))
+
+    def test_sqlite_tier_serves_a_new_cache_until_expiry(self):
+        normalized = self.normalize('7daysAgo', 'today')
+        key = make_key(normalized)
+        ResultCache(db_path=self.db_path, fresh_ttl=60, clock=self.clock).set(key, normalized, {'rows': [['/', '1']]})
+
+        cache = ResultCache(db_path=self.db_path, fresh_ttl=60, clock=self.clock)
+        self.assertEqual(cache.get(key), {'rows': [['/', '1']]})
+        self.assertEqual(cache.stats()['disk_hits'], 1)
+
+        self.now += 61
+        self.assertIsNone(cache.get(key))
+
+    def test_expired_rows_are_purged_from_the_sqlite_tier(self):
+        cache = ResultCache(db_path=self.db_path, fresh_ttl=60, clock=self.clock)
+        current = self.normalize('7daysAgo', 'today')
+        closed = self.normalize('30daysAgo', '3daysAgo')
+        cache.set(make_key(current), current, {'rows': [['/', '1']]})
+        cache.set(make_key(closed), closed, {'rows': [['/', '2']]})
+        self.assertEqual(cache.stats()['disk_entries'], 2)
+
+        # the next purge waits for fresh_ttl
+        self.now += 30
+        cache.set('other', current, {'rows': []})
+        self.assertEqual(cache.stats()['disk_entries'], 3)
+
+        self.now += 31
+        cache.set(make_key(closed), closed, {'rows': [['/', '2']]})
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            keys = [row[0] for row in conn.execute("SELECT key FROM result_cache")]
+        self.assertNotIn(make_key(current), keys)
+        self.assertEqual(sorted(keys), sorted([make_key(closed), 'other']))
+
+    def test_memory_tier_is_bounded_by_bytes(self):
+        cache = ResultCache(max_entries=10, max_bytes=250, clock=self.clock)
+        normalized = self.normalize('30daysAgo', '3daysAgo')
+        response = {'rows': [['/page', 'x' * 50]]}
+        for index in range(5):
+            cache.set('key%d' % index, normalized, response)
+        cache.get('key2')
+        cache.set('key5', normalized, response)
+
+        # least recently used first: key2 was read after key3 and key4 were stored
+        stats = cache.stats()
+        self.assertLessEqual(stats['memory_bytes'], 250)
+        self.assertEqual([key for key in ('key%d' % index for index in range(6)) if cache.get(key) is not None],
+                         ['key2', 'key4', 'key5'])
+
+        # a response larger than the limit is not kept
+        cache.set('large', normalized, {'rows': [['/page', 'x' * 500]]})
+        self.assertIsNone(cache.get('large'))
+
+
+class FakeServiceTest(IsolatedGlobalsMixin, SimpleTestCase):
+
+    def setUp(self):
+        super(FakeServiceTest, self).setUp()
+        self.service = query_basic.use_fake_service(paths=50, sources=12, sources_per_path=3)
+        self.context = {'svc_account_email': 'svc@example.com', 'key_file_location': '/tmp/key.p12',
+                        'st_date': '31daysAgo', 'end_date': 'yesterday', 'api_metric': 'ga:pageviews, ga:sessions',
+                        'api_dimension': 'ga:pagePath, ga:hostname, ga:source', 'sort_key': '-ga:pageviews'}
+
+    def test_reports_are_paged_and_consistent(self):
+        frame = query_basic.get_frame(self.context, page_size=40)
+        self.assertEqual(len(frame), 150)
+        self.assertEqual(self.service.requests, 3 + 4)  # management listings, then 4 pages of 40 rows
+        self.assertTrue((frame['ga:pageviews'].diff().dropna() <= 0).all())
+        self.assertTrue((frame['ga:sessions'] <= frame['ga:pageviews']).all())
+
+        # the page level report is the sum of the source level report, and the same on every call
+        paths = query_basic.get_frame(dict(self.context, api_dimension='ga:pagePath', api_metric='ga:pageviews'))
+        self.assertEqual(paths['ga:pageviews'].sum(), frame['ga:pageviews'].sum())
+        self.assertEqual(query_basic.use_fake_service(paths=50, sources=12, sources_per_path=3)
+                         .site.get_report(['ga:pagePath'], ['ga:pageviews'], *self.get_period()).values.tolist(),
+                         self.service.site.get_report(['ga:pagePath'], ['ga:pageviews'], *self.get_period())
+                         .values.tolist())
+
+    def test_spikes_and_drops_are_disjoint_on_small_sites(self):
+        query_basic.use_fake_service(paths=4, sources=3, sources_per_path=2, volatility=0.8)
+        analysis = Analytics()
+        analysis.gen_tts_ttd()
+        self.assertFalse(set(analysis.top_n_spikes.index) & set(analysis.top_n_drops.index))
+        self.assertTrue((analysis.top_n_spikes['Delta'] > 0).all())
+        self.assertTrue((analysis.top_n_drops['Delta'] < 0).all())
+
+    def get_period(self):
+        today = datetime.date.today()
+        return today - datetime.timedelta(days=31), today - datetime.timedelta(days=1)
+
+
+class TimeFrameTest(IsolatedGlobalsMixin, SimpleTestCase):
+
+    def setUp(self):
+        super(TimeFrameTest, self).setUp()
+        self.service = query_basic.use_fake_service(paths=50, sources=12, sources_per_path=3)
+
+        self.analysis = Analytics()
+        self.analysis.generate()
+        self.key = self.analysis.get_flight_key()
+        recent.recent_analyses.put(self.key, self.analysis)
+
+    def update_time_frame(self, **params):
+        request = RequestFactory().get('/dashboard/time_frame/', params)
+        request.user = type('User', (object,), {'is_authenticated': True})()
+        return DashboardView.as_view()(request, time_frame=True)
+
+    def test_only_the_stages_of_changed_dates_are_recomputed(self):
+        # same current period, longer previous period: the bounce rates only read the current period
+        response = self.update_time_frame(current_start='31daysAgo', current_end='yesterday',
+                                          previous_start='91daysAgo', previous_end='31daysAgo', key=self.key)
+        self.assertEqual(response.status_code, 200)
+        payload = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(list(payload['elements']), ['exec_overview', 'top_spikes', 'top_drops', 'sources'])
+        self.assertIn('tts_ttd', payload['stages'])
+        self.assertNotIn('bounce_rates', payload['stages'])
+
+        # the updated analysis matches a full build and the one shown by the page is left unchanged
+        updated = recent.recent_analyses.get(payload['key'])
+        full = Analytics()
+        full.period_previous = updated.period_previous
+        full.generate()
+        self.assertTrue(updated.top_n_spikes.equals(full.top_n_spikes))
+        self.assertTrue(updated.srcs_detail.equals(full.srcs_detail))
+        self.assertEqual(updated.exec_ov_visits_delta, full.exec_ov_visits_delta)
+        self.assertIs(updated.highest_n_br, self.analysis.highest_n_br)
+        self.assertEqual(self.analysis.period_previous, {'START': '61daysAgo', 'END': '31daysAgo'})
+
+    def test_invalid_time_frames_are_rejected(self):
+        response = self.update_time_frame(current_start='yesterday', current_end='31daysAgo')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('starts after it ends', json.loads(response.content.decode('utf-8'))['error'])
+        self.assertEqual(self.update_time_frame(current_start='2026-13-01', current_end='yesterday').status_code, 400)
+        self.assertEqual(self.update_time_frame(current_end='yesterday').status_code, 400)
+
+
+class ProfileFanOutTest(IsolatedGlobalsMixin, SimpleTestCase):
+
+    def setUp(self):
+        super(ProfileFanOutTest, self).setUp()
+        self.service = query_basic.use_fake_service(paths=30, sources=8, sources_per_path=2, profiles=3)
+
+    def test_profiles_are_built_in_parallel_and_rolled_up(self):
+        fan_out = ProfileFanOut(max_workers=3, stage_workers=2)
+        profile_ids = fan_out.list_profiles()
+        self.assertEqual(profile_ids, ['100000001', '100000002', '100000003'])
+
+        analyses, errors = fan_out.build(profile_ids)
+        self.assertEqual(list(analyses), profile_ids)
+        self.assertFalse(errors)
+        self.assertNotEqual(analyses['100000001'].exec_ov_visits_delta, analyses['100000002'].exec_ov_visits_delta)
+
+        overview = roll_up(analyses)
+        self.assertEqual(overview.index.tolist(), profile_ids + ['All clients'])
+        self.assertEqual(overview.loc['All clients', 'visits_curr'],
+                         sum(analysis.exec_ov_visits_delta[1] for analysis in analyses.values()))
+
+        # built analyses are served from the cache of their profile, unknown profiles fail on their own
+        requests = self.service.requests
+        analyses, errors = fan_out.build(profile_ids[:2] + ['999'])
+        self.assertEqual(list(analyses), profile_ids[:2])
+        self.assertEqual(list(errors), ['999'])
+        self.assertEqual(fan_out.stats()['hits'], 2)
+        self.assertGreater(self.service.requests, requests)
+
+    def test_the_activity_log_handler_is_added_once(self):
+        for _ in range(3):
+            Analytics()
+        self.assertEqual(len(logging.getLogger('ACTIVITY').handlers), 1)
+
+
+class ResultRecordsTest(IsolatedGlobalsMixin, SimpleTestCase):
+
+    def setUp(self):
+        super(ResultRecordsTest, self).setUp()
+        query_basic.use_fake_service(paths=40, sources=8, sources_per_path=2)
+
+    def test_stages_keep_immutable_records_only(self):
+        analysis = Analytics(max_workers=2)
+        self.assertIsNone(analysis.top_n_spikes)
+        self.assertEqual(analysis.memory_report(), {'total': 0})
+
+        analysis.generate()
+        self.assertIsNone(analysis.paths)
+        self.assertEqual(sorted(analysis.results), ['bounce_rates', 'bounce_rates_src', 'exec_overview', 'sources',
+                                                    'tts_ttd', 'tts_ttd_src'])
+        self.assertIs(analysis.top_n_spikes, analysis.results['tts_ttd'].spikes)
+        with self.assertRaises(AttributeError):
+            analysis.results['tts_ttd'].spikes = None
+        with self.assertRaises(AttributeError):
+            analysis.top_n_spikes = None
+
+        report = analysis.memory_report()
+        self.assertEqual(list(report)[-1], 'total')
+        self.assertGreater(report['sources'], 0)
+        self.assertEqual(report['total'], sum(report[name] for name in analysis.results))
+
+    def test_scheduler_releases_consumed_outputs(self):
+        class Report(object):
+            pass
+
+        released = []
+
+        def total(rows):
+            # the worker that ran the reading stage drops its arguments right after returning
+            deadline = time.time() + 5
+            while rows() is not None and time.time() < deadline:
+                time.sleep(0.01)
+            released.append(rows() is None)
+            return 1
+
+        schedule = StageScheduler(max_workers=2)
+        schedule.add('report', Report)
+        schedule.add('rows', lambda report: weakref.ref(report), inputs=['report'])
+        schedule.add('total', total, inputs=['rows'])
+
+        self.assertEqual(schedule.run(), {'total': 1})
+        self.assertEqual(released, [True])
+
+
+class SnapshotTest(IsolatedGlobalsMixin, SimpleTestCase):
+
+    def setUp(self):
+        super(SnapshotTest, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.now = [1000.0]
+        self.store = SnapshotStore(os.path.join(self.tmp_dir, 'snapshots.sqlite3'), max_versions=2, max_age=600,
+                                   clock=lambda: self.now[0])
+        self.builds = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def build(self, profile_id, period_current, period_previous):
+        if profile_id == 'broken':
+            raise ValueError('no data')
+        self.builds.append(profile_id)
+        key = Analytics(profile_id=profile_id).get_flight_key(period_current, period_previous)
+        return key, [{'title': 'Build %d' % len(self.builds), 'container': [1, 2.5]}]
+
+    def test_refresher_stores_versions_when_due(self):
+        refresher = SnapshotRefresher(self.store, profiles=['1', 'broken'], refresh_interval=60, build=self.build,
+                                      clock=lambda: self.now[0])
+        periods = snapshots.get_periods_key(*refresher.periods[0])
+
+        refreshed = refresher.refresh()
+        self.assertEqual([(profile_id, version) for profile_id, _, version, _ in refreshed],
+                         [('1', 1), ('broken', None)])
+        self.assertIsInstance(refreshed[1][3], ValueError)
+
+        # not due yet, then due: the history keeps max_versions versions
+        self.now[0] += 30
+        self.assertEqual(refresher.refresh()[0][2], None)
+        for _ in range(2):
+            self.now[0] += 60
+            refresher.refresh()
+        self.assertEqual([version for version, _, _ in self.store.versions('1', periods)], [3, 2])
+
+        snapshot = self.store.latest('1', periods)
+        self.assertEqual(snapshot.elements, [{'title': 'Build 3', 'container': [1, 2.5]}])
+        self.assertEqual(snapshot.key, Analytics(profile_id='1').get_flight_key(*refresher.periods[0]))
+
+        # built for the dates of another day, then too old to be served
+        self.assertIsNotNone(self.store.serve('1', periods, snapshot.key))
+        self.assertIsNone(self.store.serve('1', periods, snapshot.key.replace('|', '|1999-', 1)))
+        self.now[0] += 600
+        self.assertIsNone(self.store.serve('1', periods, snapshot.key))
+        self.assertIsNotNone(self.store.latest('1', periods))
+
+    def test_view_serves_the_latest_snapshot(self):
+        analysis = Analytics()
+        periods = snapshots.get_periods_key(analysis.period_current, analysis.period_previous)
+        self.store.save(None, periods, analysis.get_flight_key(), [{'title': 'Stored'}])
+        snapshots.snapshot_store = self.store
+
+        view = DashboardView()
+        context = view.get_context_data()
+        self.assertEqual(context['elements'], [{'title': 'Stored'}])
+        self.assertEqual(context['snapshot']['version'], 1)
+        self.assertEqual(context['analysis_key'], analysis.get_flight_key())
+        self.assertIsNone(view.analysis)
+
+        # the dates of the relative periods changed since the snapshot was stored: the page is built instead
+        self.store.save(None, periods, 'default|yesterday', [{'title': 'Stale'}])
+        query_basic.use_fake_service(paths=20, sources=6)
+        context = DashboardView().get_context_data()
+        self.assertNotEqual(context['elements'][0]['title'], 'Stale')
+        self.assertEqual(context['snapshot']['version'], 3)
+        self.assertEqual(context['analysis_key'], analysis.get_flight_key())
+
+
+class RowBuildersTest(SimpleTestCase):
+
+    def test_columns_are_formatted_at_once(self):
+        self.assertEqual(views.format_values(np.array([3, 12]), '%.0f'), ['3', '12'])
+        self.assertEqual(views.format_changes(np.array([12.5, -3.0, np.inf, 0.0])),
+                         [views.UP + ' 12.50%', views.DOWN + ' 3.00%', views.INFINITY, views.UP + ' 0.00%'])
+
+        positions = views.group_positions(['b', 'a', 'b', 'c', 'a'])
+        self.assertEqual(dict((label, rows.tolist()) for label, rows in positions.items()),
+                         {'a': [1, 4], 'b': [0, 2], 'c': [3]})
+
+    def test_rows_are_built_from_the_columns(self):
+        view = DashboardView()
+        view.analysis = runner.get_row_builder_analysis(30)
+
+        rows = view.fill_srcs()
+        self.assertEqual([row['group_name'] for row in rows], sorted(runner.ROW_BUILDER_CATEGORIES))
+        self.assertEqual(sum(len(row['src_detail']) for row in rows), 30)
+        detail = view.analysis.srcs_detail.loc[rows[0]['group_name']]
+        self.assertEqual([source['source'] for source in rows[0]['src_detail']], detail.index.tolist())
+        self.assertEqual(rows[0]['src_detail'][0]['sessions'], '%d' % detail['ga:sessions_curr'].iloc[0])
+
+        chart = json.loads(view.build_detail({'type': 'drop', 'path': 'www.example.com/drop'}))
+        deltas = [row['c'][2]['v'] - row['c'][1]['v'] for row in chart['rows']]
+        self.assertEqual(len(deltas), 30)
+        self.assertEqual(deltas, sorted(deltas))
+
+        container = view.fill_br()
+        self.assertEqual([len(detail['srcs_container']['srcs_data']) for detail in container['page_detail']],
+                         [30, 30])
+        self.assertEqual(json.loads(container['chart_data'])['rows'][0]['c'][0]['v'], 'www.example.com/high')
+
+
+class DataTableTest(SimpleTestCase):
+
+    def test_frames_are_encoded_like_json_dumps(self):
+        frame = runner.get_datatable_frame(50)
+        frame.index = frame.index.str.replace('source-3', 'source-3 \u00e9 "quoted"')
+        self.assertEqual(datatable_json(frame, runner.DATATABLE_COLUMNS),
+                         runner.dump_datatable(frame, runner.DATATABLE_COLUMNS))
+
+    def test_numpy_scalars_and_missing_values(self):
+        frame = pd.DataFrame({
+            'rate': [1.5, np.nan, np.inf],
+            'small': np.array([0.25, 1, 2], dtype=np.float32),
+            'count': np.array([1, 2, 3], dtype=np.uint8),
+            'flag': [True, False, True],
+            'mixed': [np.int64(7), np.float32(0.5), None]
+        }, index=['a</script>', 'b', 'c'])
+        columns = [
+            {'id': 'page', 'type': 'string', 'value': None},
+            {'id': 'rate', 'type': 'number', 'value': 'rate', 'pattern': '%.1f%%'},
+            {'type': 'number', 'value': 'small', 'formatted': 'count'},
+            {'type': 'boolean', 'value': 'flag'},
+            {'type': 'number', 'value': 'mixed'}
+        ]
+        encoded = datatable_json(frame, columns)
+        self.assertNotIn('</', encoded)
+        self.assertNotIn('NaN', encoded)
+
+        table = json.loads(encoded)
+        self.assertEqual(table['cols'][0], {'id': 'page', 'type': 'string'})
+        self.assertEqual(table['rows'][0]['c'], [{'v': 'a</script>'}, {'v': 1.5, 'f': '1.5%'},
+                                                 {'v': 0.25, 'f': 1}, {'v': True}, {'v': 7}])
+        self.assertEqual(table['rows'][1]['c'][1:], [{'v': None, 'f': None}, {'v': 1.0, 'f': 2}, {'v': False},
+                                                     {'v': 0.5}])
+        self.assertEqual(table['rows'][2]['c'][1], {'v': None, 'f': None})
+        self.assertEqual(table['rows'][2]['c'][4], {'v': None})
+
+
+class ElementEndpointTest(IsolatedGlobalsMixin, SimpleTestCase):
+
+    def setUp(self):
+        super(ElementEndpointTest, self).setUp()
+        query_basic.use_fake_service(paths=50, sources=12, sources_per_path=3)
+
+    def get(self, path, **kwargs):
+        request = RequestFactory().get(path)
+        request.user = type('User', (object,), {'is_authenticated': True})()
+        return DashboardView.as_view()(request, **kwargs)
+
+    def test_elements_match_the_full_page(self):
+        full = Analytics()
+        full.generate()
+        view = DashboardView()
+        view.analysis = full
+        expected = json.loads(json.dumps(view.init_elements()))
+
+        for position, name in enumerate(views.ELEMENT_STAGES):
+            response = self.get('/dashboard/element/%s/' % name, element=name)
+            self.assertEqual(response.status_code, 200)
+            payload = json.loads(response.content.decode('utf-8'))
+            self.assertEqual(payload['element'], expected[position])
+            self.assertIn(views.ELEMENT_TITLES[name], payload['html'])
+
+            # only the stages of the element ran
+            analysis = recent.element_analyses.get(payload['key'] + '|' + ','.join(views.ELEMENT_STAGES[name]))
+            self.assertTrue(set(analysis.results) <= set(views.ELEMENT_STAGES[name]))
+
+        response = self.get('/dashboard/element/bounce_rates/1/', element='bounce_rates', item='1')
+        payload = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(payload['data'], expected[3]['container']['page_detail'][1])
+
+        self.assertEqual(self.get('/dashboard/element/sources/999/', element='sources', item='999').status_code, 404)
+        self.assertEqual(self.get('/dashboard/element/nothing/', element='nothing').status_code, 404)
+
+    def test_streamed_page_flushes_elements_in_completion_order(self):
+        done = []
+        others_done = threading.Event()
+
+        class View(DashboardView):
+            def build_element(self, name):
+                if name == 'sources':
+                    raise ValueError('no data')
+                if name == 'exec_overview':
+                    others_done.wait(10)
+                built = super(View, self).build_element(name)
+                done.append(name)
+                if len(done) == 3:
+                    others_done.set()
+                return built
+
+        request = RequestFactory().get('/dashboard/stream/')
+        request.user = type('User', (object,), {'is_authenticated': True})()
+        response = View.as_view()(request, stream=True)
+        with self.assertLogs('ACTIVITY', 'ERROR') as logs:
+            chunks = [chunk.decode('utf-8') for chunk in response.streaming_content]
+        errors = [record for record in logs.records if record.levelno == logging.ERROR]
+        self.assertEqual([record.getMessage() for record in errors], ['Element sources failed'])
+        self.assertIsInstance(errors[0].exc_info[1], ValueError)
+
+        # the shell first, then one fragment per element, the slowest last
+        self.assertIn('id="placeholder-exec_overview"', chunks[0])
+        self.assertNotIn('loadElements();', chunks[0])
+        self.assertEqual(len(chunks), 2 + len(views.ELEMENT_STAGES))
+        self.assertIn('failElement("sources")', ''.join(chunks[1:-2]))
+        self.assertIn('streamElement("exec_overview", ', chunks[-2])
+        self.assertIn('Executive Overview', chunks[-2])
+        self.assertTrue(chunks[-1].startswith('</body>'))
+
+    def test_shell_only_has_placeholders(self):
+        response = self.get('/dashboard/shell/', shell=True)
+        response.render()
+        content = response.content.decode('utf-8')
+        for name in views.ELEMENT_STAGES:
+            self.assertIn('data-url="/dashboard/element/%s/"' % name, content)
+        self.assertEqual(len(recent.recent_analyses), 0)
+        self.assertEqual(len(recent.element_analyses), 0)
+
+
+class FactStoreTest(IsolatedGlobalsMixin, SimpleTestCase):
+
+    def setUp(self):
+        super(FactStoreTest, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        query_basic.result_cache = ResultCache(max_entries=0)
+        query_basic.use_fake_service(paths=20, sources=6, sources_per_path=2)
+
+        self.now = [1000.0]
+        self.store = FactStore(os.path.join(self.tmp_dir, 'facts.sqlite3'), clock=lambda: self.now[0])
+        self.today = datetime.date(2026, 10, 18)
+        self.context = {'svc_account_email': 'svc@example.com', 'key_file_location': '/tmp/key.p12',
+                        'api_metric': 'ga:pageviews, ga:sessions', 'api_dimension': 'ga:pagePath, ga:source'}
+        self.synced = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def fetch(self, contexts):
+        self.synced.extend((context['st_date'], context['end_date']) for context in contexts)
+        return query_basic.get_frames(contexts)
+
+    def get_windows(self, today):
+        return [dict(self.context, st_date=str(today - datetime.timedelta(days=31)),
+                     end_date=str(today - datetime.timedelta(days=1))),
+                dict(self.context, st_date=str(today - datetime.timedelta(days=61)),
+                     end_date=str(today - datetime.timedelta(days=31)))]
+
+    def test_windows_are_summed_from_the_stored_days(self):
+        windows = self.get_windows(self.today)
+        frames = self.store.get_frames(windows, self.fetch, self.today)
+        self.assertEqual(self.synced, [('2026-08-18', '2026-10-17')])
+
+        keys = ['ga:pagePath', 'ga:source']
+        for window, frame in zip(windows, frames):
+            live = query_basic.get_frame(window)
+            self.assertEqual(frame.sort_values(keys).values.tolist(), live.sort_values(keys).values.tolist())
+        self.assertEqual(frames[0]['ga:pageviews'].dtype.name, 'int32')
+
+        # the next day only the new day is downloaded, the days that had not settled are downloaded again once
+        # they expired
+        tomorrow = self.today + datetime.timedelta(days=1)
+        self.store.get_frames(self.get_windows(tomorrow), self.fetch, tomorrow)
+        self.assertEqual(self.synced[1:], [('2026-10-18', '2026-10-18')])
+
+        self.now[0] += self.store.recent_ttl
+        self.store.get_frames(self.get_windows(tomorrow), self.fetch, tomorrow)
+        self.assertEqual(self.synced[2:], [('2026-10-16', '2026-10-18')])
+
+    def test_only_additive_metrics_are_stored(self):
+        self.assertTrue(self.store.can_answer(self.context))
+        self.assertFalse(self.store.can_answer(dict(self.context, api_metric='ga:users, ga:sessions')))
+        self.assertFalse(self.store.can_answer(dict(self.context, api_metric='ga:bounceRate')))
+
+
+class QueryPlannerTest(SimpleTestCase):
+
+    def setUp(self):
+        self.context = {'profile_id': '1', 'st_date': '31daysAgo', 'end_date': 'yesterday',
+                        'api_dimension': 'ga:pagePath, ga:hostname', 'api_filter': None}
+
+    def test_queries_with_the_same_dimensions_are_merged(self):
+        planner = QueryPlanner()
+        views = planner.add(dict(self.context, api_metric='ga:pageviews', sort_key='-ga:pageviews'))
+        bounces = planner.add(dict(self.context, api_metric='ga:bounces, ga:sessions', sort_key='-ga:bounces',
+                                   api_dimension='ga:hostname,ga:pagePath'))
+        planner.add(dict(self.context, api_metric='ga:pageviews', st_date='61daysAgo', end_date='31daysAgo'))
+        planner.add(dict(self.context, api_metric='ga:pageviews', api_dimension='ga:pagePath'))
+
+        batches = planner.plan()
+        self.assertEqual(planner.stats(), {'queries': 4, 'reports': 3, 'batches': 2})
+        self.assertEqual(batches[0][0].tickets, [views, bounces])
+        self.assertEqual(batches[0][0].context['api_metric'], 'ga:pageviews,ga:bounces,ga:sessions')
+
+        # the merged report is sorted by the first query
+        frame = pd.DataFrame({'ga:pagePath': ['/c', '/a', '/b'], 'ga:hostname': ['x', 'x', 'x'],
+                              'ga:pageviews': [9, 5, 0], 'ga:bounces': [3, 1, 2], 'ga:sessions': [0, 0, 4]},
+                             columns=['ga:pagePath', 'ga:hostname', 'ga:pageviews', 'ga:bounces', 'ga:sessions'])
+        frames = planner.fan_out(batches[0][0], frame)
+
+        # rows without page views are left out and each query gets its own columns and sort order
+        self.assertEqual(frames[views].columns.tolist(), ['ga:pagePath', 'ga:hostname', 'ga:pageviews'])
+        self.assertEqual(frames[views]['ga:pagePath'].tolist(), ['/c', '/a'])
+        self.assertEqual(frames[bounces].columns.tolist(), ['ga:hostname', 'ga:pagePath', 'ga:bounces', 'ga:sessions'])
+        self.assertEqual(frames[bounces]['ga:pagePath'].tolist(), ['/c', '/b', '/a'])
+
+    def test_merged_reports_respect_the_metric_limit(self):
+        planner = QueryPlanner(max_metrics=3)
+        planner.add(dict(self.context, api_metric='ga:users, ga:sessions'))
+        planner.add(dict(self.context, api_metric='ga:pageviews, ga:bounces'))
+        planner.add(dict(self.context, api_metric='ga:sessions, ga:totalEvents'))
+
+        queries = planner.plan()[0]
+        self.assertEqual([query.context['api_metric'] for query in queries],
+                         ['ga:users,ga:sessions,ga:totalEvents', 'ga:pageviews,ga:bounces'])
+        self.assertRaises(ValueError, planner.add, dict(self.context, api_metric='a,b,c,d'))
+
+
+class StageSchedulerTest(SimpleTestCase):
+
+    def test_stages_receive_their_inputs(self):
+        schedule = StageScheduler(max_workers=2)
+        schedule.add('a', lambda: 2)
+        schedule.add('b', lambda: 3)
+        schedule.add('product', lambda a, b: a * b, inputs=['a', 'b'])
+        schedule.add('unused', lambda: 1 / 0)
+
+        outputs = schedule.run(['product'])
+        self.assertEqual(outputs['product'], 6)
+        self.assertNotIn('unused', outputs)
+        self.assertEqual(set(schedule.timings), {'a', 'b', 'product'})
+
+    def test_independent_stages_run_concurrently(self):
+        schedule = StageScheduler(max_workers=3)
+        for name in ['q1', 'q2', 'q3']:
+            schedule.add(name, lambda: time.sleep(0.2))
+
+        start = time.time()
+        schedule.run()
+        self.assertLess(time.time() - start, 0.5)
+
+    def test_errors_and_cycles_are_raised(self):
+        schedule = StageScheduler()
+        schedule.add('fails', lambda: 1 / 0)
+        with self.assertRaises(ZeroDivisionError):
+            schedule.run()
+
+        schedule = StageScheduler()
+        schedule.add('a', lambda b: b, inputs=['b'])
+        schedule.add('b', lambda a: a, inputs=['a'])
+        with self.assertRaises(ValueError):
+            schedule.run()
+
+
+class SingleFlightTest(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_concurrent_callers_share_one_computation(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return 'analysis'
+
+        leader = threading.Thread(target=lambda: results.append(flight.do('1|period', compute)))
+        leader.start()
+        started.wait()
+        follower = threading.Thread(target=lambda: results.append(flight.do('1|period', compute)))
+        follower.start()
+
+        # the follower registers while the leader is still computing
+        while flight.stats()['shared'] == 0:
+            time.sleep(0.01)
+        release.set()
+        leader.join()
+        follower.join()
+
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, ['analysis', 'analysis'])
+        self.assertEqual(flight.stats()['in_flight'], 0)
+        self.assertEqual(flight.do('1|period', lambda: 'again'), 'again')
+
+    def test_lock_file_serializes_processes(self):
+        # two instances sharing a lock directory behave like two worker processes
+        first = SingleFlight(lock_dir=self.tmp_dir, poll_interval=0.01)
+        second = SingleFlight(lock_dir=self.tmp_dir, lock_timeout=5, poll_interval=0.01)
+        started = threading.Event()
+        release = threading.Event()
+        order = []
+
+        def compute():
+            started.set()
+            release.wait()
+            order.append('first')
+
+        thread = threading.Thread(target=lambda: first.do('1|period', compute))
+        thread.start()
+        started.wait()
+        waiter = threading.Thread(target=lambda: second.do('1|period', lambda: order.append('second')))
+        waiter.start()
+
+        while second.stats()['process_waits'] == 0:
+            time.sleep(0.01)
+        release.set()
+        thread.join()
+        waiter.join()
+
+        self.assertEqual(order, ['first', 'second'])
+
+        # a stuck process delays the others at most lock_timeout seconds
+        impatient = SingleFlight(lock_dir=self.tmp_dir, lock_timeout=0, poll_interval=0.01)
+        with first._process_lock('1|period'):
+            self.assertEqual(impatient.do('1|period', lambda: 'computed'), 'computed')
+        self.assertEqual(impatient.stats()['lock_timeouts'], 1)
+
+
+class BenchmarkTest(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_stages_are_measured_and_compared_with_a_baseline(self):
+        pool = query_basic.service_pool
+        results = runner.run_benchmark(sizes=[100], stages=['gen_exec_overview', 'init_exec_overview'])
+        self.assertIs(query_basic.service_pool, pool)
+
+        stages = results['sizes']['100']['stages']
+        self.assertEqual(list(stages), ['gen_exec_overview', 'init_exec_overview'])
+        self.assertGreater(stages['gen_exec_overview']['alloc_peak_mb'], 0)
+
+        runner.save_baseline(results, 'base', self.tmp_dir)
+        baseline = runner.load_baseline('base', self.tmp_dir)
+        rows = runner.compare(results, baseline)
+        self.assertIn(('100', 'gen_exec_overview', 'seconds', stages['gen_exec_overview']['seconds'],
+                       stages['gen_exec_overview']['seconds'], 0.0), rows)
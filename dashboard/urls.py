@@ -10,4 +10,10 @@ from dashboard.views import DashboardView
 
 urlpatterns = [
     url(r'^$', DashboardView.as_view(), name='dashboard'),
+    url(r'^time_frame/$', DashboardView.as_view(), {'time_frame': True}, name='time_frame'),
+    url(r'^clients/$', DashboardView.as_view(), {'clients': True}, name='clients'),
+    url(r'^shell/$', DashboardView.as_view(), {'shell': True}, name='shell'),
+    url(r'^stream/$', DashboardView.as_view(), {'stream': True}, name='stream'),
+    url(r'^element/(?P<element>\w+)/$', DashboardView.as_view(), name='element'),
+    url(r'^element/(?P<element>\w+)/(?P<item>\d+)/$', DashboardView.as_view(), name='element_item'),
 ]
@@ -1,9 +1,21 @@
+import datetime
 import json
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import numpy as np
 import pandas as pd
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
 from django.views.generic import TemplateView
-from dashboard.analysis.analytics import Analytics
+from dashboard.API.query_essentials.dates import resolve_period, format_date
+from dashboard.analysis.analytics import Analytics, get_activity_log
+from dashboard.analysis.datatable import datatable_json
+from dashboard.analysis import fan_out, recent, singleflight, snapshots
 
 """ @file views.py
     @author Justin Chambers
@@ -13,6 +25,90 @@ from dashboard.analysis.analytics import Analytics
     @description This file contains the DashboardView class implementation
 """
 
+# Dashboard elements in page order, with the analysis stages their data comes from (see Analytics.build_schedule)
+ELEMENT_STAGES = OrderedDict([
+    ('exec_overview', ('exec_overview',)),
+    ('top_spikes', ('tts_ttd', 'tts_ttd_src')),
+    ('top_drops', ('tts_ttd', 'tts_ttd_src')),
+    ('bounce_rates', ('above_avrg_paths', 'bounce_rates', 'bounce_rates_src')),
+    ('sources', ('sources',))
+])
+
+# Headers of the element placeholders of the page shell
+ELEMENT_TITLES = OrderedDict([
+    ('exec_overview', 'Executive Overview'),
+    ('top_spikes', 'Top Traffic Spikes'),
+    ('top_drops', 'Top Traffic Drops'),
+    ('bounce_rates', 'Bounce Rates'),
+    ('sources', 'Traffic Sources')
+])
+
+# Drill-down items of the elements: the key of the list of items in the container, None when the container is the list
+ELEMENT_ITEMS = {
+    'exec_overview': None,
+    'top_spikes': None,
+    'top_drops': None,
+    'bounce_rates': 'page_detail',
+    'sources': 'rows'
+}
+
+# DataTable columns of the TTS/TTD detail charts and of the Bounce Rates chart (see datatable.datatable_json)
+DETAIL_CHART_COLUMNS = [
+    {'id': 'src', 'label': 'Referral Source', 'type': 'string', 'value': None},
+    {'id': 'views_prev', 'label': 'Previous Page Views', 'type': 'number',
+     'value': 'ga:pageviews_prev', 'formatted': 'ga:pageviews_prev'},
+    {'id': 'views_curr', 'label': 'Current Page Views', 'type': 'number',
+     'value': 'ga:pageviews_curr', 'formatted': 'ga:pageviews_curr'}
+]
+BR_CHART_COLUMNS = [
+    {'id': 'ppath', 'label': 'Full Page URL', 'type': 'string', 'value': None, 'formatted': None},
+    {'id': 'br_curr', 'label': 'Bounce Rate', 'type': 'number', 'value': 'fromAvrg%', 'formatted': 'bounceRate'},
+    {'type': 'string', 'p': {'role': 'style'}, 'value': 'style'}
+]
+
+# Arrows of the change rates of the Traffic Sources element
+UP = '\u2206'
+DOWN = '\u2207'
+INFINITY = '\u221E'
+
+
+def format_values(values, pattern):
+    """ @brief format_values
+        @description formats a whole column at once
+        @param values: a numpy array or Series of numbers
+        @param pattern: a printf style pattern, e.g. '%.2f%%'
+        @return a list of strings
+    """
+    return np.char.mod(pattern, np.asarray(values)).tolist()
+
+
+def format_changes(values):
+    """ @brief format_changes
+        @description formats a column of change rates: an up or down arrow and the rate, infinity for rates
+                    growing from zero
+        @param values: a numpy array or Series of change rates in %
+        @return a list of strings
+    """
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        down = values < 0
+    changes = np.char.add(np.where(down, DOWN + ' ', UP + ' '),
+                          np.char.mod('%.2f%%', np.where(down, -values, values))).astype(object)
+    changes[values == np.inf] = INFINITY
+    return changes.tolist()
+
+
+def group_positions(labels):
+    """ @brief group_positions
+        @description finds the rows of every label with one stable sort, instead of one lookup per label
+        @param labels: a sequence of labels, e.g. a level of a MultiIndex
+        @return a dictionary with the positions of the rows of every label, in row order
+    """
+    codes, uniques = pd.factorize(np.asarray(labels, dtype=object))
+    order = np.argsort(codes, kind='mergesort')
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    return dict((label, order[bounds[index]:bounds[index + 1]]) for index, label in enumerate(uniques))
+
 
 class DashboardView(LoginRequiredMixin, TemplateView):
     """ @brief DashboardView
@@ -61,22 +157,25 @@ class DashboardView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         """ @brief get_context_data
             @description function receives the HTML request and generates the context variables
-                        to be attached to the HTML response
+                        to be attached to the HTML response. The elements come from get_elements, the page shell
+                        only has a placeholder per element, filled by the page from the element endpoints (see
+                        get_element)
             @param kwargs: the pointer to the HTML request 
             @return context: the HTML response containing all the dashboard data
         """
         print('Start get_context_data')
         if 'view' not in kwargs:
-            self.analysis = Analytics()
-            # print('Init XO...')
-            self.analysis.gen_exec_overview()
-            # print('Init TTS/TTD...')
-            self.analysis.gen_tts_ttd()
-            # print('Init BR...')
-            self.analysis.gen_bouncerate()
-            # print('Init SRCS...')
-            self.analysis.gen_sources()
-            self.analysis_layer_exists = True
+            snapshot = None
+            placeholders = []
+            if kwargs.pop('shell', False):
+                # page shell: nothing is built here, the page fetches every element from its endpoint
+                key = None
+                elements = []
+                placeholders = [{'name': name, 'title': title, 'url': reverse('element', kwargs={'element': name})}
+                                for name, title in ELEMENT_TITLES.items()]
+            else:
+                key, elements, snapshot = self.get_elements()
+
             context = super(DashboardView, self).get_context_data(**kwargs)
             context['preferences'] = self.prefs
             context['username'] = self.prefs['username']
@@ -84,25 +183,60 @@ class DashboardView(LoginRequiredMixin, TemplateView):
             context['menu_title'] = 'Nerd Vision: ' + self.prefs['username']
             context['menu_icon'] = 'img/ic_menu.svg'
             context['date_range_icon'] = 'img/ic_date_range.svg'
-            context['elements'] = self.init_elements()
+            context['analysis_key'] = key
+            context['elements'] = elements
+            context['placeholders'] = placeholders
+            if snapshot is not None:
+                context['snapshot'] = {
+                    'version': snapshot.version,
+                    'created': datetime.datetime.fromtimestamp(snapshot.created, timezone.utc),
+                    'age': int(snapshot.age())
+                }
         else:
             context = kwargs
         # print('End get_context_data (returning context)\n\n')
         return context
 
+    def get_elements(self):
+        """ @brief get_elements
+            @description function serves the elements of the latest snapshot of the profile and periods when
+                        snapshots are enabled (see snapshots), it builds and stores them otherwise
+            @return a tuple with the key of the analysis, the list of elements and the snapshot, None if
+                        snapshots are disabled
+        """
+        analysis = Analytics()
+        key = analysis.get_flight_key()
+        periods = snapshots.get_periods_key(analysis.period_current, analysis.period_previous)
+
+        store = snapshots.snapshot_store
+        snapshot = store.serve(analysis.profile_id, periods, key) if store is not None else None
+        if snapshot is not None:
+            return snapshot.key, snapshot.elements, snapshot
+
+        def generate():
+            # XO, TTS/TTD, BR and SRCS queries run concurrently
+            analysis.generate()
+            return analysis
+
+        # concurrent loads of the same profile and periods share one analysis
+        start = time.time()
+        self.analysis = singleflight.analysis_flight.do(key, generate)
+        self.analysis_layer_exists = True
+
+        # later time frame changes of the page start from this analysis
+        recent.recent_analyses.put(key, self.analysis)
+        elements = self.init_elements()
+        if store is not None:
+            snapshot = store.save(analysis.profile_id, periods, key, elements, round(time.time() - start, 3))
+        return key, elements, snapshot
+
     def init_elements(self):
         """ @brief init_elements
             @description function initializes all 5 of the dashboard elements
             @return the list of elements 
         """
         # print('CALL init_elements\n\n')
-        return [
-            self.init_exec_overview(),
-            self.init_top_spikes(),
-            self.init_top_drops(),
-            self.init_bounce_rates(),
-            self.init_sources()
-        ]
+        return [getattr(self, 'init_' + name)() for name in ELEMENT_STAGES]
 
     def init_exec_overview(self):
         """ @brief init_exec_overview
@@ -239,31 +373,243 @@ class DashboardView(LoginRequiredMixin, TemplateView):
 
         return xo_content
 
-    def update_time_frame(self):
-        """ @brief update_time_frame
-            @description function should detect an update in time frames, then update the dashboard
-                        data accordingly and push the new data to the front end
-            @description THIS FUNCTION IS NOT IMPLEMENTED, AS THE FEATURE IS PART OF THE FUTURE WORK
-            @description NOTE: The algorithm in commented pseudocode is provided below
+    def get(self, request, *args, **kwargs):
+        """ @brief get
+            @description function dispatches the GET requests of the dashboard page, of its streamed version (see
+                        stream_page) and of its time frame (see update_time_frame), clients (see clients_overview)
+                        and element (see get_element) endpoints
+            @param request: the HTML request
+            @return the HTML response, the streamed page, or the JSON response of an endpoint
         """
-        '''
-            get request
-                check if user has requested updated data
+        if 'element' in kwargs:
+            return self.get_element(request, kwargs.pop('element'), kwargs.pop('item', None))
+        if kwargs.pop('stream', False):
+            return self.stream_page(request)
+        if kwargs.pop('time_frame', False):
+            return self.update_time_frame(request)
+        if kwargs.pop('clients', False):
+            return self.clients_overview(request)
+        return super(DashboardView, self).get(request, *args, **kwargs)
+
+    def get_element(self, request, name, item=None):
+        """ @brief get_element
+            @description function returns one element of the dashboard (see build_element), or one drill-down item
+                        of it, so the page shell can load every element in parallel and show each one as soon as it
+                        is ready
+            @param request: the GET request
+            @param name: the name of the element, a key of ELEMENT_STAGES
+            @param item: optional position of a drill-down item of the element (see ELEMENT_ITEMS)
+            @return a JsonResponse with the name, block id, content and HTML of the element, or with the item, or
+                        the error with status 404 if the element or the item does not exist
+        """
+        if name not in ELEMENT_STAGES:
+            return JsonResponse({'error': 'Unknown element: ' + name}, status=404)
+
+        key, element = self.build_element(name)
+
+        if item is None:
+            return JsonResponse({
+                'name': name,
+                'key': key,
+                'block_id': element.get('block_id'),
+                'element': element,
+                'html': render_to_string('dashboard/element.html', {'el': element}, request)
+            })
+
+        items = element['container']
+        if ELEMENT_ITEMS[name] is not None:
+            items = items[ELEMENT_ITEMS[name]]
+        if not 0 <= int(item) < len(items):
+            return JsonResponse({'error': 'Unknown item of %s: %s' % (name, item)}, status=404)
+        return JsonResponse({'name': name, 'key': key, 'item': int(item), 'data': items[int(item)]})
+
+    def build_element(self, name):
+        """ @brief build_element
+            @description function builds one element of the dashboard. The element comes from the snapshot or the
+                        recent analysis of the profile and periods when there is one, only the analysis stages of
+                        the element run otherwise (see ELEMENT_STAGES)
+            @param name: the name of the element, a key of ELEMENT_STAGES
+            @return a tuple with the key of the analysis and the element content
+        """
+        analysis = Analytics()
+        key = analysis.get_flight_key()
+        periods = snapshots.get_periods_key(analysis.period_current, analysis.period_previous)
+
+        store = snapshots.snapshot_store
+        snapshot = store.serve(analysis.profile_id, periods, key) if store is not None else None
+        if snapshot is not None:
+            return key, snapshot.elements[list(ELEMENT_STAGES).index(name)]
+
+        # elements reading the same stages (TTS and TTD) share one analysis
+        stages_key = key + '|' + ','.join(ELEMENT_STAGES[name])
+        self.analysis = recent.recent_analyses.get(key) or recent.element_analyses.get(stages_key)
+        if self.analysis is None:
+            def generate():
+                analysis.run_stages(list(ELEMENT_STAGES[name]))
+                return analysis
+
+            self.analysis = singleflight.analysis_flight.do(stages_key, generate)
+            recent.element_analyses.put(stages_key, self.analysis)
+        self.analysis_layer_exists = True
+        return key, getattr(self, 'init_' + name)()
+
+    def stream_page(self, request):
+        """ @brief stream_page
+            @description function streams the dashboard page: the page shell is sent right away, then the HTML
+                        of every element is flushed as soon as it is built, in completion order, and swapped for
+                        its placeholder by the page (see streamElement in loader.js). Every element is built by its
+                        own view (see build_element), so the executive overview arrives with its own queries
+            @param request: the GET request
+            @return a StreamingHttpResponse with the page
+        """
+        context = self.get_context_data(shell=True)
+        context['streaming'] = True
+        page = render_to_string(self.template_name, context, request)
+        head, end, tail = page.rpartition('</body>')
+        if not end:
+            head, tail = page, ''
+
+        def build(name):
+            return type(self)().build_element(name)[1]
+
+        def stream():
+            yield head
+            with ThreadPoolExecutor(max_workers=len(ELEMENT_STAGES)) as executor:
+                futures = dict((executor.submit(build, name), name) for name in ELEMENT_STAGES)
+                for future in as_completed(futures):
+                    yield self.render_fragment(request, futures[future], future)
+            yield end + tail
+
+        return StreamingHttpResponse(stream(), content_type='text/html; charset=utf-8')
+
+    def render_fragment(self, request, name, future):
+        """ @brief render_fragment
+            @description function renders the streamed fragment of a built element: its HTML in a hidden block
+                        and the script swapping it for the placeholder of the element
+            @param request: the GET request
+            @param name: the name of the element
+            @param future: the finished future of the element content
+            @return the HTML of the fragment
+        """
+        try:
+            element = future.result()
+        except Exception:
+            get_activity_log().exception('Element %s failed', name)
+            return '<script>failElement("%s");</script>\n' % name
+
+        # the content is embedded in a script, it must not close it
+        content = json.dumps(element).replace('</', '<\\/')
+        return '<div class="dashboard-element-fragment" id="fragment-%s" hidden>%s</div>' \
+               '<script>streamElement("%s", %s);</script>\n' % (
+                   name, render_to_string('dashboard/element.html', {'el': element}, request), name, content)
+
+    def clients_overview(self, request):
+        """ @brief clients_overview
+            @description function builds the analyses of several client profiles in parallel (see fan_out) and
+                        returns the executive overview of every client and of all the clients together
+            @param request: the GET request with the profile ids to include (profile, repeated), the
+                        DASHBOARD_CLIENT_PROFILES setting or every profile of the service account by default
+            @return a JsonResponse with the overview rows, by profile id then 'All clients', and the errors of
+                        the profiles that could not be built
+        """
+        profile_ids = (request.GET.getlist('profile') or getattr(settings, 'DASHBOARD_CLIENT_PROFILES', None) or
+                       fan_out.profile_fan_out.list_profiles())
+
+        analyses, errors = fan_out.profile_fan_out.build(profile_ids)
+        overview = fan_out.roll_up(analyses)
 
-                get preferences data from pref model
-                get changes from UI layer (request? update? ...)
+        rows = OrderedDict((profile_id, OrderedDict()) for profile_id in overview.index)
+        for column in overview.columns:
+            for profile_id, value in zip(overview.index, overview[column].values.tolist()):
+                rows[profile_id][column] = value
 
-                if no change
-                    do nothing
-                if change
-                    test if change is valid (is date range valid?)
-                    if no
-                        return error
-                    if yes
-                        update pref model
-                        pass pref model data to generate fcn
+        return JsonResponse({
+            'profiles': list(analyses),
+            'overview': rows,
+            'errors': OrderedDict((profile_id, str(error)) for profile_id, error in errors.items())
+        })
+
+    def update_time_frame(self, request):
+        """ @brief update_time_frame
+            @description function validates a new time frame, updates the analysis of the page to it and returns
+                        the payloads of the elements whose data changed. Only the analysis stages reading dates
+                        that changed are recomputed (see Analytics.update_periods), their reports come from the
+                        caches of the query layer for the days already downloaded
+            @param request: the GET request with current_start and current_end dates (YYYY-MM-DD, today,
+                        yesterday or NdaysAgo), optional previous_start and previous_end dates (the period of the
+                        same length ending when the current one starts by default) and the key of the analysis
+                        shown by the page
+            @return a JsonResponse with the key and periods of the new analysis, the recomputed stages and the
+                        payloads of the changed elements, or the error with status 400 if the time frame is not valid
+        """
+        try:
+            period_current, period_previous = self.get_time_frame(request.GET)
+        except KeyError as error:
+            return JsonResponse({'error': 'Missing time frame parameter: ' + error.args[0]}, status=400)
+        except ValueError as error:
+            return JsonResponse({'error': 'Invalid time frame: ' + str(error)}, status=400)
+
+        # start from the analysis shown by the page, or from the last one of the profile
+        base = recent.recent_analyses.get(request.GET.get('key'))
+        shown = base is not None
+        if base is None:
+            base = recent.recent_analyses.latest()
+        fresh = Analytics() if base is None else None
+
+        key = (base or fresh).get_flight_key(period_current, period_previous)
+        self.analysis = recent.recent_analyses.get(key)
+        derived = []
+
+        if self.analysis is None:
+            def update():
+                if fresh is not None:
+                    # nothing to start from: full build
+                    fresh.period_current = period_current
+                    fresh.period_previous = period_previous
+                    fresh.generate()
+                    return fresh
+
+                derived.append(True)
+                return base.with_periods(period_current, period_previous)
+
+            # concurrent changes to the same time frame share one update
+            self.analysis = singleflight.analysis_flight.do(key, update)
+            recent.recent_analyses.put(key, self.analysis)
+        self.analysis_layer_exists = True
+
+        # the page only needs the elements of the recomputed stages when it shows the analysis they were updated from
+        stages = set(self.analysis.stage_timings)
+        elements = OrderedDict()
+        for name, element_stages in ELEMENT_STAGES.items():
+            if not (shown and derived) or stages.intersection(element_stages):
+                elements[name] = getattr(self, 'init_' + name)()
+
+        return JsonResponse({
+            'key': key,
+            'periods': {'current': period_current, 'previous': period_previous},
+            'stages': sorted(stages),
+            'elements': elements
+        })
+
+    def get_time_frame(self, params):
+        """ @brief get_time_frame
+            @description function reads and validates the periods of a time frame request
+            @param params: the query parameters of the request
+            @return a tuple with the current and the previous period, in the format of Analytics.period_current
+            @raise KeyError: if current_start or current_end is missing
+            @raise ValueError: if a period is not valid (see dates.resolve_period)
+        """
+        current_start, current_end = resolve_period(params['current_start'], params['current_end'])
+        period_current = {'START': format_date(current_start), 'END': format_date(current_end)}
+
+        if params.get('previous_start') or params.get('previous_end'):
+            previous_start, previous_end = resolve_period(params['previous_start'], params['previous_end'])
+        else:
+            previous_start, previous_end = current_start - (current_end - current_start), current_start
+            resolve_period(format_date(previous_start), format_date(previous_end))
+        period_previous = {'START': format_date(previous_start), 'END': format_date(previous_end)}
 
-        '''
+        return period_current, period_previous
 
     def init_top_spikes(self):
         """ @brief init_top_spikes
@@ -280,16 +626,16 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         # ANONYMIZED PATHS
         # path_suffix = 1
 
-        for path in tts_paths:
+        for path, delta_p in zip(tts_paths, tts['Delta_%'].tolist()):
 
             # ANONYMIZED PATHS
             # anonymized_path = 'spike_page ' + str(path_suffix)
             # path_suffix += 1
-            # string = str(tts.ix[path]['Delta_%']) + '% increase in page visits to ' + anonymized_path
+            # string = str(delta_p) + '% increase in page visits to ' + anonymized_path
             # END ANONYMIZED
 
             # ACTUAL PATHS
-            string = str(tts.ix[path]['Delta_%']) + '% increase in page visits to ' + path
+            string = str(delta_p) + '% increase in page visits to ' + path
             # END ACTUAL
 
             summary_strings.append(string)
@@ -331,16 +677,16 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         # ANONYMIZED PATHS
         # path_suffix = 1
 
-        for path in ttd_paths:
+        for path, delta_p in zip(ttd_paths, ttd['Delta_%'].tolist()):
 
             # ANONYMIZED PATHS
             # anonymized_path = 'drop_page ' + str(path_suffix)
             # path_suffix += 1
-            # string = str(ttd.ix[path]['Delta_%']) + '% increase in page visits to ' + anonymized_path
+            # string = str(delta_p) + '% increase in page visits to ' + anonymized_path
             # END ANONYMIZED
 
             # ACTUAL PATHS
-            string = str(ttd.ix[path]['Delta_%']) + '% increase in page visits to ' + path
+            string = str(delta_p) + '% increase in page visits to ' + path
             # END ACTUAL
 
             summary_strings.append(string)
@@ -384,7 +730,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
                         'recommendation': 'This is what we think you should do about it.'
                     },
             'chart_summary': summary_str,
-            'chart_data': json.dumps(self.build_detail(det_params)),
+            'chart_data': self.build_detail(det_params),
             'chart_tag': detail_chart_id,
             'chart_div': '<div id="' + detail_chart_id + '"></div>',
             'chart_title': 'Page Views by Referral Source (Previous Month vs. Current Month)',
@@ -399,42 +745,20 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         """ @brief build_detail
             @description function generates the detail chart data used by each TTS and TTD detail item
             @param params: a dictionary containing item type data (to distinguish between TTS and TTD items)
-            @return: raw_data: a JSON literal dictionary ready for dumping to charts
+            @return: the DataTable JSON string of the chart
         """
-        raw_data = {'cols': [{'id': 'src',
-                              'label': 'Referral Source',
-                              'type': 'string'},
-                             {'id': 'views_prev',
-                              'label': 'Previous Page Views',
-                              'type': 'number'},
-                             {'id': 'views_curr',
-                              'label': 'Current Page Views',
-                              'type': 'number'}],
-                    'rows': []}
-
         tts_detail = None
 
+        # the detail frames are shared by the requests: sorting returns a copy, equal deltas keep the source order
         if params['type'] == 'spike':
-            tts_detail = self.analysis.get_top_spikes_src().ix[(params['path'],)]
-            tts_detail.sort_values(['Delta'], ascending=False, inplace=True)
+            tts_detail = self.analysis.get_top_spikes_src().loc[params['path']]
+            tts_detail = tts_detail.sort_values(['Delta'], ascending=False, kind='mergesort')
         elif params['type'] == 'drop':
-            tts_detail = self.analysis.get_top_drops_src().ix[(params['path'],)]
-            tts_detail.sort_values(['Delta'], ascending=True, inplace=True)
-
-        srcs = tts_detail.index.tolist()
-
-        for src in srcs:
-            data = {'c': [{'v': src},
-                          {'v': np.asscalar(tts_detail.ix[src]['ga:pageviews_prev']),
-                           'f': np.asscalar(tts_detail.ix[src]['ga:pageviews_prev'])},
-                          {'v': np.asscalar(tts_detail.ix[src]['ga:pageviews_curr']),
-                           'f': np.asscalar(tts_detail.ix[src]['ga:pageviews_curr'])}
-                          ]
-                    }
-
-            raw_data['rows'].append(data)
+            tts_detail = self.analysis.get_top_drops_src().loc[params['path']]
+            tts_detail = tts_detail.sort_values(['Delta'], ascending=True, kind='mergesort')
 
-        return raw_data
+        # one row per source, straight from the columns
+        return datatable_json(tts_detail, DETAIL_CHART_COLUMNS)
 
     def fill_srcs(self):
         """ @brief fill_srcs
@@ -444,88 +768,58 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         srcs_summary = self.analysis.srcs_summary
         srcs_detail = self.analysis.srcs_detail
 
-        categories = srcs_summary.index.tolist()
+        # Format every column once
+        summary = self.format_sources(srcs_summary)
+        detail = self.format_sources(srcs_detail)
 
-        up = '\u2206'
-        down = '\u2207'
-        inf = '\u221E'
-
-        sessions_change_rate_str = None
-        goal_change_rate_str = None
+        # Get the rows of the sources of every category
+        detail_sources = srcs_detail.index.get_level_values(1).tolist()
+        detail_positions = group_positions(srcs_detail.index.get_level_values(0))
+        no_sources = np.array([], dtype=np.intp)
 
         rows = []
-        for category in categories:
-
-            cat_detail = srcs_detail.ix[category]
-
-            # Get list of sources for current category
-            sources = cat_detail.index.tolist()
+        for position, category in enumerate(srcs_summary.index.tolist()):
 
             # Build detail
-            detail_rows = []
-            for source in sources:
-
-                # Format sessions change rate
-                if cat_detail.ix[source]['sessionsChangeRate'] == np.inf:
-                    sessions_change_rate_str = inf
-                else:
-                    if cat_detail.ix[source]['sessionsChangeRate'] < 0:
-                        sessions_change_rate_str = down + ' ' + str('{:.2f}%'.format(abs(cat_detail.ix[source]['sessionsChangeRate'])))
-                    else:
-                        sessions_change_rate_str = up + ' ' + str('{:.2f}%'.format(cat_detail.ix[source]['sessionsChangeRate']))
-
-                # Format goal completions change rate
-                if cat_detail.ix[source]['goalCompletionsChangeRate'] == np.inf:
-                    goal_change_rate_str = inf
-                else:
-                    if cat_detail.ix[source]['goalCompletionsChangeRate'] < 0:
-                        goal_change_rate_str = down + ' ' + str('{:.2f}%'.format(abs(cat_detail.ix[source]['goalCompletionsChangeRate'])))
-                    else:
-                        goal_change_rate_str = up + ' ' + str('{:.2f}%'.format(cat_detail.ix[source]['goalCompletionsChangeRate']))
-
-                tmp_row = {
-                    'source': source,
-                    'sessions': str('{:.0f}'.format(cat_detail.ix[source]['ga:sessions_curr'])),
-                    'sessions_delta_p': sessions_change_rate_str,
-                    'goal_completions': str('{:.0f}'.format(cat_detail.ix[source]['ga:goalCompletionsAll_curr'])),
-                    'goal_completions_delta_p': goal_change_rate_str,
-                    'conversion_rate_curr': str('{:.2f}%'.format(cat_detail.ix[source]['goalConversionRateAll_curr'])),
-                    'conversion_rate_prev': str('{:.2f}%'.format(cat_detail.ix[source]['goalConversionRateAll_prev']))
-                }
-                detail_rows.append(tmp_row)
-
-            # Format sessions change rate
-            if srcs_summary.ix[category]['sessionsChangeRate'] == np.inf:
-                sessions_change_rate_str = inf
-            else:
-                if srcs_summary.ix[category]['sessionsChangeRate'] < 0:
-                    sessions_change_rate_str = down + ' ' + str('{:.2f}%'.format(abs(srcs_summary.ix[category]['sessionsChangeRate'])))
-                else:
-                    sessions_change_rate_str = up + ' ' + str('{:.2f}%'.format(srcs_summary.ix[category]['sessionsChangeRate']))
-
-            # Format goal completions change rate
-            if srcs_summary.ix[category]['goalCompletionsChangeRate'] == np.inf:
-                goal_change_rate_str = inf
-            else:
-                if srcs_summary.ix[category]['goalCompletionsChangeRate'] < 0:
-                    goal_change_rate_str = down + ' ' + str('{:.2f}%'.format(abs(srcs_summary.ix[category]['goalCompletionsChangeRate'])))
-                else:
-                    goal_change_rate_str = up + ' ' + str('{:.2f}%'.format(srcs_summary.ix[category]['goalCompletionsChangeRate']))
+            detail_rows = [{
+                'source': detail_sources[index],
+                'sessions': detail['sessions'][index],
+                'sessions_delta_p': detail['sessions_delta_p'][index],
+                'goal_completions': detail['goal_completions'][index],
+                'goal_completions_delta_p': detail['goal_completions_delta_p'][index],
+                'conversion_rate_curr': detail['conversion_rate_curr'][index],
+                'conversion_rate_prev': detail['conversion_rate_prev'][index]
+            } for index in detail_positions.get(category, no_sources).tolist()]
 
             tmp_row = {
                 'group_name': category,
-                'sessions': str('{:.0f}'.format(srcs_summary.ix[category]['ga:sessions_curr'])),
-                'sessions_delta_p': sessions_change_rate_str,
-                'goal_completions': str('{:.0f}'.format(srcs_summary.ix[category]['ga:goalCompletionsAll_curr'])),
-                'goal_completions_delta_p': goal_change_rate_str,
-                'conversion_rate_curr': str('{:.2f}%'.format(srcs_summary.ix[category]['goalConversionRateAll_curr'])),
-                'conversion_rate_prev': str('{:.2f}%'.format(srcs_summary.ix[category]['goalConversionRateAll_prev'])),
+                'sessions': summary['sessions'][position],
+                'sessions_delta_p': summary['sessions_delta_p'][position],
+                'goal_completions': summary['goal_completions'][position],
+                'goal_completions_delta_p': summary['goal_completions_delta_p'][position],
+                'conversion_rate_curr': summary['conversion_rate_curr'][position],
+                'conversion_rate_prev': summary['conversion_rate_prev'][position],
                 'src_detail': detail_rows
             }
             rows.append(tmp_row)
 
         return rows
 
+    def format_sources(self, frame):
+        """ @brief format_sources
+            @description function formats the columns of the Traffic Sources element
+            @param frame: the traffic source summary or detail data frame (see Analytics.srcs_summary)
+            @return: a dictionary with the list of formatted values of every column of a row
+        """
+        return {
+            'sessions': format_values(frame['ga:sessions_curr'], '%.0f'),
+            'sessions_delta_p': format_changes(frame['sessionsChangeRate']),
+            'goal_completions': format_values(frame['ga:goalCompletionsAll_curr'], '%.0f'),
+            'goal_completions_delta_p': format_changes(frame['goalCompletionsChangeRate']),
+            'conversion_rate_curr': format_values(frame['goalConversionRateAll_curr'], '%.2f%%'),
+            'conversion_rate_prev': format_values(frame['goalConversionRateAll_prev'], '%.2f%%')
+        }
+
     def init_sources(self):
         """ @brief init_sources
             @description function initializes the Traffic Sources element
@@ -575,47 +869,25 @@ class DashboardView(LoginRequiredMixin, TemplateView):
             @return: br_content: a dictionary containing key, value pairs for the BR element
         """
 
-        # Create the JSON columns for the chart
-        br_raw_data = {
-            'cols': [
-                {'id': 'ppath','label': 'Full Page URL','type': 'string'},
-                {'id': 'br_curr','label': 'Bounce Rate','type': 'number'},
-                {'type': 'string', 'p': {'role': 'style'}}
-                ],
-            'rows': []}
-
-        # Get the dataframe of high bounce rates
-        br_data_high = self.analysis.highest_n_br
-        br_data_high.to_csv('br_data_hight.csv')
-
-        # Get the dataframe of low bounce rates
-        br_data_low = self.analysis.lowest_n_br
-        br_data_low.to_csv('br_data_low.csv')
-
-        # Put them in a list of dataframes
-        dfs = [br_data_high, br_data_low]
-
-        # Concatenate the dataframes into one dataframe
-        #br_data = pd.concat(dfs)
-        br_data = br_data_high.append(br_data_low)
-        br_data.to_csv('br_data.csv')
-
-        # Get the referral sources dataframe of high bounce rates
-        br_rs_data_high = self.analysis.highest_n_br_src
+        # Get the dataframes of high and low bounce rates, one after the other
+        br_data = pd.concat([self.analysis.highest_n_br, self.analysis.lowest_n_br])
 
-        # Get the referral sources dataframe of low bounce rates
-        br_rs_data_low = self.analysis.lowest_n_br_src
+        # Get the referral sources dataframes of high and low bounce rates, one after the other
+        br_rs_data = pd.concat([self.analysis.highest_n_br_src, self.analysis.lowest_n_br_src])
 
-        # Put them in a list of dataframes
-        dfs_rs = [br_rs_data_high, br_rs_data_low]
-
-        # Concatenate the dataframes into one dataframe
-        #br_rs_data = pd.concat(dfs_rs)
-        br_rs_data = br_rs_data_high.append(br_rs_data_low)
-        br_rs_data.to_csv('br_rs_data.csv')
-
-        # Assign br data to variables
+        # Assign br data to variables, one list per column
         paths = br_data.index.tolist()
+        off_avgs = br_data['fromAvrg%'].tolist()
+        bounce_rates = br_data['bounceRate'].tolist()
+        conversion_rates = format_values(br_data['goalConversionRateAll'], '%.1f%%')
+
+        # Format the referral sources once, then get the rows of the sources of every path
+        rs_names = br_rs_data.index.get_level_values(1).tolist()
+        rs_bounce_rates = format_values(br_rs_data['bounceRate'], '%.1f%%')
+        rs_off_averages = format_values(br_rs_data['fromAvrg%'], '%.1f%%')
+        rs_conversion_rates = format_values(br_rs_data['goalConversionRateAll'], '%.1f%%')
+        rs_positions = group_positions(br_rs_data.index.get_level_values(0))
+        no_sources = np.array([], dtype=np.intp)
 
         path_suffix = 1
 
@@ -623,39 +895,20 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         short_names = []
 
         # Put the chart data & detail together
-        for path in paths:
+        for path, off_avg, bounce_rate, conversion_rate in zip(paths, off_avgs, bounce_rates, conversion_rates):
             s_name = 'page ' + str(path_suffix)
             short_names.append(s_name)
-            off_avg = np.asscalar(br_data.ix[path]['fromAvrg%'])
             if off_avg > 0:
                 recommendation_tag = 'How to fix this...'
-                style = 'color: #bd342d'
             else:
                 recommendation_tag = 'How to improve this...'
-                style = 'color: #3D9970'
-
-            srcs = br_rs_data.ix[(path,)]
-            srcs_list = srcs.index.tolist()
-            src_data_list = []
-
-            for src in srcs_list:
-                rs_container = {
-                    'src_name': src,
-                    'src_bounce_rate': "{:.1f}%".format(srcs.ix[src]['bounceRate']),
-                    'src_off_average': "{:.1f}%".format(srcs.ix[src]['fromAvrg%']),
-                    'src_conversion_rate': "{:.1f}%".format(srcs.ix[src]['goalConversionRateAll'])
-                }
-                src_data_list.append(rs_container)
 
-            chart_data = {
-                'c': [
-                    # ANONYMIZED PATH
-                    # {'v': s_name, 'f': s_name},
-                    # ACTUAL PATH
-                    {'v': path, 'f': path},
-                    {'v': np.asscalar(br_data.ix[path]['fromAvrg%']), 'f': np.asscalar(br_data.ix[path]['bounceRate'])},
-                    {'v': style},
-                    ]}
+            src_data_list = [{
+                'src_name': rs_names[index],
+                'src_bounce_rate': rs_bounce_rates[index],
+                'src_off_average': rs_off_averages[index],
+                'src_conversion_rate': rs_conversion_rates[index]
+            } for index in rs_positions.get(path, no_sources).tolist()]
 
             detail = {
                 'short_name': s_name,
@@ -663,9 +916,9 @@ class DashboardView(LoginRequiredMixin, TemplateView):
                 # 'long_name': s_name,
                 # ACTUAL PATH
                 'long_name': path,
-                'bounce_rate': "{:.1f}%".format(np.asscalar(br_data.ix[path]['bounceRate'])),
+                'bounce_rate': "{:.1f}%".format(bounce_rate),
                 'off_average': "{:.1f}%".format(off_avg),
-                'conversion_rate': "{:.1f}%".format(np.asscalar(br_data.ix[path]['goalConversionRateAll'])),
+                'conversion_rate': conversion_rate,
                 'show_hide_tag': '<a class="show-hide-srcs" href="#"></a>',
                 'rec_tag': recommendation_tag,
                 'rec_container': {
@@ -682,12 +935,18 @@ class DashboardView(LoginRequiredMixin, TemplateView):
                     'srcs_data': src_data_list
                 }
             }
-            br_raw_data['rows'].append(chart_data)
             br_detail.append(detail)
             path_suffix += 1
 
+        # Create the chart data: the page, its offset from the average bounce rate and its color, one row per page
+        chart_frame = pd.DataFrame({
+            'fromAvrg%': br_data['fromAvrg%'].values,
+            'bounceRate': br_data['bounceRate'].values,
+            'style': np.where(br_data['fromAvrg%'].values > 0, 'color: #bd342d', 'color: #3D9970')
+        }, index=br_data.index)
+
         # Put the summary text string together
-        site_wide_avg = np.asscalar(br_data.ix[0]['bounceRate'] - br_data.ix[0]['fromAvrg%'])
+        site_wide_avg = bounce_rates[0] - off_avgs[0]
         swa_str = str("{:.2f}".format(site_wide_avg)) + '% Average Bounce Rate for pages connected to this web presence'
 
         # Put the y-ticks together
@@ -703,7 +962,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
 
         br_container = {
             'chart_summary':  swa_str,
-            'chart_data': json.dumps(br_raw_data),
+            'chart_data': datatable_json(chart_frame, BR_CHART_COLUMNS),
             'chart_tag': 'br-summary',
             'chart_div': '<div id="br-summary"></div>',
             'chart_title': 'Extraordinary Bounce Rates by Page URL (Current Month)',